@@ -1,25 +1,85 @@
-
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from pathlib import Path
-import shutil, os, json, httpx, asyncio, logging
+from contextlib import asynccontextmanager
+import os, json, base64, httpx, asyncio, logging
 from dotenv import load_dotenv
+from caching import AnswerCache, SingleFlight, _normalize_question
+from llm import llm_client
+from startup import STARTUP_WARMUP, StartupProfile
 load_dotenv()
 
-UPLOAD_DIR = Path("uploaded_docs"); UPLOAD_DIR.mkdir(exist_ok=True)
-app = FastAPI(title="Agentic RAG MCP API")
+logger = logging.getLogger("backend")
+startup = StartupProfile("backend")
 
 class QueryRequest(BaseModel):
     question: str
+    session_id: str | None = None  # scope to the documents this session uploaded
+    tenant: str | None = None      # scope to this tenant's documents (and its shard, if any)
+
+# --- MCP client: one pooled keep-alive transport shared by every request ---
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "20"))
+MCP_KEEPALIVE = int(os.getenv("MCP_KEEPALIVE", "10"))            # idle connections kept open
+MCP_KEEPALIVE_EXPIRY = float(os.getenv("MCP_KEEPALIVE_EXPIRY", "30"))
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "5"))
+MCP_READ_TIMEOUT = float(os.getenv("MCP_READ_TIMEOUT", "60"))
+
+class MCPSessionExpired(Exception):
+    """The server no longer knows our Mcp-Session-Id (restart, eviction, ...)."""
+
+class MCPUnavailable(Exception):
+    """The MCP server rejected the call again right after a fresh session was opened."""
 
-# --- MCP client (unchanged except more-tolerant parsing) ---
 class MCPClient:
     def __init__(self, url: str, protocol_version: str = "2025-06-18"):
         self.url = url
         self.protocol_version = protocol_version
         self.session_id: str | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._session_lock = asyncio.Lock()
+
+    # ----- transport -----
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=MCP_POOL_SIZE,
+                    max_keepalive_connections=MCP_KEEPALIVE,
+                    keepalive_expiry=MCP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    connect=MCP_CONNECT_TIMEOUT,
+                    read=MCP_READ_TIMEOUT,
+                    write=MCP_READ_TIMEOUT,
+                    pool=MCP_CONNECT_TIMEOUT,
+                ),
+            )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
+    @asynccontextmanager
+    async def _transport(self):
+        # lazily started so scripts / tests can use the client without the app lifespan
+        if self._client is None:
+            await self.start()
+        yield self._client
+
+    def _headers(self, with_session: bool = True) -> dict:
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json, text/event-stream",
+            "User-Agent": "Agentic-RAG-Client/1.0",
+            "MCP-Protocol-Version": self.protocol_version,
+        }
+        if with_session and self.session_id:
+            headers["Mcp-Session-Id"] = self.session_id
+        return headers
+
+    # ----- session lifecycle -----
     async def initialize(self):
         payload = {
             "jsonrpc": "2.0",
@@ -31,14 +91,8 @@ class MCPClient:
             },
             "id": 0,
         }
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json, text/event-stream",
-            "User-Agent": "Agentic-RAG-Client/1.0",
-            "MCP-Protocol-Version": self.protocol_version,
-        }
-        async with httpx.AsyncClient(timeout=None) as client:
-            async with client.stream("POST", self.url, data=json.dumps(payload), headers=headers) as resp:
+        async with self._transport() as client:
+            async with client.stream("POST", self.url, data=json.dumps(payload), headers=self._headers(with_session=False)) as resp:
                 resp.raise_for_status()
                 sid = resp.headers.get("Mcp-Session-Id")
                 if not sid:
@@ -56,33 +110,31 @@ class MCPClient:
         if self.session_id is None:
             raise RuntimeError("Session not initialized")
         payload = {"jsonrpc":"2.0","method":"notifications/initialized","params":{},"id":None}
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json, text/event-stream",
-            "User-Agent": "Agentic-RAG-Client/1.0",
-            "Mcp-Session-Id": self.session_id,
-            "MCP-Protocol-Version": self.protocol_version,
-        }
-        async with httpx.AsyncClient(timeout=None) as client:
-            async with client.stream("POST", self.url, data=json.dumps(payload), headers=headers) as resp:
+        async with self._transport() as client:
+            async with client.stream("POST", self.url, data=json.dumps(payload), headers=self._headers()) as resp:
                 resp.raise_for_status()
                 async for _ in resp.aiter_lines(): pass
 
-    async def call_tool(self, name: str, arguments: dict, request_id: int):
-        if self.session_id is None:
+    async def ensure_session(self, stale_id: str | None = None):
+        """Open a session once; concurrent callers wait on the same handshake.
+        `stale_id` forces a re-handshake, unless another caller already replaced it."""
+        async with self._session_lock:
+            if self.session_id is not None and self.session_id != stale_id:
+                return
+            self.session_id = None
             await self.initialize()
             await self.send_initialized_notification()
-        payload = {"jsonrpc":"2.0","method":"tools/call","params":{"name":name,"arguments":arguments},"id":request_id}
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json, text/event-stream",
-            "User-Agent": "Agentic-RAG-Client/1.0",
-            "Mcp-Session-Id": self.session_id,
-            "MCP-Protocol-Version": self.protocol_version,
-        }
+
+    async def _post_tool(self, payload: dict) -> list:
         results = []
-        async with httpx.AsyncClient(timeout=None) as client:
-            async with client.stream("POST", self.url, data=json.dumps(payload), headers=headers) as resp:
+        async with self._transport() as client:
+            async with client.stream("POST", self.url, data=json.dumps(payload), headers=self._headers()) as resp:
+                # MCP servers answer 404 once a session id is unknown to them; some answer a
+                # 400 that names the session. Any other 400 is an ordinary bad request.
+                if resp.status_code in (400, 404) and self.session_id:
+                    await resp.aread()
+                    if resp.status_code == 404 or "session" in resp.text.lower():
+                        raise MCPSessionExpired(resp.text)
                 resp.raise_for_status()
                 async for line in resp.aiter_lines():
                     if line.startswith("data: "):
@@ -93,18 +145,91 @@ class MCPClient:
                             results.append(obj)
                         except:
                             results.append({"result": dl})
+        return results
+
+    async def call_tool(self, name: str, arguments: dict, request_id: int):
+        if self.session_id is None:
+            await self.ensure_session()
+        payload = {"jsonrpc":"2.0","method":"tools/call","params":{"name":name,"arguments":arguments},"id":request_id}
+        try:
+            results = await self._post_tool(payload)
+        except MCPSessionExpired:
+            logger.warning("MCP session %s dropped by server; re-initializing", self.session_id)
+            await self.ensure_session(stale_id=self.session_id)
+            try:
+                results = await self._post_tool(payload)
+            except MCPSessionExpired as e:
+                raise MCPUnavailable(f"{name}: session rejected again after re-initializing") from e
         return results[-1] if results else None
 
     async def terminate_session(self):
         if self.session_id is None: return
         headers = {"Mcp-Session-Id": self.session_id, "User-Agent":"Agentic-RAG-Client/1.0"}
-        async with httpx.AsyncClient(timeout=None) as client:
-            await client.delete(self.url, headers=headers)
+        try:
+            async with self._transport() as client:
+                await client.delete(self.url, headers=headers)
+        except httpx.HTTPError as e:
+            logger.warning("Failed to terminate MCP session: %s", e)
         self.session_id = None
 
 MCP_URL = os.getenv("MCP_URL", "http://mcp-server:8000/mcp")
+MCP_STARTUP_RETRY_S = float(os.getenv("MCP_STARTUP_RETRY_S", "1"))
 mcp_client = MCPClient(MCP_URL)
 
+# ---------- Startup ----------
+# uvicorn accepts connections as soon as the lifespan yields; the warmup runs after
+# that and GET /ready answers 503 until it has finished (docker-compose healthcheck).
+async def _warmup():
+    if not STARTUP_WARMUP:
+        startup.mark_ready()
+        return
+    # the semantic answer cache embeds questions: load the model before the first query needs it
+    if answer_cache.embed is not None:
+        with startup.phase("embedding model"):
+            try:
+                await asyncio.to_thread(_embed_question, "warmup")
+            except Exception as e:
+                logger.error("Embedding warmup failed (first query will load lazily): %s", e, exc_info=True)
+    with startup.phase("mcp session"):
+        while True:
+            try:
+                await mcp_client.ensure_session()
+                break
+            except (httpx.HTTPError, RuntimeError) as e:
+                logger.info("MCP server not reachable yet (%s); retrying in %.1fs", e, MCP_STARTUP_RETRY_S)
+                await asyncio.sleep(MCP_STARTUP_RETRY_S)
+    startup.mark_ready()
+
+async def _run_warmup():
+    try:
+        await _warmup()
+    except Exception as e:
+        startup.fail(e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await mcp_client.start()
+    warmup = asyncio.create_task(_run_warmup())
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        await mcp_client.terminate_session()
+        await mcp_client.aclose()
+        await llm_client.aclose()
+
+app = FastAPI(title="Agentic RAG MCP API", lifespan=lifespan)
+
+@app.exception_handler(MCPUnavailable)
+async def _mcp_unavailable(request, exc: MCPUnavailable):
+    logger.error("MCP server unavailable: %s", exc)
+    return JSONResponse(status_code=503, content={"detail": "MCP server unavailable"}, headers={"Retry-After": "5"})
+
+@app.exception_handler(httpx.HTTPError)
+async def _mcp_http_error(request, exc: httpx.HTTPError):
+    logger.error("MCP call failed: %r", exc)
+    return JSONResponse(status_code=502, content={"detail": "MCP server call failed"})
+
 # ---------- Helpers ----------
 def _parse_mcp_text(result_obj) -> str:
     # tolerate different MCP shapes
@@ -148,64 +273,197 @@ def _extractive_answer(question: str, hits: list[dict]) -> tuple[str, list[dict]
 
 
 
-# backend.py
-from collections import deque
-# ...
-RECENT_SOURCES = deque(maxlen=5)  # keep last few uploaded filenames
+def _parse_tool_json(obj) -> dict:
+    # parse the JSON payload a tool returned, e.g. document_search's {"answer": str | None, "hits": [...]}
+    if not obj: return {}
+    r = obj.get("result")
+    if isinstance(r, dict):
+        content = r.get("content")
+        if isinstance(content, list) and content and "text" in content[0]:
+            try:
+                return json.loads(content[0]["text"])
+            except:
+                return {}
+    if isinstance(r, str):
+        try:
+            return json.loads(r)
+        except:
+            return {}
+    return {}
+
+# ---------- Uploads ----------
+# The MCP server is the only index writer: uploads are handed to its ingest_document
+# tool and /jobs proxies ingest_status, so this process keeps no index or job state
+# and can run as several workers / replicas (WEB_CONCURRENCY). Files are forwarded
+# UPLOAD_CHUNK_MB at a time (upload_chunk, then ingest_document with the last piece),
+# so neither process holds a whole upload in memory.
+UPLOAD_CHUNK_BYTES = int(float(os.getenv("UPLOAD_CHUNK_MB", "4")) * (1 << 20))
 
-@app.post("/upload_document/")
-async def upload_document(file: UploadFile = File(...)):
+def _tool_error(result: dict, not_found: str | None = None):
+    err = result.get("error")
+    if not err:
+        return
+    if "retry_after" in result:
+        raise HTTPException(status_code=429, detail=err, headers={"Retry-After": str(result["retry_after"])})
+    raise HTTPException(status_code=404 if err == not_found else 400, detail=err)
+
+@app.post("/upload_document/", status_code=202)
+async def upload_document(file: UploadFile = File(...), session_id: str | None = Form(None),
+                          tenant: str | None = Form(None)):
     if not file.filename.lower().endswith((".txt", ".pdf")):
         raise HTTPException(status_code=400, detail="Unsupported file type")
-    file_path = UPLOAD_DIR / file.filename
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    args = {"filename": Path(file.filename).name}
+    if tenant:
+        args["tenant"] = tenant
+    if session_id:
+        args["session_id"] = session_id
+    data = await file.read(UPLOAD_CHUNK_BYTES)  # starlette spools the upload to disk; read it piece by piece
+    while True:
+        following = await file.read(UPLOAD_CHUNK_BYTES)
+        content_b64 = await asyncio.to_thread(lambda: base64.b64encode(data).decode("ascii"))
+        if not following:
+            break
+        piece = {"content_b64": content_b64, **({"upload_id": args["upload_id"]} if "upload_id" in args else {})}
+        staged = _parse_tool_json(await mcp_client.call_tool("upload_chunk", piece, 3))
+        if not staged:
+            raise HTTPException(status_code=502, detail="MCP server did not accept the upload")
+        _tool_error(staged)
+        args["upload_id"], data = staged["upload_id"], following
+    args["content_b64"] = content_b64
+    result = _parse_tool_json(await mcp_client.call_tool("ingest_document", args, 3))
+    if not result:
+        raise HTTPException(status_code=502, detail="MCP server did not accept the upload")
+    _tool_error(result)
+    return result
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    result = _parse_tool_json(await mcp_client.call_tool("ingest_status", {"job_id": job_id}, 4))
+    if not result:
+        raise HTTPException(status_code=502, detail="MCP server did not answer")
+    _tool_error(result, not_found="Unknown job id")
+    return result
+
+# ---------- Retrieval / synthesis ----------
+CONTEXT_CHUNKS = int(os.getenv("CONTEXT_CHUNKS", "6"))  # hits sent to the LLM; ~3 is enough with RERANK_ENABLED
+
+NOT_FOUND_IN_DOCS = ("I couldn’t find anything about that in the uploaded documents. "
+                     "If your document is a scanned PDF, enable OCR or upload a text-based PDF/TXT.")
+
+async def _retrieve(q: str, tenant: str | None, session_id: str | None) -> tuple[list[dict], str | None, bool]:
+    """
+    Hits for `q`, plus the MCP server's own answer when the server is configured
+    to synthesize (SYNTHESIS_TIER=server); otherwise the answer is None and the
+    backend synthesizes, so each query costs exactly one LLM call. With a session the
+    server searches only the files it uploaded last (nothing if it uploaded none).
+    Without one it searches the files uploaded last without a session, or the whole
+    (tenant's) index if there are none. The flag says whether the search was scoped.
+    """
+    args = {"query": q, "top_k": 8, "session_id": session_id or ""}
+    if tenant:
+        args["tenant"] = tenant
+    parsed = _parse_tool_json(await mcp_client.call_tool("document_search", args, 1))
+    if session_id is None and parsed.get("scope") == []:  # nothing uploaded without a session
+        del args["session_id"]
+        parsed = _parse_tool_json(await mcp_client.call_tool("document_search", args, 1))
+    hits = [h for h in parsed.get("hits", []) if isinstance(h, dict) and h.get("text")]
+    return hits, parsed.get("answer") if hits else None, parsed.get("scope") is not None or bool(tenant)
+
+def _answer_prompt(q: str, hits: list[dict]) -> str:
+    context = "\n\n".join([f"[{i+1}] {h['text']}" for i, h in enumerate(hits)])
+    return (
+        "Use ONLY the context to answer the user's question. "
+        "If the context lacks the info, say you couldn't find it. "
+        "Be concise and include inline citations like [1].\n\n"
+        f"CONTEXT:\n{context}\n\nQUESTION: {q}\n\nANSWER:"
+    )
+
+def _extractive(hits: list[dict]) -> str:
+    snippets = []
+    for i, h in enumerate(hits, start=1):
+        t = h["text"].strip()
+        if len(t) > 500: t = t[:480].rsplit(" ", 1)[0] + "…"
+        snippets.append(f"{t} [{i}]")
+    return "\n\n".join(snippets)
+
+# Answers persist on local disk; bump PROMPT_VERSION whenever _answer_prompt changes.
+ANSWER_MODEL = "gpt-4o"
+PROMPT_VERSION = "backend-v1"
+
+def _embed_question(q: str):
+    from load_data import _get_embedding_function
+    return _get_embedding_function()([q])[0]
+
+# Semantic matching is off by default here: it loads the embedding model (torch +
+# all-MiniLM-L6-v2, a few hundred MB of RSS) into every uvicorn worker; exact-key hits need no model.
+answer_cache = AnswerCache(
+    os.getenv("ANSWER_CACHE_PATH", "./answer_cache.sqlite3"),
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "5000")),
+    embed=_embed_question if os.getenv("ANSWER_CACHE_SEMANTIC", "0") == "1" else None,
+    similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+)
+
+async def _answer_stream(q: str, hits: list[dict]):
+    """LLM answer tokens for `hits`, served from the answer cache when possible."""
+    model = "stub" if llm_client.is_stub else ANSWER_MODEL
+    chunk_ids = [h.get("id") or h["text"][:200] for h in hits]
+    cached = await asyncio.to_thread(answer_cache.get, q, chunk_ids, model, PROMPT_VERSION)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
+    messages = [{"role": "user", "content": _answer_prompt(q, hits)}]
+    async for tok in llm_client.stream(messages, ANSWER_MODEL, temperature=0.2, max_tokens=250):
+        parts.append(tok)
+        yield tok
+    answer = "".join(parts).strip()
+    if answer:
+        await asyncio.to_thread(answer_cache.put, q, chunk_ids, model, PROMPT_VERSION, answer)
+
+# Identical questions asked concurrently (same normalized text, same tenant and session scope)
+# share one document_search call and one LLM completion; followers replay the tokens.
+QUERY_COALESCING = os.getenv("QUERY_COALESCING", "1") == "1"
+retrieval_flights = SingleFlight("retrieval")
+answer_flights = SingleFlight("synthesis")
+
+async def _shared_retrieve(q: str, tenant: str | None,
+                           session_id: str | None) -> tuple[list[dict], str | None, bool]:
+    if not QUERY_COALESCING:
+        return await _retrieve(q, tenant, session_id)
+    key = (_normalize_question(q), tenant or None, session_id)
+    return await retrieval_flights.do(key, lambda: _retrieve(q, tenant, session_id))
 
-    # ingest just this file
-    from load_data import ingest_file
-    added = ingest_file(file_path)
-    if added == 0:
-        raise HTTPException(status_code=400, detail="Could not extract text from file (is it scanned?).")
+def _shared_answer_stream(q: str, hits: list[dict]):
+    if not QUERY_COALESCING:
+        return _answer_stream(q, hits)
+    key = (_normalize_question(q), tuple(h.get("id") or h["text"][:200] for h in hits))
+    return answer_flights.stream(key, lambda: _answer_stream(q, hits))
 
-    # remember this filename for scoping
-    RECENT_SOURCES.append(file.filename)
-    return {"message": f"File '{file.filename}' uploaded and ingested successfully! ({added} chunks)"}
+@app.get("/ready")
+async def ready():
+    """200 once startup finished (answer-cache model loaded, MCP session open), else 503."""
+    return JSONResponse(startup.status(), status_code=200 if startup.ready else 503)
+
+@app.get("/stats/")
+async def stats():
+    """Coalescing counters (requests that shared an in-flight call), LLM client, answer cache and startup stats."""
+    return {
+        "coalescing": [retrieval_flights.stats(), answer_flights.stats()],
+        "llm": llm_client.stats(),
+        "answer_cache": await asyncio.to_thread(answer_cache.stats),
+        "startup": startup.status(),
+    }
 
 @app.post("/query/")
 async def query_agent(payload: QueryRequest):
     q = payload.question.strip()
 
-    # ask MCP to search only in the last uploaded files
-    sources = list(RECENT_SOURCES) or None
-    doc_result = await mcp_client.call_tool("document_search", {"query": q, "top_k": 8, "sources": sources}, 1)
-
-    # parse the returned JSON hits
-    def _parse(obj):
-        if not obj: return []
-        r = obj.get("result")
-        if isinstance(r, dict):
-            content = r.get("content")
-            if isinstance(content, list) and content and "text" in content[0]:
-                try:
-                    return json.loads(content[0]["text"]).get("hits", [])
-                except:
-                    return []
-        if isinstance(r, str):
-            try:
-                return json.loads(r).get("hits", [])
-            except:
-                return []
-        return []
-
-    hits = _parse(doc_result)
+    # ask MCP to search only in the files this session (or tenant) uploaded last
+    hits, server_answer, scoped = await _shared_retrieve(q, payload.tenant or None, payload.session_id)
 
-    if not hits and sources:
+    if not hits and scoped:
         # If we expected resume content but found nothing, say so explicitly (don't dump web JSON).
-        return JSONResponse(content={
-            "answer": "I couldn’t find anything about that in the uploaded documents. "
-                      "If your document is a scanned PDF, enable OCR or upload a text-based PDF/TXT.",
-            "sources": []
-        })
+        return JSONResponse(content={"answer": NOT_FOUND_IN_DOCS, "sources": []})
 
     if not hits:
         # fallback (optional): web
@@ -213,34 +471,68 @@ async def query_agent(payload: QueryRequest):
         # return a simple friendly message rather than raw JSON
         return JSONResponse(content={"answer": "No relevant info in your docs; here are some web results instead.", "web": web_result})
 
+    if server_answer:
+        return JSONResponse(content={"answer": server_answer, "sources": hits[:CONTEXT_CHUNKS]})
+
     # Synthesize a concise answer from the  hits (no external web).
-    context = "\n\n".join([f"[{i+1}] {h['text']}" for i, h in enumerate(hits[:6])])
-    prompt = (
-        "Use ONLY the context to answer the user's question. "
-        "If the context lacks the info, say you couldn't find it. "
-        "Be concise and include inline citations like [1].\n\n"
-        f"CONTEXT:\n{context}\n\nQUESTION: {q}\n\nANSWER:"
-    )
+    try:
+        ans = "".join([tok async for tok in _shared_answer_stream(q, hits[:CONTEXT_CHUNKS])]).strip()
+        return JSONResponse(content={"answer": ans, "sources": hits[:CONTEXT_CHUNKS]})
+    except Exception as e:
+        logger.warning("LLM synthesis failed, answering extractively: %s", e)
+
+    # extractive fallback
+    return JSONResponse(content={"answer": _extractive(hits[:3]), "sources": hits[:3]})
+
+@app.post("/query/stream")
+async def query_agent_stream(payload: QueryRequest):
+    """
+    Same as /query/, streamed as NDJSON events:
+      {"event": "hits", "sources": [...]}   as soon as document_search returns
+      {"event": "token", "text": "..."}     answer tokens as the LLM produces them
+      {"event": "done", "answer": "...", "sources": [...]}
+    """
+    q = payload.question.strip()
+
+    def _event(**kw) -> str:
+        return json.dumps(kw) + "\n"
+
+    # retrieve before the response starts, so MCP failures still become a 502/503 status
+    hits, server_answer, scoped = await _shared_retrieve(q, payload.tenant or None, payload.session_id)
+
+    async def events():
+        yield _event(event="hits", sources=hits[:CONTEXT_CHUNKS])
 
-    openai_key = os.getenv("OPENAI_API_KEY")
-    if openai_key:
+        if not hits:
+            if scoped:
+                yield _event(event="token", text=NOT_FOUND_IN_DOCS)
+                yield _event(event="done", answer=NOT_FOUND_IN_DOCS, sources=[])
+                return
+            web_result = await mcp_client.call_tool("web_search", {"query": q}, 2)
+            msg = "No relevant info in your docs; here are some web results instead."
+            yield _event(event="token", text=msg)
+            yield _event(event="done", answer=msg, sources=[], web=web_result)
+            return
+
+        if server_answer:
+            yield _event(event="token", text=server_answer)
+            yield _event(event="done", answer=server_answer, sources=hits[:CONTEXT_CHUNKS])
+            return
+
+        parts = []
         try:
-            from openai import OpenAI
-            client = OpenAI(api_key=openai_key)
-            resp = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2, max_tokens=250
-            )
-            ans = resp.choices[0].message.content.strip()
-            return JSONResponse(content={"answer": ans, "sources": hits[:6]})
-        except Exception:
-            pass
+            async for tok in _shared_answer_stream(q, hits[:CONTEXT_CHUNKS]):
+                parts.append(tok)
+                yield _event(event="token", text=tok)
+        except Exception as e:
+            logger.warning("LLM streaming failed after %d tokens: %s", len(parts), e)
+        if parts:
+            yield _event(event="done", answer="".join(parts).strip(), sources=hits[:CONTEXT_CHUNKS])
+            return
 
-    # extractive fallback
-    snippets = []
-    for i, h in enumerate(hits[:3], start=1):
-        t = h["text"].strip()
-        if len(t) > 500: t = t[:480].rsplit(" ", 1)[0] + "…"
-        snippets.append(f"{t} [{i}]")
-    return JSONResponse(content={"answer": "\n\n".join(snippets), "sources": hits[:3]})
+        # extractive fallback
+        ans = _extractive(hits[:3])
+        yield _event(event="token", text=ans)
+        yield _event(event="done", answer=ans, sources=hits[:3])
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
@@ -0,0 +1,153 @@
+"""
+Dynamic micro-batching: many threads submit single items, one worker thread runs
+them through a batch function together.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from any thread and runs `fn(items)` on a single worker
+    thread, at most `max_batch` items per call. After the first item arrives the
+    worker waits up to `max_wait_ms` for more (0: take only what is already queued,
+    which still batches everything that arrived during the previous call).
+    `fn` must return one result per item, in order. If a batch fails, its items are
+    re-run one at a time, so only the items that fail on their own get the error.
+    """
+
+    def __init__(self, fn: Callable[[List[Any]], Sequence[Any]], max_batch: int = 64,
+                 max_wait_ms: float = 2.0, name: str = "batcher"):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.max_batch_seen = 0
+        self.max_queue_depth = 0
+        self._queue_wait_s = 0.0
+        self._run_s = 0.0
+        self._histogram: dict = {}
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"{self.name}-worker", daemon=True)
+                    self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((item, fut, time.perf_counter()))
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return fut
+
+    def map(self, items: Sequence[Any]) -> List[Any]:
+        """Submit every item and wait for all results (they may share batches with other callers)."""
+        futures = [self.submit(item) for item in items]
+        return [f.result() for f in futures]
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                timeout = deadline - time.perf_counter()
+                entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            started = time.perf_counter()
+            try:
+                results = self.fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                if len(batch) > 1:
+                    logger.warning("%s batch of %d failed (%s); running its items one by one",
+                                   self.name, len(batch), e)
+                    for entry in batch:
+                        self._run_one(entry)
+                else:
+                    logger.error("%s item failed: %s", self.name, e, exc_info=True)
+                    self.errors += 1
+                    batch[0][1].set_exception(e)
+            else:
+                for (_, fut, _), result in zip(batch, results):
+                    fut.set_result(result)
+            self._record(batch, started)
+
+    def _run_one(self, entry):
+        item, fut, _ = entry
+        try:
+            results = self.fn([item])
+            if len(results) != 1:
+                raise RuntimeError(f"{self.name}: {len(results)} results for 1 item")
+        except Exception as e:
+            logger.error("%s item failed: %s", self.name, e, exc_info=True)
+            self.errors += 1
+            fut.set_exception(e)
+        else:
+            fut.set_result(results[0])
+
+    def _record(self, batch: list, started: float):
+        n = len(batch)
+        with self._lock:
+            self.batches += 1
+            self.items += n
+            self.max_batch_seen = max(self.max_batch_seen, n)
+            self._queue_wait_s += sum(started - queued for _, _, queued in batch)
+            self._run_s += time.perf_counter() - started
+            bucket = 1 << (n - 1).bit_length()  # batch sizes bucketed to the next power of two
+            self._histogram[bucket] = self._histogram.get(bucket, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "batches": self.batches,
+                "items": self.items,
+                "errors": self.errors,
+                "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+                "batch_size_histogram": {f"<={k}": v for k, v in sorted(self._histogram.items())},
+                "mean_queue_wait_ms": round(1000.0 * self._queue_wait_s / self.items, 3) if self.items else 0.0,
+                "mean_batch_ms": round(1000.0 * self._run_s / self.batches, 3) if self.batches else 0.0,
+            }
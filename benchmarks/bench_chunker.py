@@ -0,0 +1,90 @@
+"""
+Chunking throughput of the old `_reflow` + `_chunk_text` (uncompiled regexes,
+re-scanning `rfind` windows) vs the streaming sentence-aware `iter_chunks`,
+on multi-MB inputs with and without sentence punctuation.
+
+    python benchmarks/bench_chunker.py --mb 4
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from load_data import _reflow, iter_chunks  # noqa: E402
+
+
+def legacy_reflow(text: str) -> str:
+    t = text.replace("\r", "")
+    t = re.sub(r"-\n(?=\w)", "", t)
+    t = re.sub(r"(?<!\n)\n(?!\n)", " ", t)
+    t = re.sub(r"[ \t]+", " ", t)
+    t = re.sub(r"\n{3,}", "\n\n", t)
+    return t.strip()
+
+
+def legacy_chunk_text(text: str, chunk_size: int = 900, overlap: int = 150):
+    chunks, i, n = [], 0, len(text)
+    while i < n:
+        end = min(i + chunk_size, n)
+        window = text[i:end]
+        cut = max(window.rfind(". "), window.rfind("\n\n"))
+        if cut != -1 and end != n and cut > chunk_size * 0.5:
+            end = i + cut + 1
+        chunk = text[i:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= n:
+            break
+        i = max(0, end - overlap)
+    return chunks
+
+
+def _text(mb: float, punctuated: bool, rng: random.Random) -> str:
+    words = ["pipeline", "latency", "ingest", "vector", "index", "query", "docu-\nment", "batch"]
+    out, size = [], 0
+    while size < mb * 1_000_000:
+        sent = " ".join(rng.choice(words) for _ in range(rng.randint(6, 30)))
+        sent += ". " if punctuated else " "
+        if rng.random() < 0.05:
+            sent += "\n\n"
+        elif rng.random() < 0.3:
+            sent += "\n"
+        out.append(sent)
+        size += len(sent)
+    return "".join(out)
+
+
+def _time(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=float, default=4.0)
+    ap.add_argument("--chunk-size", type=int, default=900)
+    ap.add_argument("--overlap", type=int, default=150)
+    a = ap.parse_args()
+    rng = random.Random(0)
+
+    for label, punctuated in (("prose", True), ("no periods", False)):
+        raw = _text(a.mb, punctuated, rng)
+        t_old_r, old_txt = _time(legacy_reflow, raw)
+        t_new_r, new_txt = _time(_reflow, raw)
+        assert old_txt == new_txt
+        t_old_c, old = _time(legacy_chunk_text, old_txt, a.chunk_size, a.overlap)
+        t_new_c, new = _time(lambda t: list(iter_chunks(t, a.chunk_size, a.overlap, unit="chars")), new_txt)
+        mb = len(raw) / 1e6
+        print(f"[{label}] {mb:.1f} MB")
+        print(f"  reflow  legacy {t_old_r:6.2f}s   compiled {t_new_r:6.2f}s")
+        print(f"  chunk   legacy {t_old_c:6.2f}s ({len(old)} chunks, {mb / t_old_c:5.1f} MB/s)"
+              f"   iter_chunks {t_new_c:6.2f}s ({len(new)} chunks, {mb / t_new_c:5.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
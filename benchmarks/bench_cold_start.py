@@ -0,0 +1,71 @@
+"""
+Cold start of the MCP server and the backend, each in a fresh process: how long the
+module import takes (what a restart waits for before the port opens), which heavy
+libraries that import already pulled in, and the startup profile of the warmup that
+runs before /ready turns 200 (the MCP server's full warmup; the backend's model
+phase only, since its MCP-session phase needs a running server).
+
+    python benchmarks/bench_cold_start.py --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+HEAVY = ("chromadb", "torch", "sentence_transformers", "pypdf", "openai")
+
+
+def _child(service: str) -> dict:
+    t0 = time.perf_counter()
+    if service == "mcp_server":
+        import working_mcp_server as mod
+        import_s = time.perf_counter() - t0
+        loaded = [m for m in HEAVY if m in sys.modules]
+        mod._warmup()
+    else:
+        import backend as mod
+        import_s = time.perf_counter() - t0
+        loaded = [m for m in HEAVY if m in sys.modules]
+        if mod.answer_cache.embed is not None:
+            with mod.startup.phase("embedding model"):
+                mod._embed_question("warmup")
+    mod.startup.mark_ready()
+    return {"import_s": import_s, "heavy_at_import": loaded, "profile": mod.startup.status()}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--child", choices=["mcp_server", "backend"], help=argparse.SUPPRESS)
+    a = ap.parse_args()
+    if a.child:
+        print(json.dumps(_child(a.child)))
+        return
+
+    work = tempfile.mkdtemp()
+    env = dict(os.environ, CHROMA_PATH=os.path.join(work, "chroma"),
+               ANSWER_CACHE_PATH=os.path.join(work, "answers.sqlite3"), LLM_PROVIDER="stub")
+    for service in ("mcp_server", "backend"):
+        runs = []
+        for _ in range(a.runs):
+            out = subprocess.run([sys.executable, __file__, "--child", service], capture_output=True, text=True,
+                                 check=True, env=env, cwd=ROOT)
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        print(f"{service}: import {statistics.median(r['import_s'] for r in runs):.2f}s "
+              f"(median of {a.runs}), heavy modules at import: {', '.join(runs[-1]['heavy_at_import']) or 'none'}")
+        phases = runs[-1]["profile"]["phases"]
+        for name in phases:
+            print(f"  {name:<16} {statistics.median(r['profile']['phases'][name] for r in runs):7.2f}s")
+        print(f"  {'ready after':<16} {statistics.median(r['profile']['uptime_s'] for r in runs):7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
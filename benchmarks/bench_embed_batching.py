@@ -0,0 +1,96 @@
+"""
+Throughput and latency of query embedding under concurrency: every caller running
+its own single-sentence forward pass vs the shared `MicroBatcher` used by the MCP
+server (one batched SentenceTransformer pass for whatever queued up).
+
+    python benchmarks/bench_embed_batching.py --concurrency 32 --queries 2000
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction  # noqa: E402
+
+from batching import MicroBatcher  # noqa: E402
+
+TEMPLATES = [
+    "What did {} work on in {}?",
+    "Which incidents involved the {} pipeline during {}?",
+    "Summarize the {} section of the {} report.",
+    "Who owns the {} service and what changed in {}?",
+]
+TOPICS = ["billing", "search", "ingest", "payments", "reporting", "auth", "storage", "alerts"]
+PERIODS = ["2021", "2022", "2023", "Q1", "Q2", "Q3", "Q4", "last year"]
+
+
+def _queries(n: int) -> list:
+    return [TEMPLATES[i % len(TEMPLATES)].format(TOPICS[i % len(TOPICS)], PERIODS[(i // 8) % len(PERIODS)]) + f" #{i}"
+            for i in range(n)]
+
+
+def _run(embed_one, queries: list, concurrency: int) -> tuple:
+    latencies, lock = [], threading.Lock()
+    it = iter(queries)
+
+    def worker():
+        while True:
+            with lock:
+                q = next(it, None)
+            if q is None:
+                return
+            t0 = time.perf_counter()
+            embed_one(q)
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return elapsed, latencies
+
+
+def _report(label: str, n: int, elapsed: float, latencies: list):
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(0.99 * (len(latencies) - 1))] * 1000
+    print(f"{label:<28} {n / elapsed:8.1f} q/s   p50 {p50:7.1f} ms   p99 {p99:7.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--max-batch", type=int, default=64)
+    ap.add_argument("--wait-ms", type=float, nargs="+", default=[0.0, 2.0, 5.0])
+    ap.add_argument("--model", default="all-MiniLM-L6-v2")
+    a = ap.parse_args()
+
+    ef = SentenceTransformerEmbeddingFunction(model_name=a.model)
+    ef(["warm up"])
+    queries = _queries(a.queries)
+
+    elapsed, lat = _run(lambda q: ef([q]), queries, a.concurrency)
+    _report("per-request forward pass", len(queries), elapsed, lat)
+
+    for wait in a.wait_ms:
+        batcher = MicroBatcher(lambda texts: ef(texts), max_batch=a.max_batch, max_wait_ms=wait, name="bench")
+        elapsed, lat = _run(lambda q: batcher.submit(q).result(), queries, a.concurrency)
+        _report(f"micro-batched (wait {wait:g} ms)", len(queries), elapsed, lat)
+        s = batcher.stats()
+        print(f"{'':<28} mean batch {s['mean_batch_size']}, max queue depth {s['max_queue_depth']}, "
+              f"histogram {s['batch_size_histogram']}")
+        batcher.close()
+
+
+if __name__ == "__main__":
+    main()
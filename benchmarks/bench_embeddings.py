@@ -0,0 +1,110 @@
+"""
+Embedding backends on CPU (EMBED_BACKEND torch / int8 / onnx) for the same model,
+each loaded in a fresh process: load time, resident memory added by the model,
+sentences/s for short queries one at a time (query path) and for chunk-sized
+passages in batches (ingest path), and parity with the torch reference: lowest
+and mean cosine similarity, and overlap of each query's top-10 passages.
+Texts are cut from this repo's README, so no dataset is needed.
+
+    python benchmarks/bench_embeddings.py --threads 4 --passages 512
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+
+def _texts(n_queries: int, n_passages: int):
+    words = re.findall(r"[A-Za-z][A-Za-z0-9'-]*", (ROOT / "README.md").read_text(encoding="utf-8"))
+    rng = np.random.default_rng(0)
+    queries = [" ".join(words[i:i + 10]) for i in rng.integers(0, len(words) - 10, n_queries)]
+    passages = [" ".join(words[i:i + 150]) for i in rng.integers(0, len(words) - 150, n_passages)]
+    return queries, passages
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024.0
+
+
+def _child(backend: str, model: str, threads: int, out_dir: str, n_queries: int, n_passages: int,
+           batch: int) -> dict:
+    import embeddings
+    queries, passages = _texts(n_queries, n_passages)
+    base = _rss_mb()
+    t0 = time.perf_counter()
+    emb = embeddings.BACKENDS[backend](model, threads)
+    emb.encode(["warmup"])
+    load_s = time.perf_counter() - t0
+    rss = _rss_mb() - base
+
+    t0 = time.perf_counter()
+    q = np.stack([emb.encode([text])[0] for text in queries])
+    query_sps = len(queries) / (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    p = np.concatenate([emb.encode(passages[i:i + batch]) for i in range(0, len(passages), batch)])
+    passage_sps = len(passages) / (time.perf_counter() - t0)
+    np.save(os.path.join(out_dir, f"{backend}-q.npy"), q)
+    np.save(os.path.join(out_dir, f"{backend}-p.npy"), p)
+    return {"load_s": load_s, "rss_mb": rss, "query_sps": query_sps, "passage_sps": passage_sps}
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2"))
+    ap.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    ap.add_argument("--threads", type=int, default=int(os.getenv("EMBED_THREADS", "0")))
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--passages", type=int, default=512)
+    ap.add_argument("--batch", type=int, default=64)
+    ap.add_argument("--child", nargs=2, metavar=("BACKEND", "OUT_DIR"), help=argparse.SUPPRESS)
+    a = ap.parse_args()
+    if a.child:
+        print(json.dumps(_child(a.child[0], a.model, a.threads, a.child[1], a.queries, a.passages, a.batch)))
+        return
+
+    work = tempfile.mkdtemp()
+    backends = ["torch"] + [b for b in a.backends if b != "torch"]  # torch first: the parity reference
+    print(f"model {a.model}, threads {a.threads or 'default'}, {a.queries} queries (1 per call), "
+          f"{a.passages} passages (batch {a.batch})")
+    print(f"{'backend':<8} {'load s':>7} {'model MB':>9} {'query/s':>8} {'passage/s':>10} "
+          f"{'min cos':>8} {'mean cos':>9} {'top10 overlap':>14}")
+    ref = None
+    for backend in backends:
+        cmd = [sys.executable, __file__, "--model", a.model, "--threads", str(a.threads), "--queries",
+               str(a.queries), "--passages", str(a.passages), "--batch", str(a.batch), "--child", backend, work]
+        out = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+        if out.returncode != 0:
+            print(f"{backend:<8} failed: {(out.stderr.strip().splitlines() or ['?'])[-1]}")
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        q = _unit(np.load(os.path.join(work, f"{backend}-q.npy")))
+        p = _unit(np.load(os.path.join(work, f"{backend}-p.npy")))
+        top = np.argsort(-(q @ p.T), axis=1)[:, :10]
+        if backend == "torch":
+            ref = (q, p, top)
+        line = f"{backend:<8} {r['load_s']:7.2f} {r['rss_mb']:9.0f} {r['query_sps']:8.0f} {r['passage_sps']:10.1f}"
+        if ref is None:
+            print(f"{line} {'(no torch reference)':>33}")
+            continue
+        cos = np.concatenate([np.sum(q * ref[0], axis=1), np.sum(p * ref[1], axis=1)])
+        overlap = np.mean([len(set(t) & set(rt)) / 10 for t, rt in zip(top, ref[2])])
+        print(f"{line} {cos.min():8.4f} {cos.mean():9.4f} {overlap:14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Recall@k and per-query latency of dense-only vs hybrid (dense + BM25, RRF)
+retrieval on a synthetic corpus where every document hides one exact term
+(a person's name and an error code) inside generic filler text.
+
+    python benchmarks/bench_hybrid_recall.py --docs 300 --top-k 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+FILLER = [
+    "The team improved the reliability of the data platform over several quarters.",
+    "Responsibilities included stakeholder communication, planning and code reviews.",
+    "The service processes customer events and writes aggregates to the warehouse.",
+    "Monitoring dashboards and alerting were set up for the production cluster.",
+    "Documentation was updated and onboarding guides were written for new hires.",
+]
+FIRST = ["Avery", "Jordan", "Quinn", "Riley", "Morgan", "Casey", "Rowan", "Emerson", "Sasha", "Kai"]
+LAST = ["Okafor", "Lindqvist", "Tanaka", "Moreau", "Haddad", "Novak", "Ibarra", "Kowalski", "Mensah", "Duarte"]
+
+
+def _corpus(dirpath: Path, n: int, rng: random.Random) -> list[tuple[str, str]]:
+    queries = []
+    for i in range(n):
+        name = f"{rng.choice(FIRST)} {rng.choice(LAST)}-{i}"
+        code = f"ERR-{rng.randint(1000, 9999)}-{i}"
+        body = [rng.choice(FILLER) for _ in range(30)]
+        body.insert(rng.randrange(len(body)), f"{name} resolved incident {code} in the billing pipeline.")
+        (dirpath / f"doc_{i:05d}.txt").write_text(" ".join(body), encoding="utf-8")
+        queries.append((f"Who fixed {code}?", f"doc_{i:05d}.txt"))
+        queries.append((f"What did {name} work on?", f"doc_{i:05d}.txt"))
+    return queries
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=300)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--top-k", type=int, default=5)
+    a = ap.parse_args()
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CHROMA_PATH"] = str(Path(tmp) / "chroma_db")
+        os.environ["QUERY_CACHE_SIZE"] = "0"
+        corpus_dir = Path(tmp) / "docs"
+        corpus_dir.mkdir()
+        queries = _corpus(corpus_dir, a.docs, rng)
+        rng.shuffle(queries)
+        queries = queries[:a.queries]
+
+        import load_data
+        load_data.ingest_documents_in_dir(corpus_dir)
+        import working_mcp_server as srv
+
+        for label, hybrid in (("dense only", False), ("hybrid (BM25 + RRF)", True)):
+            srv.HYBRID_SEARCH = hybrid
+            found, lat = 0, []
+            for q, target in queries:
+                t0 = time.perf_counter()
+                hits = srv._search_collection(q, a.top_k)
+                lat.append((time.perf_counter() - t0) * 1000)
+                found += any(h["source"] == target for h in hits)
+            print(f"{label:22s} recall@{a.top_k}={found / len(queries):.3f}  "
+                  f"p50={statistics.median(lat):6.2f} ms  max={max(lat):6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Peak RSS of ingesting one synthetic TXT file of growing size: the old
+materialize-everything path (whole text, then every chunk / meta / id, then one
+col.add) vs the streaming `ingest_file` pipeline. Each run is a fresh process.
+Exits non-zero if the streaming peak grows by more than --max-growth-mb between
+the smallest and the largest file.
+
+    python benchmarks/bench_ingest_memory.py --sizes-mb 8,64 --mode both
+
+Embedding uses a cheap hashing function by default (--real-embed loads the
+sentence-transformers model) so the numbers reflect the pipeline, not the model.
+"""
+import argparse
+import hashlib
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+WORDS = ["ingest", "vector", "pipeline", "memo-\nry", "latency", "batch", "page", "chunk"]
+
+
+def _write_corpus(path: Path, mb: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        while written < mb * 1_000_000:
+            para = " ".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 25))) + "."
+                            for _ in range(rng.randint(3, 8)))
+            para += "\n\n"
+            f.write(para)
+            written += len(para)
+
+
+def _hash_embedding():
+    from chromadb import EmbeddingFunction
+
+    class HashEmbedding(EmbeddingFunction):
+        def __init__(self):
+            pass
+
+        def __call__(self, input):
+            out = []
+            for text in input:
+                d = hashlib.sha256(text.encode("utf-8")).digest()
+                out.append([b / 255.0 for b in d[:32]] * 12)  # 384 dims like MiniLM
+            return out
+
+    return HashEmbedding()
+
+
+def _child(mode: str, path: Path, real_embed: bool):
+    import load_data
+
+    if not real_embed:
+        load_data._embedding_func = _hash_embedding()
+    t0 = time.perf_counter()
+    if mode == "stream":
+        n = load_data.ingest_file(path)
+    else:
+        col = load_data._get_collection()
+        txt = load_data._reflow(path.read_text(encoding="utf-8", errors="ignore"))
+        docs = [c.text for c in load_data.iter_chunks(txt)]
+        ids = [load_data._chunk_id(path, d) for d in docs]
+        metas = [{"source": path.name, "page": -1, "chunk_id": cid} for cid in ids]
+        step = load_data._client.get_max_batch_size()
+        for i in range(0, len(ids), step):
+            col.add(documents=docs[i:i + step], metadatas=metas[i:i + step], ids=ids[i:i + step])
+        n = len(ids)
+    elapsed = time.perf_counter() - t0
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    print(f"{n} {elapsed:.2f} {peak_mb:.0f}")
+
+
+def _run(mode: str, path: Path, real_embed: bool) -> tuple:
+    with tempfile.TemporaryDirectory() as db:
+        env = dict(os.environ, CHROMA_PATH=db)
+        cmd = [sys.executable, __file__, "--child", mode, str(path)] + (["--real-embed"] if real_embed else [])
+        out = subprocess.run(cmd, env=env, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    n, elapsed, peak = out.strip().splitlines()[-1].split()
+    return int(n), float(elapsed), float(peak)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes-mb", default="8,64")
+    ap.add_argument("--mode", choices=["stream", "legacy", "both"], default="both")
+    ap.add_argument("--max-growth-mb", type=float, default=64.0)
+    ap.add_argument("--real-embed", action="store_true")
+    ap.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    a = ap.parse_args()
+    if a.child:
+        return _child(a.child[0], Path(a.child[1]), a.real_embed)
+
+    modes = ["legacy", "stream"] if a.mode == "both" else [a.mode]
+    sizes = [int(x) for x in a.sizes_mb.split(",")]
+    peaks = {m: [] for m in modes}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mb in sizes:
+            path = Path(tmp) / f"synthetic_{mb}mb.txt"
+            _write_corpus(path, mb)
+            for mode in modes:
+                n, elapsed, peak = _run(mode, path, a.real_embed)
+                peaks[mode].append(peak)
+                print(f"{mode:>6}  {mb:5d} MB  {n:8d} chunks  {elapsed:7.1f}s  peak RSS {peak:7.0f} MB")
+            path.unlink()
+
+    if "stream" in peaks and len(sizes) > 1:
+        growth = peaks["stream"][-1] - peaks["stream"][0]
+        print(f"streaming peak RSS growth {sizes[0]} -> {sizes[-1]} MB input: {growth:+.0f} MB")
+        if growth > a.max_growth_mb:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+N users asking the same question at the same moment: MCP tool calls, LLM calls
+and latency with and without singleflight coalescing in the backend
+(stub MCP server + stub LLM, both with simulated latency).
+
+    python benchmarks/bench_query_coalescing.py --users 50 --llm-ms 800
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PORT = int(os.getenv("STUB_MCP_PORT", "8765"))
+os.environ["MCP_URL"] = f"http://127.0.0.1:{PORT}/mcp"
+os.environ["LLM_PROVIDER"] = "stub"
+os.environ["ANSWER_CACHE_SEMANTIC"] = "0"
+
+
+async def _burst(backend, users: int, path: str) -> tuple:
+    import httpx
+
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=None) as api:
+        async def one(i: int) -> float:
+            t0 = time.perf_counter()
+            r = await api.post(path, json={"question": "  What changed in the Q3 report? " if i % 2 else "what changed in the q3 report?"})
+            r.raise_for_status()
+            return time.perf_counter() - t0
+
+        return await asyncio.gather(*[one(i) for i in range(users)])
+
+
+async def _measure(users: int):
+    import backend
+    import stub_mcp_server
+
+    await backend.mcp_client.start()
+    for coalescing in (False, True):
+        backend.QUERY_COALESCING = coalescing
+        for path in ("/query/", "/query/stream"):
+            backend.answer_cache = backend.AnswerCache(os.path.join(tempfile.mkdtemp(), "answers.sqlite3"))
+            stub_mcp_server.TOOL_CALLS.clear()
+            llm_before = backend.llm_client.calls
+            lat = sorted(await _burst(backend, users, path))
+            print(f"coalescing={'on ' if coalescing else 'off'} {path:<14} {users} users: "
+                  f"{stub_mcp_server.TOOL_CALLS.get('document_search', 0):3d} document_search, "
+                  f"{backend.llm_client.calls - llm_before:3d} LLM calls, "
+                  f"p50 {statistics.median(lat) * 1000:7.1f} ms, max {lat[-1] * 1000:7.1f} ms")
+    print([s for s in (backend.retrieval_flights.stats(), backend.answer_flights.stats())])
+    await backend.mcp_client.aclose()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--tool-ms", type=float, default=50.0)
+    ap.add_argument("--llm-ms", type=float, default=800.0)
+    a = ap.parse_args()
+    # the stub LLM emits 12 tokens; spread the total latency over them
+    os.environ["LLM_STUB_TOKEN_DELAY"] = str(a.llm_ms / 1000.0 / 12)
+
+    import stub_mcp_server
+    stub_mcp_server.TOOL_LATENCY_S = a.tool_ms / 1000.0
+    server = stub_mcp_server.serve_in_thread(PORT)
+    try:
+        asyncio.run(_measure(a.users))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+p50/p99 latency of POST /query/ against the local stub MCP server, comparing
+the old per-call httpx.AsyncClient transport with the pooled MCPClient.
+
+    python benchmarks/bench_query_latency.py --requests 500 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PORT = int(os.getenv("STUB_MCP_PORT", "8765"))
+os.environ["MCP_URL"] = f"http://127.0.0.1:{PORT}/mcp"
+os.environ["OPENAI_API_KEY"] = ""  # extractive answer path: measure transport, not the LLM
+
+import httpx  # noqa: E402
+
+import backend  # noqa: E402
+import stub_mcp_server  # noqa: E402
+
+
+class UnpooledMCPClient(backend.MCPClient):
+    """The pre-pooling behaviour: a fresh client (and TCP connection) per hop, no timeouts."""
+
+    @asynccontextmanager
+    async def _transport(self):
+        async with httpx.AsyncClient(timeout=None) as client:
+            yield client
+
+
+def _pct(samples: list[float], p: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1))))]
+
+
+async def _run(client_impl, n: int, concurrency: int) -> list[float]:
+    backend.mcp_client = client_impl
+    await client_impl.start()
+    latencies: list[float] = []
+    sem = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend") as api:
+        async def one(i: int):
+            async with sem:
+                t0 = time.perf_counter()
+                r = await api.post("/query/", json={"question": f"what is item {i % 10}?"})
+                r.raise_for_status()
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+        await one(-1)  # session handshake outside the measurement
+        latencies.clear()
+        await asyncio.gather(*(one(i) for i in range(n)))
+    await client_impl.terminate_session()
+    await client_impl.aclose()
+    return latencies
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--concurrency", type=int, default=8)
+    a = ap.parse_args()
+
+    server = stub_mcp_server.serve_in_thread(PORT)
+    try:
+        for label, impl in (("before (client per call)", UnpooledMCPClient(backend.MCP_URL)),
+                            ("after (pooled)", backend.MCPClient(backend.MCP_URL))):
+            lat = asyncio.run(_run(impl, a.requests, a.concurrency))
+            print(f"{label:26s} n={len(lat):4d}  p50={_pct(lat, 50):7.2f} ms  "
+                  f"p99={_pct(lat, 99):7.2f} ms  mean={statistics.mean(lat):7.2f} ms")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Time-to-first-token vs total latency for /query/ and /query/stream, using the
+stub MCP server and the stub LLM provider (tokens emitted on a timer). The backend
+runs under a real uvicorn server in a thread: an in-process ASGI transport would
+buffer the whole streamed response and hide the first token.
+
+    python benchmarks/bench_query_stream.py --token-delay-ms 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PORT = int(os.getenv("STUB_MCP_PORT", "8765"))
+BACKEND_PORT = int(os.getenv("BENCH_BACKEND_PORT", "8766"))
+os.environ["MCP_URL"] = f"http://127.0.0.1:{PORT}/mcp"
+os.environ["LLM_PROVIDER"] = "stub"
+os.environ["ANSWER_CACHE_SEMANTIC"] = "0"  # no embedding model needed
+os.environ["ANSWER_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "answers.sqlite3")
+
+
+def _serve_backend(port: int):
+    import uvicorn
+    import backend
+    server = uvicorn.Server(uvicorn.Config(backend.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def _measure(n: int):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{BACKEND_PORT}", timeout=None) as api:
+        while (await api.get("/ready")).status_code != 200:  # MCP session opened by the warmup
+            await asyncio.sleep(0.05)
+        for i in range(n):
+            # a distinct question per request: no answer-cache hits
+            t0 = time.perf_counter()
+            r = await api.post("/query/", json={"question": f"what does the document say? ({i})"})
+            r.raise_for_status()
+            total = time.perf_counter() - t0
+            print(f"/query/        first token {total * 1000:8.1f} ms   total {total * 1000:8.1f} ms")
+
+            t0 = time.perf_counter()
+            first_hits = first_tok = None
+            async with api.stream("POST", "/query/stream", json={"question": f"what does it say? ({i})"}) as resp:
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    ev = json.loads(line)
+                    if ev["event"] == "hits" and first_hits is None:
+                        first_hits = time.perf_counter() - t0
+                    if ev["event"] == "token" and first_tok is None:
+                        first_tok = time.perf_counter() - t0
+            total = time.perf_counter() - t0
+            print(f"/query/stream  first token {first_tok * 1000:8.1f} ms   total {total * 1000:8.1f} ms"
+                  f"   (hits after {first_hits * 1000:.1f} ms)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--token-delay-ms", type=float, default=50.0)
+    a = ap.parse_args()
+    os.environ["LLM_STUB_TOKEN_DELAY"] = str(a.token_delay_ms / 1000.0)
+
+    import stub_mcp_server
+    server = stub_mcp_server.serve_in_thread(PORT)
+    api = _serve_backend(BACKEND_PORT)
+    try:
+        asyncio.run(_measure(a.runs))
+    finally:
+        api.should_exit = True
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
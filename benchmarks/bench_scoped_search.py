@@ -0,0 +1,88 @@
+"""
+Latency of a source-scoped query as the corpus grows: Chroma evaluating a `$in`
+metadata filter per query vs the exact scan over the scope's embeddings resolved
+through the source -> chunk-id index (SCOPE_EXACT_MAX). Also reports how many of
+the filtered HNSW results the exact top-k agrees with. Random 384-d vectors, no
+model needed.
+
+    python benchmarks/bench_scoped_search.py --sizes 5000 20000 50000 --scope 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("CHROMA_PATH", tempfile.mkdtemp())
+os.environ.setdefault("ANSWER_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "answers.sqlite3"))
+
+import numpy as np
+
+DIM = 384
+CHUNKS_PER_SOURCE = 50
+
+
+def _fill(srv, start: int, stop: int, rng):
+    from load_data import _get_bm25
+    col = srv._collection_for(None)
+    for lo in range(start, stop, 2000):
+        hi = min(lo + 2000, stop)
+        ids = [f"c{i}" for i in range(lo, hi)]
+        sources = [f"doc{i // CHUNKS_PER_SOURCE}.txt" for i in range(lo, hi)]
+        docs = [f"chunk {i} of {s}" for i, s in zip(range(lo, hi), sources)]
+        col.add(ids=ids, embeddings=rng.normal(size=(hi - lo, DIM)).astype(np.float32).tolist(),
+                documents=docs, metadatas=[{"source": s, "chunk_id": c} for s, c in zip(sources, ids)])
+        _get_bm25().add(ids, docs, sources)
+
+
+def _p(samples, q):
+    return sorted(samples)[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000, 50000])
+    ap.add_argument("--scope", type=int, default=5, help="sources in the query's scope")
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=16)
+    a = ap.parse_args()
+
+    import working_mcp_server as srv
+    from load_data import bump_generation
+    rng = np.random.default_rng(0)
+    have = 0
+    for size in sorted(a.sizes):
+        _fill(srv, have, size, rng)
+        have = size
+        bump_generation()
+        n_sources = size // CHUNKS_PER_SOURCE
+        queries = rng.normal(size=(a.queries, DIM)).astype(np.float32)
+        scopes = [[f"doc{j}.txt" for j in rng.choice(n_sources, a.scope, replace=False)] for _ in range(a.queries)]
+
+        timings = {"chroma $in filter": [], "exact (cold scope)": [], "exact (cached scope)": []}
+        agree = []
+        for q, scope in zip(queries, scopes):
+            t0 = time.perf_counter()
+            filtered = srv._dense_rows([q.tolist()], a.k, srv._where(scope))[0]
+            timings["chroma $in filter"].append((time.perf_counter() - t0) * 1000)
+            srv.scope_cache.clear()
+            for label in ("exact (cold scope)", "exact (cached scope)"):
+                t0 = time.perf_counter()
+                exact = srv._candidate_rows([q.tolist()], a.k, scope, None)[0]
+                timings[label].append((time.perf_counter() - t0) * 1000)
+            ids_f = {m["chunk_id"] for _, m, _, _ in filtered}
+            ids_e = {m["chunk_id"] for _, m, _, _ in exact}
+            agree.append(len(ids_f & ids_e) / max(len(ids_e), 1))
+
+        print(f"corpus {size:>7} chunks, scope {a.scope} sources ({a.scope * CHUNKS_PER_SOURCE} chunks)")
+        for label, ms in timings.items():
+            print(f"  {label:<22} p50 {statistics.median(ms):7.2f} ms   p99 {_p(ms, 0.99):7.2f} ms")
+        print(f"  filtered HNSW results also in exact top-{a.k}: {statistics.mean(agree):.1%}")
+
+
+if __name__ == "__main__":
+    main()
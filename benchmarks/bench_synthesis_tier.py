@@ -0,0 +1,77 @@
+"""
+/query/ latency with one vs two sequential LLM round trips per query.
+
+  before        document_search synthesizes AND the backend synthesizes again
+                (the backend ignored the server's answer)
+  tier=backend  document_search is retrieval-only, the backend synthesizes
+  tier=server   document_search synthesizes, the backend returns that answer
+
+Both LLM hops are simulated with the same latency (stub MCP server + stub LLM).
+
+    python benchmarks/bench_synthesis_tier.py --llm-ms 400 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PORT = int(os.getenv("STUB_MCP_PORT", "8765"))
+os.environ["MCP_URL"] = f"http://127.0.0.1:{PORT}/mcp"
+os.environ["LLM_PROVIDER"] = "stub"
+os.environ["ANSWER_CACHE_SIZE"] = "0"  # measure the LLM path, not the answer cache
+
+
+async def _run(n: int, drop_server_answer: bool) -> list[float]:
+    import httpx
+    import backend
+
+    original = backend._retrieve
+
+    async def legacy_retrieve(q, tenant, session_id):
+        hits, _, scoped = await original(q, tenant, session_id)
+        return hits, None, scoped
+
+    backend._retrieve = legacy_retrieve if drop_server_answer else original
+    await backend.mcp_client.start()
+    lat = []
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=None) as api:
+        for i in range(n):
+            t0 = time.perf_counter()
+            r = await api.post("/query/", json={"question": f"question {i}?"})
+            r.raise_for_status()
+            lat.append((time.perf_counter() - t0) * 1000)
+    backend._retrieve = original
+    await backend.mcp_client.aclose()
+    return lat
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=20)
+    ap.add_argument("--llm-ms", type=float, default=400.0)
+    a = ap.parse_args()
+
+    import stub_mcp_server
+    # the stub LLM emits 12 tokens; spread the same total latency over them
+    os.environ["LLM_STUB_TOKEN_DELAY"] = str(a.llm_ms / 1000.0 / 12)
+    stub_mcp_server.SYNTH_LATENCY_S = a.llm_ms / 1000.0
+    server = stub_mcp_server.serve_in_thread(PORT)
+    try:
+        for label, tier, legacy in (("before (2 LLM calls)", "server", True),
+                                    ("tier=backend", "backend", False),
+                                    ("tier=server", "server", False)):
+            stub_mcp_server.SYNTHESIS_TIER = tier
+            lat = asyncio.run(_run(a.requests, legacy))
+            print(f"{label:22s} p50={statistics.median(lat):8.1f} ms  mean={statistics.mean(lat):8.1f} ms")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Upload (ingest_file) latency with a cold model/client per upload -- the old
+behaviour of load_data._get_collection() -- vs the process-wide singletons.
+
+    python benchmarks/bench_upload_latency.py --uploads 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _sample_file(dirpath: Path, i: int) -> Path:
+    fp = dirpath / f"bench_upload_{i}.txt"
+    para = ("Alice Example is a data engineer with eight years of experience building "
+            "streaming pipelines in Python, Spark and Kafka. She led the migration of a "
+            "batch ETL stack to event-driven ingestion. ")
+    fp.write_text("\n\n".join(para * 3 for _ in range(40)), encoding="utf-8")
+    return fp
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uploads", type=int, default=5)
+    a = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CHROMA_PATH"] = str(Path(tmp) / "chroma_db")
+        import load_data
+
+        files = [_sample_file(Path(tmp), i) for i in range(a.uploads)]
+
+        cold = []
+        for fp in files:
+            load_data._reset_singletons()
+            t0 = time.perf_counter()
+            load_data.ingest_file(fp)
+            cold.append(time.perf_counter() - t0)
+
+        load_data._reset_singletons()
+        t0 = time.perf_counter()
+        load_data.warmup()
+        warm_cost = time.perf_counter() - t0
+        warm = []
+        for fp in files:
+            t0 = time.perf_counter()
+            load_data.ingest_file(fp)
+            warm.append(time.perf_counter() - t0)
+
+    print(f"cold per upload   mean={statistics.mean(cold):6.2f}s  max={max(cold):6.2f}s")
+    print(f"warm singletons   mean={statistics.mean(warm):6.2f}s  max={max(warm):6.2f}s  (one-off warmup {warm_cost:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Memory footprint and query throughput of the vector-store backends on the same
+synthetic corpus (clustered random 384-d vectors, no model needed): Chroma vs the
+memory-mapped engine with float16 and int8 storage (plus its HNSW index when
+hnswlib is installed). Each backend is queried from a fresh process so resident
+memory is measured from a cold open, the way the MCP server would see it.
+Recall@k is against exact float32 search.
+
+    python benchmarks/bench_vector_store.py --rows 100000 --queries 500
+"""
+import argparse
+import importlib.util
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+DIM = 384
+SOURCES = 200
+
+
+def _corpus(rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(256, DIM)).astype(np.float32)
+    emb = centers[rng.integers(0, len(centers), rows)] + 0.5 * rng.normal(size=(rows, DIM)).astype(np.float32)
+    return emb / np.linalg.norm(emb, axis=1, keepdims=True)
+
+
+def _disk_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _rss_mb() -> float:
+    """Current resident set (incl. mapped file pages that were touched), peak RSS where /proc is missing."""
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024.0
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _build(backend: str, path: str, emb: np.ndarray, batch: int) -> float:
+    import vector_store
+    store = _open(backend, path)
+    t0 = time.perf_counter()
+    for lo in range(0, len(emb), batch):
+        hi = min(lo + batch, len(emb))
+        store.add(ids=[f"c{i}" for i in range(lo, hi)], embeddings=emb[lo:hi].tolist(),
+                  documents=[f"chunk {i}" for i in range(lo, hi)],
+                  metadatas=[{"source": f"doc{i % SOURCES}.txt", "page": i % 50, "chunk_id": f"c{i}"}
+                             for i in range(lo, hi)])
+    vector_store.reset_stores()
+    return time.perf_counter() - t0
+
+
+def _open(backend: str, path: str):
+    import vector_store
+    if backend.startswith("mmap"):
+        return vector_store.MmapStore(path, "bench", dtype=backend.split("-")[1])
+    return vector_store.open_store(path, "bench", backend="chroma")
+
+
+def _child(backend: str, path: str, queries_file: str, k: int) -> dict:
+    """Runs in a fresh process: open, query, report RSS / QPS / ids."""
+    import vector_store
+    if backend == "mmap-float16-hnsw":
+        vector_store.MMAP_HNSW_MIN_ROWS = 1
+        backend = "mmap-float16"
+    else:
+        vector_store.MMAP_HNSW_MIN_ROWS = 0
+    base = _rss_mb()
+    t0 = time.perf_counter()
+    store = _open(backend, path)
+    store.query(query_embeddings=np.zeros((1, DIM), np.float32).tolist(), n_results=k)  # build / warm
+    open_s = time.perf_counter() - t0
+    q = np.load(queries_file)
+    ids = []
+    t0 = time.perf_counter()
+    for row in q:
+        ids.append(store.query(query_embeddings=[row.tolist()], n_results=k, include=[])["ids"][0])
+    qps = len(q) / (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    for i, row in enumerate(q):
+        store.query(query_embeddings=[row.tolist()], n_results=k, include=[],
+                    where={"source": {"$in": [f"doc{i % SOURCES}.txt", f"doc{(i + 1) % SOURCES}.txt"]}})
+    filtered_qps = len(q) / (time.perf_counter() - t0)
+    return {"open_s": open_s, "rss_mb": _rss_mb() - base, "qps": qps, "filtered_qps": filtered_qps, "ids": ids}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100000)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--batch", type=int, default=5000)
+    ap.add_argument("--child", nargs=3, metavar=("BACKEND", "PATH", "QUERIES"), help=argparse.SUPPRESS)
+    a = ap.parse_args()
+    if a.child:
+        print(json.dumps(_child(*a.child, a.k)))
+        return
+
+    emb = _corpus(a.rows)
+    q = _corpus(a.queries, seed=1)
+    truth = np.argsort(-(q @ emb.T), axis=1)[:, :a.k]  # unit vectors: max dot product == min L2
+    work = Path(tempfile.mkdtemp())
+    np.save(work / "queries.npy", q)
+
+    backends = ["chroma", "mmap-float16", "mmap-int8"]
+    if importlib.util.find_spec("hnswlib"):
+        backends.append("mmap-float16-hnsw")
+    else:
+        print("hnswlib not installed: skipping the HNSW run")
+    if not importlib.util.find_spec("chromadb"):
+        print("chromadb not installed: skipping the Chroma run")
+        backends.remove("chroma")
+
+    print(f"{a.rows} x {DIM} float32 embeddings = {emb.nbytes / 2**20:.0f} MB raw, k={a.k}")
+    print(f"{'backend':<20} {'build s':>8} {'disk MB':>8} {'open s':>7} {'RSS MB':>7} "
+          f"{'QPS':>8} {'QPS filt':>9} {'recall':>7}")
+    built = {}
+    for backend in backends:
+        store_kind = backend.replace("-hnsw", "")
+        path = work / store_kind
+        if store_kind not in built:
+            built[store_kind] = _build(store_kind, str(path), emb, a.batch)
+        out = subprocess.run([sys.executable, __file__, "--k", str(a.k), "--child", backend, str(path),
+                              str(work / "queries.npy")], capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        got = [{int(i[1:]) for i in ids} for ids in r["ids"]]
+        recall = np.mean([len(g & set(t.tolist())) / a.k for g, t in zip(got, truth)])
+        print(f"{backend:<20} {built[store_kind]:8.1f} {_disk_bytes(path) / 2**20:8.1f} {r['open_s']:7.2f} "
+              f"{r['rss_mb']:7.0f} {r['qps']:8.0f} {r['filtered_qps']:9.0f} {recall:7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Latency of document_search's web fallback (server-side synthesis, stub LLM) against
+the local stub search API: sequential (retrieve, then search) vs WEB_SPECULATIVE
+(search started alongside retrieval), cold vs TTL-cached, and for a query the
+documents answer well (the speculative lookup must be cancelled before synthesis:
+"web done" counts lookups that ran to completion).
+
+    python benchmarks/bench_web_fallback.py --web-ms 400 --llm-ms 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PORT = int(os.getenv("STUB_WEB_PORT", "8766"))
+os.environ["SERPER_URL"] = f"http://127.0.0.1:{PORT}/search"
+os.environ["SERPER_API_KEY"] = "stub"
+os.environ["LLM_PROVIDER"] = "stub"
+os.environ["LLM_STUB_TOKEN_DELAY"] = "0"
+os.environ["ANSWER_CACHE_SEMANTIC"] = "0"
+os.environ.setdefault("CHROMA_PATH", tempfile.mkdtemp())
+os.environ.setdefault("ANSWER_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "answers.sqlite3"))
+
+
+async def _time(srv, query: str, sources) -> tuple:
+    t0 = time.perf_counter()
+    out = await srv._search_and_answer(query, 5, sources, True)
+    return (time.perf_counter() - t0) * 1000, out
+
+
+async def _measure(srv, stub):
+    srv._collection_for(None).add(ids=["bench-doc"], documents=["The Q3 report shows revenue grew 12 percent."],
+                                  metadatas=[{"source": "report.txt", "page": -1, "chunk_id": "bench-doc"}])
+    for speculative in (False, True):
+        srv.WEB_SPECULATIVE = speculative
+        srv.web_cache.clear()
+        label = "speculative" if speculative else "sequential "
+        # scoped to a source with no chunks: no doc hits at all -> web fallback
+        for name, query, sources in (("no hits, cold", "zebra migration patterns", ["none.txt"]),
+                                     ("no hits, cached", "zebra migration patterns", ["none.txt"]),
+                                     ("weak hits", "zebra migration patterns in kenya", None),
+                                     ("answered by docs", "How much did revenue grow in the Q3 report?", None)):
+            calls, completed = stub.CALLS, stub.COMPLETED
+            ms, out = await _time(srv, query, sources)
+            await asyncio.sleep(stub.LATENCY_S + 0.05)  # let a cancelled lookup reach the stub's check
+            print(f"{label} {name:<18} {ms:8.1f} ms   web calls {stub.CALLS - calls}   "
+                  f"web done {stub.COMPLETED - completed}   "
+                  f"best vector_score {srv._best_vector_score(out.get('hits') or []):.3f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--web-ms", type=float, default=400.0)
+    ap.add_argument("--llm-ms", type=float, default=1000.0, help="stub LLM latency before the first token")
+    a = ap.parse_args()
+    os.environ["LLM_STUB_LATENCY"] = str(a.llm_ms / 1000.0)
+
+    import stub_web_search
+    stub_web_search.LATENCY_S = a.web_ms / 1000.0
+    server = stub_web_search.serve_in_thread(PORT)
+    import working_mcp_server as srv
+    try:
+        asyncio.run(_measure(srv, stub_web_search))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Tiny stand-in for working_mcp_server.py speaking just enough of the MCP
+streamable-HTTP transport (initialize / notifications / tools/call / DELETE)
+for the benchmarks. No Chroma, no model, no LLM: tool latency is simulated.
+
+    python benchmarks/stub_mcp_server.py --port 8765 --tool-latency-ms 5
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from uuid import uuid4
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+TOOL_LATENCY_S = 0.005
+SYNTH_LATENCY_S = 0.0          # simulated LLM time when document_search synthesizes
+SYNTHESIS_TIER = "backend"     # same meaning as in working_mcp_server.py
+SESSIONS: set[str] = set()
+TOOL_CALLS: dict[str, int] = {}  # tools/call count per tool name
+
+app = FastAPI(title="stub-mcp-server")
+
+
+def _fake_hits(query: str, top_k: int, sources=None) -> list[dict]:
+    src = (sources or ["stub.pdf"])[0]
+    return [{
+        "text": f"Stub chunk {i} about {query}. " * 8,
+        "source": src,
+        "page": i + 1,
+        "id": f"stub-c{i}",
+        "score": round(1.0 / (2 + i), 4),
+    } for i in range(top_k)]
+
+
+def _sse(message: dict, session_id: str | None = None) -> Response:
+    headers = {"Mcp-Session-Id": session_id} if session_id else {}
+    body = f"event: message\ndata: {json.dumps(message)}\n\n"
+    return Response(body, media_type="text/event-stream", headers=headers)
+
+
+@app.post("/mcp")
+async def mcp_endpoint(request: Request):
+    body = await request.json()
+    method = body.get("method")
+    sid = request.headers.get("mcp-session-id")
+
+    if method == "initialize":
+        sid = uuid4().hex
+        SESSIONS.add(sid)
+        return _sse({"jsonrpc": "2.0", "id": body.get("id"), "result": {
+            "protocolVersion": body["params"]["protocolVersion"],
+            "serverInfo": {"name": "stub-mcp-server", "version": "0"},
+            "capabilities": {"tools": {}},
+        }}, sid)
+
+    if sid not in SESSIONS:
+        return Response("Session not found", status_code=404)
+    if method == "notifications/initialized":
+        return Response(status_code=202)
+    if method != "tools/call":
+        return _sse({"jsonrpc": "2.0", "id": body.get("id"), "error": {"code": -32601, "message": method}})
+
+    name = body["params"]["name"]
+    args = body["params"].get("arguments") or {}
+    TOOL_CALLS[name] = TOOL_CALLS.get(name, 0) + 1
+    await asyncio.sleep(TOOL_LATENCY_S)
+    if name == "document_search":
+        hits = _fake_hits(args.get("query", ""), int(args.get("top_k", 8)), args.get("sources"))
+        synthesize = args.get("synthesize")
+        if synthesize is None:
+            synthesize = SYNTHESIS_TIER == "server"
+        answer = None
+        if synthesize:
+            await asyncio.sleep(SYNTH_LATENCY_S)
+            answer = "Stub server-side answer [1]."
+        out = {"answer": answer, "hits": hits, "scope": args.get("sources")}
+    else:
+        out = {"hits": []}
+    return _sse({"jsonrpc": "2.0", "id": body.get("id"), "result": {
+        "content": [{"type": "text", "text": json.dumps(out)}],
+    }})
+
+
+@app.delete("/mcp")
+async def mcp_delete(request: Request):
+    SESSIONS.discard(request.headers.get("mcp-session-id"))
+    return Response(status_code=200)
+
+
+def drop_sessions():
+    """Forget every session, like a server restart would."""
+    SESSIONS.clear()
+
+
+def serve_in_thread(port: int = 8765) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--tool-latency-ms", type=float, default=5.0)
+    a = ap.parse_args()
+    TOOL_LATENCY_S = a.tool_latency_ms / 1000.0
+    uvicorn.run(app, host="127.0.0.1", port=a.port, log_level="warning")
@@ -0,0 +1,52 @@
+"""
+Local stand-in for the Serper search API (POST /search -> {"organic": [...]}) with
+simulated latency, so the MCP server's web fallback can be exercised offline:
+
+    python benchmarks/stub_web_search.py --port 8766 --latency-ms 400
+    SERPER_URL=http://127.0.0.1:8766/search SERPER_API_KEY=stub python working_mcp_server.py
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+LATENCY_S = 0.4
+CALLS = 0
+COMPLETED = 0  # answered to a client still waiting; the rest were cancelled mid-request
+
+app = FastAPI(title="stub-web-search")
+
+
+@app.post("/search")
+async def search(request: Request):
+    global CALLS, COMPLETED
+    CALLS += 1
+    q = (await request.json()).get("q", "")
+    await asyncio.sleep(LATENCY_S)
+    if not await request.is_disconnected():
+        COMPLETED += 1
+    return {"organic": [{
+        "title": f"Result {i} for {q}",
+        "link": f"https://example.com/{i}",
+        "snippet": f"Stub web snippet {i} about {q}.",
+    } for i in range(5)]}
+
+
+def serve_in_thread(port: int = 8766) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--latency-ms", type=float, default=400.0)
+    a = ap.parse_args()
+    LATENCY_S = a.latency_ms / 1000.0
+    uvicorn.run(app, host="127.0.0.1", port=a.port, log_level="warning")
@@ -0,0 +1,167 @@
+"""
+Incrementally maintained, on-disk BM25 inverted index (SQLite), kept alongside
+the Chroma collection so exact terms -- names, skill keywords, error codes --
+can be matched lexically and fused with dense retrieval.
+"""
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+TOKEN_RE = re.compile(r"\w+(?:[-.]\w+)*")
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that the this to was were
+what when where which who will with you your i me my we our do does did how can about
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (
+                chunk_id TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_chunk ON postings(chunk_id);
+            CREATE INDEX IF NOT EXISTS docs_source ON docs(source);
+            CREATE TABLE IF NOT EXISTS ingested (
+                tenant TEXT NOT NULL,
+                source TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                chunks INTEGER NOT NULL,
+                PRIMARY KEY (tenant, source)
+            );
+        """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(docs)")}
+        if "tenant" not in columns:  # index files created before per-tenant scoping
+            self._db.execute("ALTER TABLE docs ADD COLUMN tenant TEXT NOT NULL DEFAULT ''")
+        self._db.execute("CREATE INDEX IF NOT EXISTS docs_tenant_source ON docs(tenant, source)")
+        self._db.commit()
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], sources: Sequence[str], tenant: str = "") -> None:
+        """Index (or re-index) chunks."""
+        docs, postings = [], []
+        for cid, text, src in zip(ids, texts, sources):
+            tf = Counter(tokenize(text))
+            docs.append((cid, src, tenant or "", sum(tf.values())))
+            postings.extend((term, cid, n) for term, n in tf.items())
+        with self._lock:
+            self._delete_locked(ids)
+            self._db.executemany("INSERT INTO docs (chunk_id, source, tenant, length) VALUES (?, ?, ?, ?)", docs)
+            self._db.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", postings)
+            self._db.commit()
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            self._delete_locked(list(ids))
+            self._db.commit()
+
+    def _delete_locked(self, ids: Sequence[str]) -> None:
+        rows = [(cid,) for cid in ids]
+        self._db.executemany("DELETE FROM postings WHERE chunk_id = ?", rows)
+        self._db.executemany("DELETE FROM docs WHERE chunk_id = ?", rows)
+
+    def clear(self) -> None:
+        # the ingest markers stay: they describe the vector store, which clear() does not touch
+        with self._lock:
+            self._db.execute("DELETE FROM postings")
+            self._db.execute("DELETE FROM docs")
+            self._db.commit()
+
+    def mark_ingested(self, source: str, file_hash: str, chunks: int, tenant: str = "") -> None:
+        """Record that `source` is completely indexed from content `file_hash` (the ingest done marker)."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO ingested (tenant, source, file_hash, chunks) VALUES (?, ?, ?, ?)",
+                             (tenant or "", source, file_hash, chunks))
+            self._db.commit()
+
+    def ingested(self, source: str, tenant: str = "") -> Optional[Tuple[str, int]]:
+        """(file_hash, chunks) of the last complete ingest of `source`, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT file_hash, chunks FROM ingested WHERE tenant = ? AND source = ?",
+                                   (tenant or "", source)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def forget_ingested(self, source: str, tenant: str = "") -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM ingested WHERE tenant = ? AND source = ?", (tenant or "", source))
+            self._db.commit()
+
+    @staticmethod
+    def _scope_sql(sources: Optional[Sequence[str]], tenant: Optional[str]) -> Tuple[str, list]:
+        sql, params = "", []
+        if sources:
+            sql += f" AND d.source IN ({','.join('?' * len(sources))})"
+            params += list(sources)
+        if tenant is not None:
+            sql += " AND d.tenant = ?"
+            params.append(tenant)
+        return sql, params
+
+    def chunk_ids(self, sources: Optional[Sequence[str]] = None, tenant: Optional[str] = None,
+                  limit: Optional[int] = None) -> List[str]:
+        """Ids of every chunk (at most `limit`) of `sources` (and/or `tenant`): the source -> chunk-id index."""
+        where, params = self._scope_sql(sources, tenant)
+        if limit is not None:
+            where += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(f"SELECT d.chunk_id FROM docs d WHERE 1 = 1{where}", params).fetchall()
+        return [r[0] for r in rows]
+
+    def has_tenants(self) -> bool:
+        """Whether any indexed chunk belongs to a tenant (tenant '' is "no tenant")."""
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM docs WHERE tenant > '' LIMIT 1").fetchone() is not None
+
+    def search(self, query: str, k: int = 10, sources: Optional[Sequence[str]] = None,
+               tenant: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Top-k (chunk_id, bm25 score), optionally restricted to chunks of `sources` / `tenant`."""
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        tq = ",".join("?" * len(terms))
+        with self._lock:
+            n_docs, total_len = self._db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+            if not n_docs:
+                return []
+            df = dict(self._db.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({tq}) GROUP BY term", terms).fetchall())
+            sql = (f"SELECT p.term, p.chunk_id, p.tf, d.length FROM postings p "
+                   f"JOIN docs d ON d.chunk_id = p.chunk_id WHERE p.term IN ({tq})")
+            scope, scope_params = self._scope_sql(sources, tenant)
+            sql += scope
+            params = list(terms) + scope_params
+            rows = self._db.execute(sql, params).fetchall()
+
+        avgdl = total_len / n_docs or 1.0
+        scores = defaultdict(float)
+        for term, cid, tf, length in rows:
+            idf = math.log(1 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+            scores[cid] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avgdl))
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
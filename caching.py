@@ -0,0 +1,275 @@
+"""
+Small in-process caches shared by the MCP server and the backend.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Optional, Sequence
+
+import numpy as np
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional per-entry TTL and hit/miss stats."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, name: str = "cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                stored_at, value = item
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Persistent (SQLite) cache of synthesized answers keyed on
+    (normalized question, ordered chunk ids, model, prompt version).
+
+    With an `embed` callable, a miss on the exact key falls back to the most
+    similar past question asked against the *same* context, if its cosine
+    similarity is >= `similarity`. Least recently used entries are evicted
+    beyond `max_entries`.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000,
+                 embed: Optional[Callable[[str], Sequence[float]]] = None,
+                 similarity: float = 0.95):
+        self.path = path
+        self.max_entries = max_entries
+        self.embed = embed
+        self.similarity = similarity
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                context_key TEXT NOT NULL,
+                question TEXT NOT NULL,
+                embedding BLOB,
+                answer TEXT NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS answers_context ON answers(context_key);
+            CREATE INDEX IF NOT EXISTS answers_last_used ON answers(last_used);
+        """)
+
+    @staticmethod
+    def _keys(question: str, chunk_ids: Sequence[str], model: str, prompt_version: str) -> tuple[str, str]:
+        ids = list(dict.fromkeys(chunk_ids))  # ordered, de-duplicated
+        context_key = _digest(ids, model, prompt_version)
+        return _digest(_normalize_question(question), context_key), context_key
+
+    def _embedding(self, question: str):
+        vec = np.asarray(self.embed(_normalize_question(question)), dtype=np.float32)
+        return vec / (np.linalg.norm(vec) + 1e-9)
+
+    def get(self, question: str, chunk_ids: Sequence[str], model: str, prompt_version: str) -> Optional[str]:
+        key, context_key = self._keys(question, chunk_ids, model, prompt_version)
+        with self._lock:
+            row = self._db.execute("SELECT answer FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None and self.embed is not None:
+                candidates = self._db.execute(
+                    "SELECT key, embedding, answer FROM answers WHERE context_key = ? AND embedding IS NOT NULL",
+                    (context_key,)).fetchall()
+            else:
+                candidates = []
+        semantic = False
+        if candidates:
+            # embed outside the lock: model inference must not serialize other lookups
+            sims = np.stack([np.frombuffer(c[1], dtype=np.float32) for c in candidates]) @ self._embedding(question)
+            best = int(np.argmax(sims))
+            if sims[best] >= self.similarity:
+                key, row = candidates[best][0], (candidates[best][2],)
+                semantic = True
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.semantic_hits += semantic
+            self._db.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[0]
+
+    def put(self, question: str, chunk_ids: Sequence[str], model: str, prompt_version: str, answer: str) -> None:
+        key, context_key = self._keys(question, chunk_ids, model, prompt_version)
+        emb = self._embedding(question).tobytes() if self.embed is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, context_key, question, embedding, answer, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, context_key, _normalize_question(question), emb, answer, time.time()))
+            (n,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+            if n > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used LIMIT ?)",
+                    (n - self.max_entries,))
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (n,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+            total = self.hits + self.misses
+            return {
+                "name": "answers",
+                "size": n,
+                "maxsize": self.max_entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class _Flight:
+    def __init__(self):
+        self.items: list = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.cond = asyncio.Condition()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent async work: while a call for `key` is in flight,
+    other callers with the same key share its result (`do`) or replay its item
+    stream from the start (`stream`) instead of starting their own. Nothing is
+    kept once the call finishes; the leader's work continues if it disconnects.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._calls: dict = {}
+        self._streams: dict = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._calls.get(key)
+        if fut is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            fut = asyncio.ensure_future(fn())
+            self._calls[key] = fut
+            fut.add_done_callback(lambda f: self._finished(self._calls, key, f))
+        return await asyncio.shield(fut)
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        flight = self._streams.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            flight = self._streams[key] = _Flight()
+            task = asyncio.ensure_future(self._pump(flight, factory))
+            task.add_done_callback(lambda f: self._finished(self._streams, key, f))
+        i = 0
+        while True:
+            async with flight.cond:
+                await flight.cond.wait_for(lambda: len(flight.items) > i or flight.done)
+                items, done = flight.items[i:], flight.done
+            for item in items:
+                yield item
+            i += len(items)
+            if done:
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+    @staticmethod
+    async def _pump(flight: _Flight, factory: Callable[[], AsyncIterator[Any]]):
+        try:
+            async for item in factory():
+                async with flight.cond:
+                    flight.items.append(item)
+                    flight.cond.notify_all()
+        except Exception as e:
+            flight.error = e
+        finally:
+            async with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
+
+    @staticmethod
+    def _finished(table: dict, key: Hashable, fut: asyncio.Future):
+        table.pop(key, None)
+        if not fut.cancelled():
+            fut.exception()  # retrieved here so an unawaited failure is not logged as lost
+
+    def stats(self) -> dict:
+        total = self.leaders + self.coalesced
+        return {
+            "name": self.name,
+            "in_flight": len(self._calls) + len(self._streams),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+        }
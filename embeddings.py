@@ -0,0 +1,212 @@
+"""
+Local embedding backends for EMBED_MODEL, all CPU-only and interchangeable:
+
+* "torch" (default): sentence-transformers on PyTorch, float32 (the reference).
+* "int8": the same PyTorch model with its Linear layers dynamically quantized to
+  int8 (int8 weights, activations quantized per batch). No extra dependencies.
+* "onnx": the model exported to ONNX and run by onnxruntime through
+  sentence-transformers' ONNX backend (needs sentence-transformers>=3.2 and
+  optimum[onnxruntime]). EMBED_ONNX_FILE selects another export in the model repo,
+  e.g. onnx/model_quint8_avx2.onnx for a pre-quantized one.
+
+A non-reference backend is checked against "torch" on a fixed set of sentences when
+it loads; below EMBED_PARITY_MIN_COSINE (or if it cannot load) the reference is used
+instead, so query and ingest embeddings stay comparable with the existing index.
+The check loads the torch model as well, so its result is cached per model, backend
+and library versions (EMBED_PARITY_CACHE) and later starts skip it.
+"""
+import json
+import logging
+import os
+import time
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("embeddings")
+
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")                 # "torch" | "int8" | "onnx"
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))                # intra-op threads; 0 = runtime default
+EMBED_ENCODE_BATCH = int(os.getenv("EMBED_ENCODE_BATCH", "32"))     # texts per forward pass inside one call
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "")                  # "" = onnx/model.onnx (exported if missing)
+# the check loads a second (torch) copy of the model: about twice the load time and model
+# memory, until the reference is dropped. Cached in EMBED_PARITY_CACHE ("" = check on every load).
+EMBED_PARITY_CHECK = os.getenv("EMBED_PARITY_CHECK", "1") == "1"
+EMBED_PARITY_MIN_COSINE = float(os.getenv("EMBED_PARITY_MIN_COSINE", "0.98"))
+EMBED_PARITY_CACHE = os.getenv("EMBED_PARITY_CACHE", "./embed_parity.json")
+
+PARITY_SENTENCES = [
+    "What was the revenue growth in the third quarter?",
+    "The contract may be terminated by either party with 30 days written notice.",
+    "Install the package with pip and set OPENAI_API_KEY before starting the server.",
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "Le rapport annuel présente les résultats financiers de l'entreprise.",
+    "error: connection refused (ECONNREFUSED) at 127.0.0.1:8000",
+    "Table 4: median latency p50 12 ms, p99 48 ms, throughput 1,200 req/s",
+    "ok",
+]
+
+
+class Embedder:
+    """
+    Embeds texts with one backend. Callable like a Chroma embedding function
+    (texts -> one list of floats per text); `encode` returns a float32 array.
+    """
+
+    name: str
+
+    def __init__(self, model_name: str, threads: int = EMBED_THREADS):
+        self.model_name = model_name
+        self.threads = threads
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def __call__(self, input: Sequence[str]) -> List[List[float]]:
+        return self.encode(list(input)).tolist()
+
+
+class TorchEmbedder(Embedder):
+    """sentence-transformers on PyTorch, float32."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str, threads: int = EMBED_THREADS):
+        super().__init__(model_name, threads)
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=EMBED_ENCODE_BATCH, convert_to_numpy=True,
+                                 show_progress_bar=False).astype(np.float32, copy=False)
+
+
+class Int8Embedder(TorchEmbedder):
+    """The PyTorch model with nn.Linear weights quantized to int8 in place (dynamic quantization)."""
+
+    name = "int8"
+
+    def __init__(self, model_name: str, threads: int = EMBED_THREADS):
+        super().__init__(model_name, threads)
+        import torch
+        torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+class OnnxEmbedder(Embedder):
+    """The ONNX export of the model on onnxruntime's CPU provider."""
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, threads: int = EMBED_THREADS):
+        super().__init__(model_name, threads)
+        import onnxruntime as ort
+        from sentence_transformers import SentenceTransformer
+        options = ort.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        kwargs = {"provider": "CPUExecutionProvider", "session_options": options}
+        if EMBED_ONNX_FILE:
+            kwargs["file_name"] = EMBED_ONNX_FILE
+        self.model = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=kwargs)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=EMBED_ENCODE_BATCH, convert_to_numpy=True,
+                                 show_progress_bar=False).astype(np.float32, copy=False)
+
+
+BACKENDS: Dict[str, type] = {
+    "torch": TorchEmbedder,
+    "int8": Int8Embedder,
+    "onnx": OnnxEmbedder,
+}
+
+
+def parity(embedder: Embedder, reference: Embedder, texts: Sequence[str] = PARITY_SENTENCES) -> float:
+    """Lowest cosine similarity between the two embedders' vectors for the same texts."""
+    a, b = embedder.encode(list(texts)), reference.encode(list(texts))
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return float(np.min(np.sum(a * b, axis=1)))
+
+
+def _parity_key(model_name: str, backend: str) -> str:
+    """What a parity result depends on: model, backend, ONNX file and the runtime versions."""
+    parts = [model_name, backend, EMBED_ONNX_FILE]
+    for pkg in ("sentence-transformers", "transformers", "torch", "onnxruntime", "optimum"):
+        try:
+            parts.append(f"{pkg}=={version(pkg)}")
+        except PackageNotFoundError:
+            pass
+    return "|".join(parts)
+
+
+def _cached_parity(key: str) -> Optional[float]:
+    if not EMBED_PARITY_CACHE:
+        return None
+    try:
+        return float(json.loads(Path(EMBED_PARITY_CACHE).read_text())[key])
+    except (FileNotFoundError, KeyError, ValueError, TypeError):
+        return None
+
+
+def _store_parity(key: str, cos: float) -> None:
+    if not EMBED_PARITY_CACHE:
+        return
+    path = Path(EMBED_PARITY_CACHE)
+    try:
+        try:
+            cache = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            cache = {}
+        cache[key] = cos
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(cache, indent=1))
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning("Could not cache the embedding parity result in %s: %s", path, e)
+
+
+def load_embedder(model_name: str, backend: Optional[str] = None, threads: Optional[int] = None,
+                  check_parity: bool = EMBED_PARITY_CHECK) -> Embedder:
+    """Load `model_name` with `backend` (EMBED_BACKEND), falling back to "torch" if it fails to load or drifts."""
+    backend = backend or EMBED_BACKEND
+    threads = EMBED_THREADS if threads is None else threads
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBED_BACKEND {backend!r}; expected one of {sorted(BACKENDS)}")
+    t0 = time.perf_counter()
+    if backend == "torch":
+        embedder = TorchEmbedder(model_name, threads)
+    else:
+        try:
+            embedder = BACKENDS[backend](model_name, threads)
+            embedder.encode(PARITY_SENTENCES[:1])
+        except Exception as e:  # missing package, too-old sentence-transformers (no backend=), failed export...
+            logger.error("Embedding backend %r unavailable (%r); using torch", backend, e)
+            return TorchEmbedder(model_name, threads)
+    if backend != "torch" and check_parity:
+        key = _parity_key(model_name, backend)
+        cos, reference = _cached_parity(key), None
+        if cos is None:
+            reference = TorchEmbedder(model_name, threads)
+            try:
+                cos = parity(embedder, reference)
+            except Exception as e:
+                logger.error("Embedding backend %r failed the parity check (%r); using torch", backend, e)
+                return reference
+            _store_parity(key, cos)
+        if cos < EMBED_PARITY_MIN_COSINE:
+            logger.error("Embedding backend %r drifts from torch (min cosine %.4f < %.4f); using torch",
+                         backend, cos, EMBED_PARITY_MIN_COSINE)
+            return reference or TorchEmbedder(model_name, threads)
+        logger.info("Embedding backend %r parity with torch: min cosine %.4f%s", backend, cos,
+                    "" if reference else " (cached)")
+    logger.info("Embedding backend %r ready for %s in %.2fs (threads=%s)", backend, model_name,
+                time.perf_counter() - t0, threads or "default")
+    return embedder
@@ -0,0 +1,212 @@
+"""
+Shared async LLM client for the backend and the MCP server: one pooled HTTP
+client per process, a concurrency limit, per-call timeouts and retries with
+jittered backoff. LLM_PROVIDER=stub answers locally (no network, no key) for
+offline runs and load tests.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger("llm")
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")       # "openai" | "stub" ("fake" is an alias)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # in-flight completions per process
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "32"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))      # seconds for a whole completion
+LLM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "20"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5"))      # base seconds, doubled per attempt, +/-50% jitter
+LLM_STUB_TOKEN_DELAY = float(os.getenv("LLM_STUB_TOKEN_DELAY", os.getenv("FAKE_LLM_TOKEN_DELAY", "0.05")))
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", "0"))  # extra delay before the first stub token
+
+Messages = List[Dict[str, str]]
+
+
+class LLMError(RuntimeError):
+    """The completion failed after retries, timed out, or no provider is configured."""
+
+
+class StubProvider:
+    """Canned answer streamed on a timer; never touches the network."""
+
+    name = "stub"
+    retryable: tuple = ()
+    answer = "This is a stubbed answer generated from the retrieved context [1]."
+
+    async def stream(self, messages: Messages, model: str, temperature: float,
+                     max_tokens: int) -> AsyncIterator[str]:
+        if LLM_STUB_LATENCY:
+            await asyncio.sleep(LLM_STUB_LATENCY)
+        for word in self.answer.split(" "):
+            await asyncio.sleep(LLM_STUB_TOKEN_DELAY)
+            yield word + " "
+
+    async def aclose(self):
+        pass
+
+
+class OpenAIProvider:
+    """OpenAI chat completions over one pooled httpx client (created on first use)."""
+
+    name = "openai"
+
+    def __init__(self):
+        self._client = None
+        import openai
+        self.retryable = (openai.APIConnectionError, openai.APITimeoutError,
+                          openai.RateLimitError, openai.InternalServerError)
+
+    def _get_client(self):
+        if self._client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise LLMError("OPENAI_API_KEY not configured")
+            from openai import AsyncOpenAI
+            http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE),
+                timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            )
+            # retries are ours (jittered, and never after the first streamed token)
+            self._client = AsyncOpenAI(api_key=api_key, http_client=http, max_retries=0)
+        return self._client
+
+    async def stream(self, messages: Messages, model: str, temperature: float,
+                     max_tokens: int) -> AsyncIterator[str]:
+        stream = await self._get_client().chat.completions.create(
+            model=model, messages=messages, temperature=temperature,
+            max_tokens=max_tokens, stream=True,
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+PROVIDERS: Dict[str, Callable[[], object]] = {
+    "openai": OpenAIProvider,
+    "stub": StubProvider,
+    "fake": StubProvider,
+}
+
+
+def register_provider(name: str, factory: Callable[[], object]) -> None:
+    """Make `LLM_PROVIDER=<name>` use `factory()`: an object with name, retryable, stream() and aclose()."""
+    PROVIDERS[name] = factory
+
+
+class LLMClient:
+    def __init__(self, provider: Optional[str] = None, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 timeout: float = LLM_TIMEOUT, first_token_timeout: float = LLM_FIRST_TOKEN_TIMEOUT,
+                 retries: int = LLM_RETRIES, backoff: float = LLM_BACKOFF):
+        self.provider_name = provider or LLM_PROVIDER
+        self.timeout = timeout
+        self.first_token_timeout = first_token_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._max_concurrency = max_concurrency
+        self._provider = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.calls = 0
+        self.retried = 0
+        self.failures = 0
+        self.waiting = 0
+
+    @property
+    def provider(self):
+        if self._provider is None:
+            if self.provider_name not in PROVIDERS:
+                raise LLMError(f"Unknown LLM_PROVIDER {self.provider_name!r}")
+            self._provider = PROVIDERS[self.provider_name]()
+        return self._provider
+
+    @property
+    def is_stub(self) -> bool:
+        return self.provider.name == "stub"
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self._max_concurrency)
+        return self._sem
+
+    async def stream(self, messages: Messages, model: str, temperature: float = 0.2,
+                     max_tokens: int = 400) -> AsyncIterator[str]:
+        """
+        Yield answer tokens. Attempts that fail with a retryable error before the first
+        token are retried with jittered exponential backoff; a failure mid-stream is
+        not retried, since tokens already handed out cannot be taken back. Every
+        provider failure (including auth and bad-request errors) raises LLMError.
+        """
+        provider = self.provider
+        self.waiting += 1
+        try:
+            await self._semaphore().acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            self.calls += 1
+            for attempt in range(self.retries + 1):
+                started = False
+                deadline = time.monotonic() + self.timeout
+                it = provider.stream(messages, model, temperature, max_tokens).__aiter__()
+                try:
+                    while True:
+                        wait = deadline - time.monotonic()
+                        if not started:
+                            wait = min(wait, self.first_token_timeout)
+                        try:
+                            tok = await asyncio.wait_for(it.__anext__(), max(wait, 0.001))
+                        except StopAsyncIteration:
+                            return
+                        started = True
+                        yield tok
+                except LLMError:
+                    self.failures += 1
+                    raise
+                except Exception as e:
+                    retryable = isinstance(e, (asyncio.TimeoutError, *provider.retryable))
+                    if not retryable or started or attempt == self.retries:
+                        self.failures += 1
+                        raise LLMError(f"{provider.name} completion failed: {e!r}") from e
+                    delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    logger.warning("%s completion failed (%r); retry %d/%d in %.2fs",
+                                   provider.name, e, attempt + 1, self.retries, delay)
+                    self.retried += 1
+                    await asyncio.sleep(delay)
+                finally:
+                    await it.aclose()
+        finally:
+            self._semaphore().release()
+
+    async def complete(self, messages: Messages, model: str, temperature: float = 0.2,
+                       max_tokens: int = 400) -> str:
+        return "".join([tok async for tok in self.stream(messages, model, temperature, max_tokens)]).strip()
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider_name,
+            "max_concurrency": self._max_concurrency,
+            "in_flight": self._max_concurrency - self._sem._value if self._sem else 0,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "retried": self.retried,
+            "failures": self.failures,
+        }
+
+    async def aclose(self):
+        if self._provider is not None:
+            await self._provider.aclose()
+
+
+llm_client = LLMClient()
@@ -239,116 +239,908 @@
 
 
 from pathlib import Path
-from chromadb import PersistentClient
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-from pypdf import PdfReader
-from uuid import uuid4
+from bm25_index import BM25Index
+from embeddings import Embedder, load_embedder
+from vector_store import VectorStore, open_store, reset_stores
+import os
 import re
+import time
+import hashlib
 import logging
+import threading
+import multiprocessing
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator, NamedTuple, Union
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+_HYPHEN_BREAK = re.compile(r"-\n(?=\w)")
+_SINGLE_NEWLINE = re.compile(r"(?<!\n)\n(?!\n)")
+_HSPACE = re.compile(r"[ \t]+")
+_MANY_NEWLINES = re.compile(r"\n{3,}")
+
 def _reflow(text: str) -> str:
     t = text.replace("\r", "")
-    t = re.sub(r"-\n(?=\w)", "", t)
-    t = re.sub(r"(?<!\n)\n(?!\n)", " ", t)
-    t = re.sub(r"[ \t]+", " ", t)
-    t = re.sub(r"\n{3,}", "\n\n", t)
+    t = _HYPHEN_BREAK.sub("", t)
+    t = _SINGLE_NEWLINE.sub(" ", t)
+    t = _HSPACE.sub(" ", t)
+    t = _MANY_NEWLINES.sub("\n\n", t)
     return t.strip()
 
-def _pdf_text(file_path: Path) -> str:
+# ---------- PDF extraction ----------
+# Pages are extracted (and reflowed) one by one, in a process pool over page ranges
+# for large PDFs, so every chunk can be mapped back to the page it starts on.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))  # smaller PDFs stay in-process
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+PDF_SLOW_PAGE_S = float(os.getenv("PDF_SLOW_PAGE_S", "2.0"))
+PDF_MAX_INFLIGHT = int(os.getenv("PDF_MAX_INFLIGHT", str(2 * PDF_WORKERS)))  # page ranges extracted ahead
+TXT_READ_BLOCK = int(os.getenv("TXT_READ_BLOCK", str(1 << 20)))  # characters read per TXT block
+
+class PageText(NamedTuple):
+    page: int      # 1-based
+    text: str      # reflowed
+    seconds: float
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def _get_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _pdf_pool_lock:
+            if _pdf_pool is None:
+                _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+    return _pdf_pool
+
+def shutdown_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            _pdf_pool = None
+
+def _extract_pages(reader, start: int, stop: int) -> list:
+    out = []
+    for i in range(start, stop):
+        t0 = time.perf_counter()
+        try:
+            raw = reader.pages[i].extract_text() or ""
+        except Exception as e:
+            logger.warning("Failed to extract page %d: %s", i + 1, e)
+            raw = ""
+        out.append(PageText(i + 1, _reflow(raw), time.perf_counter() - t0))
+    return out
+
+def _extract_page_range(job: tuple) -> list:
+    # runs in a worker process; each worker opens its own reader
+    file_path, start, stop = job
+    from pypdf import PdfReader
+    return _extract_pages(PdfReader(str(file_path)), start, stop)
+
+def _log_page_timings(file_path: Path, n_pages: int, slow: list, empty: list, elapsed: float, report):
+    logger.info("Extracted %d pages of %s in %.2fs (%.1f pages/s, %d slow, %d empty)",
+                n_pages, file_path.name, elapsed, n_pages / max(elapsed, 1e-9), len(slow), len(empty))
+    if slow:
+        logger.warning("%s: slow pages (page, s): %s", file_path.name, slow[:20])
+    if empty:
+        logger.warning("%s: pages without a text layer (scanned?): %s", file_path.name, empty[:50])
+    report(slow_pages=slow, empty_pages=empty)
+
+def _pooled_page_ranges(file_path: Path, n: int, workers: int) -> Iterator[list]:
+    # in page order, with at most PDF_MAX_INFLIGHT ranges extracted ahead of the consumer
+    step = max(1, min(PDF_PAGES_PER_TASK, -(-n // workers)))
+    pool = _get_pdf_pool()
+    starts = iter(range(0, n, step))
+    inflight = deque()
+
+    def submit():
+        a = next(starts, None)
+        if a is not None:
+            inflight.append(pool.submit(_extract_page_range, (file_path, a, min(a + step, n))))
+
+    for _ in range(max(1, PDF_MAX_INFLIGHT)):
+        submit()
+    try:
+        while inflight:
+            batch = inflight.popleft().result()
+            submit()
+            yield batch
+    finally:
+        for fut in inflight:
+            fut.cancel()
+
+def _iter_pdf_pages(file_path: Path, report=None, workers: int | None = None) -> Iterator[PageText]:
+    """
+    Reflowed pages of a PDF, in order. PDFs with at least PDF_PARALLEL_MIN_PAGES pages
+    are split into page ranges extracted in a process pool (`workers=1` forces
+    in-process extraction, e.g. inside the bulk loader's own workers). If the pool
+    fails (a worker crashed, the pool broke), the remaining pages are extracted
+    in-process; any other extraction error propagates, so the ingest fails instead
+    of indexing a truncated document.
+    """
+    report = report or _no_progress
+    workers = PDF_WORKERS if workers is None else workers
+    from pypdf import PdfReader
+    t0 = time.perf_counter()
     try:
         reader = PdfReader(str(file_path))
-        raw = "\n".join((p.extract_text() or "") for p in reader.pages)
-        return _reflow(raw)
+        n = len(reader.pages)
     except Exception as e:
-        logger.error("Failed to extract PDF text for %s: %s", file_path, e)
-        return ""
+        logger.error("Failed to open PDF %s: %s", file_path, e)
+        return
+    report(pages_total=n)
+    pooled = workers > 1 and n >= PDF_PARALLEL_MIN_PAGES
+    batches = _pooled_page_ranges(file_path, n, workers) if pooled else \
+        (_extract_pages(reader, i, i + 1) for i in range(n))
+    done, slow, empty = 0, [], []
+    while True:
+        try:
+            for batch in batches:
+                for p in batch:
+                    if p.seconds >= PDF_SLOW_PAGE_S:
+                        slow.append((p.page, round(p.seconds, 2)))
+                    if not p.text:
+                        empty.append(p.page)
+                    yield p
+                    done += 1
+                report(pages_parsed=done)
+            break
+        except Exception as e:
+            if not pooled:
+                logger.error("Failed to extract PDF text for %s: %s", file_path, e)
+                raise
+            logger.warning("PDF worker pool failed on %s after %d of %d pages (%r); extracting the rest in-process",
+                           file_path, done, n, e)
+            if isinstance(e, BrokenProcessPool):
+                shutdown_pdf_pool()  # the next PDF gets a fresh pool
+            pooled = False
+            batches = (_extract_pages(reader, i, i + 1) for i in range(done, n))
+    _log_page_timings(file_path, done, slow, empty, time.perf_counter() - t0, report)
+
+def _iter_txt_blocks(file_path: Path, block: int = TXT_READ_BLOCK) -> Iterator[str]:
+    """Raw text of a TXT file, about `block` characters at a time, cut at paragraph breaks."""
+    buf = ""
+    with open(file_path, encoding="utf-8", errors="ignore") as f:
+        while data := f.read(block):
+            buf += data.replace("\r", "")
+            cut = buf.rfind("\n\n")
+            if cut == -1:
+                if len(buf) < 4 * block:
+                    continue
+                cut = buf.rfind(" ")  # no paragraph break for a while: cut between words
+                if cut <= 0:
+                    cut = len(buf)
+            yield buf[:cut]
+            buf = buf[cut:]
+    if buf:
+        yield buf
+
+# ---------- Chunking ----------
+# Sentence-aware, single-pass chunker. Chunks are sized in characters or in tokens
+# of the embedding model (CHUNK_UNIT=tokens), and carry their character offsets.
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "chars")
+# token default: 254 + [CLS] / [SEP] fits all-MiniLM-L6-v2's 256-token input without truncation
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "254" if CHUNK_UNIT == "tokens" else "900"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "40" if CHUNK_UNIT == "tokens" else "150"))
+
+# a sentence ends after [.!?] + whitespace or at a blank line. Written to start with a
+# character class, which lets `re` skip to candidates instead of trying every position
+_SENTENCE_BREAK = re.compile(r"[.!?\n](?:(?<=[.!?])\s+|\n+)")
+
+class Chunk(NamedTuple):
+    text: str
+    start: int  # character offsets into the (reflowed) input
+    end: int
+
+_token_length = None
+
+def _get_token_length():
+    """len() in tokens of the embedding model's tokenizer (cached)."""
+    global _token_length
+    if _token_length is None:
+        from transformers import AutoTokenizer
+        name = EMBED_MODEL if "/" in EMBED_MODEL else f"sentence-transformers/{EMBED_MODEL}"
+        tok = AutoTokenizer.from_pretrained(name)
+        _token_length = lambda s: len(tok.encode(s, add_special_tokens=False))
+    return _token_length
+
+def _cut(text: str, pos: int, max_chars: int) -> int:
+    """End of the piece starting at `pos`: the last whitespace of the next max_chars characters."""
+    limit = pos + max_chars
+    ws = max(text.rfind(" ", pos, limit), text.rfind("\n", pos, limit))
+    return ws + 1 if ws > pos + max_chars // 2 else limit
+
+def _split_long(offset: int, text: str, max_chars: int) -> Iterator[tuple[int, str]]:
+    """Cut text into pieces of at most max_chars, preferring the last whitespace of each window."""
+    pos, end = 0, len(text)
+    while end - pos > max_chars:
+        cut = _cut(text, pos, max_chars)
+        yield offset + pos, text[pos:cut]
+        pos = cut
+    if end > pos:
+        yield offset + pos, text[pos:end]
+
+def _sentence_ends(pieces: Iterable[str], max_chars: int) -> Iterator[tuple[int, str, list]]:
+    """
+    The sentences of a stream of text pieces, in batches of (offset, text, ends): `text`
+    continues the previous batch at `offset` and `ends` are the offsets at which its
+    sentences (incl. trailing whitespace) end. Each character is scanned once; runs longer
+    than `max_chars` without a sentence break are cut at whitespace, which also keeps the
+    carry-over buffer bounded. The output does not depend on how the text is split into pieces.
+    """
+    def run(pos: int, end: int):  # the ends of [pos, end) cut as _split_long cuts it
+        while end - pos > max_chars:
+            pos = _cut(buf, pos, max_chars)
+            ends.append(base + pos)
+        ends.append(base + end)
+
+    buf, base, scan_from = "", 0, 0
+    for piece in pieces:
+        buf += piece
+        # where a break may start that the next piece could still complete or extend
+        bound = len(buf) - 1 if buf.endswith(("\n", ".", "!", "?")) else len(buf)
+        breaks = [m.end() for m in _SENTENCE_BREAK.finditer(buf, scan_from)]
+        if breaks and breaks[-1] == len(buf):  # the break may continue into the next piece
+            breaks.pop()
+            bound = _SENTENCE_BREAK.search(buf, breaks[-1] if breaks else scan_from).start()
+        ends, last = [], 0
+        for e in breaks:
+            if e - last > max_chars:
+                run(last, e)
+            else:
+                ends.append(base + e)
+            last = e
+        # cut an unterminated run where run() would cut the whole run: each cut only
+        # looks at the next max_chars characters, so it need not wait for the run to end
+        while bound - last > max_chars:
+            last = _cut(buf, last, max_chars)
+            ends.append(base + last)
+        if last:
+            yield base, buf[:last], ends
+        buf, base = buf[last:], base + last
+        scan_from = max(0, bound - last)  # re-scan a break still in progress from its start
+    if buf.strip():
+        ends = []
+        run(0, len(buf))
+        yield base, buf, ends
+
+def _iter_sentences(pieces: Iterable[str], max_chars: int) -> Iterator[tuple[int, str]]:
+    """(offset, sentence incl. trailing whitespace) over a stream of text pieces."""
+    for offset, text, ends in _sentence_ends(pieces, max_chars):
+        pos = offset
+        for end in ends:
+            yield pos, text[pos - offset:end - offset]
+            pos = end
+
+def _pack_sentences(sentences: Iterable[tuple[int, str]], chunk_size: int, overlap: int,
+                    length: Callable[[str], int]) -> Iterator[Chunk]:
+    """
+    Pack (offset, sentence) into chunks of at most `chunk_size` by `length`, carrying about
+    `overlap` of trailing sentences into the next chunk. Every sentence is measured once.
+    """
+    def measured():
+        for offset, sent in sentences:
+            n = length(sent)
+            if n <= chunk_size:
+                yield offset, sent, n
+            else:  # token mode only: a sentence denser than 4 chars/token
+                step = max(1, len(sent) * chunk_size // n)
+                for off, part in _split_long(offset, sent, step):
+                    yield off, part, length(part)
+
+    window: deque = deque()  # (offset, sentence, size)
+    size = 0
+
+    def emit():
+        body = "".join(sent for _, sent, _ in window)
+        stripped = body.strip()
+        if not stripped:
+            return None
+        start = window[0][0] + len(body) - len(body.lstrip())
+        return Chunk(stripped, start, start + len(stripped))
+
+    for offset, sent, n in measured():
+        if window and size + n > chunk_size:
+            chunk = emit()
+            if chunk:
+                yield chunk
+            # carry trailing sentences (up to `overlap`) into the next window, never all of it,
+            # and only as much as still leaves room for the sentence that starts it
+            keep, kept, room = deque(), 0, min(overlap, chunk_size - n)
+            while len(window) > 1 and kept + window[-1][2] <= room:
+                item = window.pop()
+                keep.appendleft(item)
+                kept += item[2]
+            window, size = keep, kept
+        window.append((offset, sent, n))
+        size += n
+    if window:
+        chunk = emit()
+        if chunk:
+            yield chunk
+
+def _pack_chars(batches: Iterable[tuple[int, str, list]], chunk_size: int, overlap: int) -> Iterator[Chunk]:
+    """
+    _pack_sentences with len() over _sentence_ends batches, one step per chunk instead of per
+    sentence: sentences are contiguous, so a window's size is a difference of offsets, and its
+    last sentence and its carry-over are found by bisecting the sentence ends.
+    """
+    text, off = "", 0  # pending text, from offset `off`
+    ends: list = []  # where the pending sentences end
+    first, start = 0, 0  # the window's first sentence and where it starts
+
+    def emit(end: int):
+        body = text[start - off:end - off]
+        stripped = body.strip()
+        if not stripped:
+            return None
+        s = start + len(body) - len(body.lstrip())
+        return Chunk(stripped, s, s + len(stripped))
+
+    for _, seg, seg_ends in batches:
+        text += seg
+        ends += seg_ends
+        while True:
+            nxt = bisect_right(ends, start + chunk_size, first)
+            if nxt == len(ends):  # everything known still fits: the next sentence might too
+                break
+            end = ends[nxt - 1]
+            chunk = emit(end)
+            if chunk:
+                yield chunk
+            # carry the trailing sentences starting at or after end - room, never all of them
+            room = min(overlap, chunk_size - (ends[nxt] - end))
+            first = bisect_left(ends, end - room, first) + 1
+            start = ends[first - 1]
+        text, off = text[start - off:], start
+        del ends[:first]
+        first = 0
+    if ends:
+        chunk = emit(ends[-1])
+        if chunk:
+            yield chunk
+
+def iter_chunks(text: Union[str, Iterable[str]], chunk_size: int = None, overlap: int = None,
+                unit: str = None) -> Iterator[Chunk]:
+    """
+    Yield sentence-aligned chunks of at most `chunk_size` units (chars or tokens) with
+    about `overlap` units of trailing sentences repeated at the start of the next one.
+    `text` may be a string or an iterable of pieces (streamed with bounded memory).
+    Single pass: sentence boundaries are found with one regex scan; in chars mode chunks
+    are then cut by offset arithmetic, in tokens mode every sentence is measured once.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    overlap = CHUNK_OVERLAP if overlap is None else overlap
+    unit = unit or CHUNK_UNIT
+    pieces = [text] if isinstance(text, str) else text
+    if unit == "tokens":
+        sentences = _iter_sentences(pieces, chunk_size * 4)
+        return _pack_sentences(sentences, chunk_size, overlap, _get_token_length())
+    return _pack_chars(_sentence_ends(pieces, chunk_size), chunk_size, overlap)
 
 def _chunk_text(text: str, chunk_size: int = 900, overlap: int = 150):
-    chunks = []
-    start = 0
-    n = len(text)
-    while start < n:
-        end = min(n, start + chunk_size)
-        slice_ = text[start:end]
-        last_period = slice_.rfind(". ")
-        if last_period > chunk_size * 0.5:
-            end = start + last_period + 1
-            slice_ = text[start:end]
-        slice_ = slice_.strip()
-        if slice_:
-            chunks.append(slice_)
-        start = max(end - overlap, start + 1)
-    return chunks
-
-def _to_chunks_with_meta(file_path: Path):
+    return [c.text for c in iter_chunks(text, chunk_size, overlap, unit="chars")]
+
+def _file_hash(file_path: Path) -> str:
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _chunk_id(file_path: Path, text: str, tenant: str | None = None, source: str | None = None) -> str:
+    # content-addressed: the same chunk of the same source (of the same tenant) always gets the same id
+    source = source or file_path.name
+    key = f"{tenant}\0{source}\0{text}" if tenant else f"{source}\0{text}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return f"{file_path.stem}-{digest[:24]}"
+
+def _iter_chunks_with_meta(file_path: Path, report=None, file_hash: str | None = None,
+                           pdf_workers: int | None = None, tenant: str | None = None,
+                           source: str | None = None) -> Iterator[tuple]:
+    """
+    Stream (text, meta, id) for every chunk of a document. Pages (or TXT blocks) are
+    reflowed and chunked as they are read, so memory does not grow with the document.
+    `source` (default: the file name) is the name the chunks are indexed under.
+    Text repeated in the file yields the same id again; callers drop repeats.
+    """
+    source = source or file_path.name
     ext = file_path.suffix.lower()
     if ext == ".pdf":
-        txt = _pdf_text(file_path)
+        units = ((p.page, p.text) for p in _iter_pdf_pages(file_path, report=report, workers=pdf_workers))
     elif ext == ".txt":
-        raw = file_path.read_text(encoding="utf-8", errors="ignore")
-        txt = _reflow(raw)
+        units = ((-1, _reflow(raw)) for raw in _iter_txt_blocks(file_path))
     else:
-        return [], []
-    chunks = _chunk_text(txt)
-    uid = uuid4().hex
-    metas = []
-    ids = []
-    for i, ch in enumerate(chunks):
+        return
+    starts, numbers = [], []  # offset where each PDF page starts -> page number
+
+    def pieces():
+        pos = 0
+        for page, text in units:
+            if not text:
+                continue
+            if pos:
+                yield "\n\n"
+                pos += 2
+            if page > 0:
+                starts.append(pos)
+                numbers.append(page)
+            yield text
+            pos += len(text)
+
+    file_hash = file_hash or _file_hash(file_path)
+    for i, (ch, start, end) in enumerate(iter_chunks(pieces())):
+        cid = _chunk_id(file_path, ch, tenant, source)
         meta = {
-            "source": file_path.name,
-            "page": -1,  # using -1 instead of None
-            "chunk_id": f"{file_path.stem}-{uid}-c{i}"
+            "source": source,
+            "page": numbers[bisect_right(starts, start) - 1] if numbers else -1,  # -1 for TXT
+            "chunk_id": cid,
+            "chunk_index": i,
+            "char_start": start,
+            "char_end": end,
+            "file_hash": file_hash,
+            "tenant": tenant or NO_TENANT,
         }
+        yield ch, meta, cid
+
+def _to_chunks_with_meta(file_path: Path, report=None, file_hash: str | None = None,
+                         pdf_workers: int | None = None, tenant: str | None = None):
+    docs, metas, ids, seen = [], [], [], set()
+    for doc, meta, cid in _iter_chunks_with_meta(file_path, report, file_hash, pdf_workers, tenant):
+        if cid in seen:  # identical chunk text twice in one file: index it once
+            continue
+        seen.add(cid)
+        docs.append(doc)
         metas.append(meta)
-        ids.append(meta["chunk_id"])
-    return chunks, metas, ids
+        ids.append(cid)
+    return docs, metas, ids
+
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
+EMBED_MODEL = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+ADD_BATCH_SIZE = int(os.getenv("INGEST_ADD_BATCH", "256"))  # chunks embedded + added per col.add
+INGEST_MAX_BUFFER_MB = float(os.getenv("INGEST_MAX_BUFFER_MB", "16"))  # chunk text buffered before a flush
+
+# Process-wide singletons: the model weights (EMBED_BACKEND: torch | int8 | onnx) and
+# the vector store (VECTOR_STORE) are loaded once and shared by every upload / worker
+# thread in this process.
+_lock = threading.Lock()
+_embedding_func = None
+
+def _get_embedding_function() -> Embedder:
+    global _embedding_func
+    if _embedding_func is None:
+        with _lock:
+            if _embedding_func is None:
+                t0 = time.perf_counter()
+                # loaded here, not at import: torch / onnxruntime cost seconds and most importers never embed
+                _embedding_func = load_embedder(EMBED_MODEL)
+                logger.info("Loaded embedding model %s (%s) in %.2fs", EMBED_MODEL, _embedding_func.name,
+                            time.perf_counter() - t0)
+    return _embedding_func
+
+# Tenants: chunks uploaded for a tenant record it in their metadata and are filtered
+# on it; tenants listed in TENANT_SHARDS ("*" for all) get a collection and BM25 index
+# of their own instead of sharing "docs". Chunks uploaded without a tenant are tagged
+# NO_TENANT, so untenanted queries and deletes can be kept off tenants' chunks (the
+# API treats an empty tenant as none, so no tenant can be called that).
+TENANT_SHARDS = frozenset(t.strip() for t in os.getenv("TENANT_SHARDS", "").split(",") if t.strip())
+NO_TENANT = ""
+TENANT_TAGS_FILE = Path(CHROMA_PATH) / "docs.tenant_tags"  # written once untagged chunks are tagged
+_tenant_tags_lock = threading.Lock()
+_tenant_tags_done = False
 
-def _get_collection():
-    embedding_func = SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-    client = PersistentClient(path="./chroma_db")
+def collection_name(tenant: str | None = None) -> str:
+    if not tenant or not ("*" in TENANT_SHARDS or tenant in TENANT_SHARDS):
+        return "docs"
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "-", tenant)[:40]
+    return f"docs-{slug}-{hashlib.sha1(tenant.encode('utf-8')).hexdigest()[:8]}"
+
+def _get_collection(tenant: str | None = None) -> VectorStore:
+    name = collection_name(tenant)
+    if name == "docs" and not _tenant_tags_done:
+        tag_untenanted()
+    return open_store(CHROMA_PATH, name, _get_embedding_function())
+
+def tag_untenanted(page: int = 5000) -> int:
+    """
+    Tag the shared collection's chunks written before untenanted chunks carried
+    NO_TENANT, once per index (TENANT_TAGS_FILE records it). Metadata only; returns the count.
+    """
+    global _tenant_tags_done
+    with _tenant_tags_lock:
+        if _tenant_tags_done or TENANT_TAGS_FILE.exists():
+            _tenant_tags_done = True
+            return 0
+        col = open_store(CHROMA_PATH, "docs", _get_embedding_function())
+        n, offset = 0, 0
+        while True:
+            got = col.get(limit=page, offset=offset, include=["metadatas"])
+            ids = got.get("ids", [])
+            if not ids:
+                break
+            todo = [(cid, dict(m or {}, tenant=NO_TENANT)) for cid, m in zip(ids, got.get("metadatas") or [])
+                    if "tenant" not in (m or {})]
+            if todo:
+                col.update(ids=[t[0] for t in todo], metadatas=[t[1] for t in todo])
+                n += len(todo)
+            offset += len(ids)
+        TENANT_TAGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        TENANT_TAGS_FILE.write_text(str(n))
+        _tenant_tags_done = True
+    if n:
+        logger.info("Tagged %d untenanted chunks with the no-tenant tag", n)
+    return n
+
+# Index generation: bumped after every write so readers (the MCP server's query
+# cache) can tell that cached results may be stale. Lives next to the vector data.
+GENERATION_FILE = Path(CHROMA_PATH) / "docs.generation"
+_generation_lock = threading.Lock()
+
+def read_generation() -> int:
+    try:
+        return int(GENERATION_FILE.read_text().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+def bump_generation() -> int:
+    with _generation_lock:
+        gen = read_generation() + 1
+        GENERATION_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = GENERATION_FILE.with_suffix(".tmp")
+        tmp.write_text(str(gen))
+        os.replace(tmp, GENERATION_FILE)
+    return gen
+
+def warmup():
+    """Load the model, open the collection and embed once so the first upload doesn't pay for it."""
+    t0 = time.perf_counter()
+    _get_collection()
+    _get_embedding_function()(["warmup"])
+    logger.info("load_data warmup done in %.2fs", time.perf_counter() - t0)
+
+def _reset_singletons():
+    """Drop the cached model/stores (benchmarks use this to measure the cold path)."""
+    global _embedding_func
+    with _lock:
+        _embedding_func = None
+        reset_stores()
+        _bm25s.clear()
+
+# Lexical side index for hybrid retrieval, kept in step with every vector-store write.
+# It also serves as the source -> chunk-id index used for scoped queries.
+BM25_PATH = os.getenv("BM25_PATH", str(Path(CHROMA_PATH) / "bm25.sqlite3"))
+_bm25s: dict = {}
+
+def _get_bm25(tenant: str | None = None) -> BM25Index:
+    name = collection_name(tenant)
+    bm25 = _bm25s.get(name)
+    if bm25 is None:
+        with _lock:
+            bm25 = _bm25s.get(name)
+            if bm25 is None:
+                path = BM25_PATH if name == "docs" else str(Path(CHROMA_PATH) / f"bm25-{name}.sqlite3")
+                bm25 = _bm25s[name] = BM25Index(path)
+    return bm25
+
+def rebuild_bm25(page_size: int = 5000, tenant: str | None = None) -> int:
+    """Re-index every stored chunk into the BM25 index (e.g. for collections built before it existed)."""
+    col, bm25 = _get_collection(tenant), _get_bm25(tenant)
+    bm25.clear()
+    n = 0
+    while True:
+        got = col.get(include=["documents", "metadatas"], limit=page_size, offset=n)
+        ids = got.get("ids", [])
+        if not ids:
+            break
+        by_tenant: dict = {}
+        for cid, doc, meta in zip(ids, got["documents"], got["metadatas"]):
+            meta = meta or {}
+            by_tenant.setdefault(meta.get("tenant", ""), []).append((cid, doc, meta.get("source", "")))
+        for t, rows in by_tenant.items():
+            bm25.add([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows], tenant=t)
+        n += len(ids)
+    bump_generation()
+    logger.info("Rebuilt BM25 index with %d chunks", n)
+    return n
+
+def _no_progress(**kw):
+    pass
+
+class _ChunkBuffer:
+    """
+    Chunks waiting to be written; full after `max_items` chunks or `max_bytes` of text.
+    A chunk id already in the buffer (the same text twice in a file) is not added again.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int):
+        self.max_items, self.max_bytes = max_items, max_bytes
+        self.docs, self.metas, self.ids, self.nbytes = [], [], [], 0
+        self._seen = set()
+
+    def add(self, doc: str, meta: dict, cid: str) -> bool:
+        if cid in self._seen:
+            return False
+        self._seen.add(cid)
+        self.docs.append(doc)
+        self.metas.append(meta)
+        self.ids.append(cid)
+        self.nbytes += len(doc)
+        return len(self.ids) >= self.max_items or self.nbytes >= self.max_bytes
+
+    def take(self) -> tuple:
+        out = self.docs, self.metas, self.ids
+        self.docs, self.metas, self.ids, self.nbytes = [], [], [], 0
+        self._seen = set()
+        return out
+
+def _existing_chunks(col, source: str, tenant: str | None = None) -> dict:
+    where = {"$and": [{"source": source}, {"tenant": tenant or NO_TENANT}]}
+    got = col.get(where=where, include=["metadatas"])
+    return dict(zip(got.get("ids", []), got.get("metadatas") or []))
+
+def _is_unchanged(done: tuple | None, file_hash: str) -> bool:
+    # `done` is the source's ingest marker (BM25Index.ingested): it is only written once every
+    # chunk is in, so a file whose last ingest failed or died halfway is never "unchanged"
+    return done is not None and done[0] == file_hash
+
+def _delete_where(col, source: str, tenant: str | None = None, cond: dict | None = None,
+                  page: int = 5000) -> int:
+    """Delete `source`'s chunks (of `tenant`) whose metadata also match `cond`, a page at a time."""
+    where = {"$and": [{"source": source}, {"tenant": tenant or NO_TENANT}] + ([cond] if cond else [])}
+    n = 0
+    while True:
+        ids = col.get(where=where, limit=page, include=[]).get("ids", [])
+        if not ids:
+            return n
+        _delete_chunks(col, ids, tenant)
+        n += len(ids)
+
+def _discard_partial(col, source: str, tenant: str | None, file_hash: str):
+    """After a failed ingest, drop the chunks it already wrote (they carry its `file_hash`)."""
     try:
-        col = client.get_collection(name="docs")
-        logger.info("Got existing Chroma collection 'docs'")
+        n = _delete_where(col, source, tenant, {"file_hash": file_hash})
+        logger.info("Removed %d partially ingested chunks of %s", n, source)
     except Exception as e:
-        logger.warning("Could not get existing collection: %s. Creating new one.", e)
-        col = client.create_collection(name="docs", embedding_function=embedding_func)
-    return col
-
-def ingest_file(file_path: Path) -> int:
-    col = _get_collection()
-    chunks, metas, ids = _to_chunks_with_meta(file_path)
-    if not chunks:
-        logger.warning("No chunks generated for file %s", file_path)
+        logger.error("Could not remove partially ingested chunks of %s: %s", source, e, exc_info=True)
+
+def _refresh_chunks(col, docs: list, metas: list, ids: list, tenant: str | None = None):
+    # metadata only: cheap (no embedding) and heals indexes created before the BM25 side index
+    col.update(ids=ids, metadatas=metas)
+    _get_bm25(tenant).add(ids, docs, [m["source"] for m in metas], tenant=tenant or "")
+
+def _delete_chunks(col, ids: list, tenant: str | None = None):
+    if ids:
+        col.delete(ids=ids)
+        _get_bm25(tenant).delete(ids)
+
+def _sync_source(col, existing: dict, docs: list, metas: list, ids: list, tenant: str | None = None):
+    """
+    Reconcile one source's chunks with what is already indexed: chunks whose id
+    (content hash) is already present only get their metadata refreshed, chunks
+    that disappeared are deleted. Returns (docs, metas, ids) still to embed,
+    plus the unchanged and removed counts.
+    """
+    kept = [k for k, cid in enumerate(ids) if cid in existing]
+    if kept:
+        _refresh_chunks(col, [docs[k] for k in kept], [metas[k] for k in kept], [ids[k] for k in kept], tenant)
+    stale = list(existing.keys() - set(ids))
+    _delete_chunks(col, stale, tenant)
+    new = [k for k, cid in enumerate(ids) if cid not in existing]
+    return [docs[k] for k in new], [metas[k] for k in new], [ids[k] for k in new], len(kept), len(stale)
+
+def ingest_file(file_path: Path, progress=None, tenant: str | None = None, bump: bool = True,
+                source: str | None = None) -> int:
+    """
+    Chunk, embed and index one file; idempotent. An unchanged file (same content
+    hash) is skipped, a changed one only gets its new chunks embedded and its
+    vanished chunks removed. Returns the number of chunks indexed for the file.
+    "Unchanged" needs the done marker written after the last chunk, and a failed
+    ingest removes the chunks it wrote, so a partial file is never skipped.
+
+    The file is streamed: chunks are written every ADD_BATCH_SIZE chunks (or
+    INGEST_MAX_BUFFER_MB of text), which chunks are already indexed is looked up per
+    batch and stale ones are deleted page by page, so peak memory does not depend on
+    its size.
+
+    With `tenant`, chunks are tagged with it (and go to its shard, see TENANT_SHARDS).
+    `source` overrides the name the file is indexed (and later deleted) under, e.g. to
+    keep same-named uploads of different sessions apart; default: the file name.
+    With bump=False the caller publishes the write (bump_generation) itself.
+
+    `progress(**fields)` is called as work advances with pages_total / pages_parsed /
+    chunks_total / chunks_unchanged / chunks_embedded counts, slow_pages /
+    empty_pages once a PDF is extracted, or error=<message>.
+    """
+    report = progress or _no_progress
+    col, bm25 = _get_collection(tenant), _get_bm25(tenant)
+    file_hash = _file_hash(file_path)
+    source = source or file_path.name
+    done = bm25.ingested(source, tenant or "")
+    if _is_unchanged(done, file_hash):
+        logger.info("Skipping %s: unchanged since last ingest (%d chunks)", file_path, done[1])
+        report(chunks_total=done[1], chunks_unchanged=done[1])
+        return done[1]
+    bm25.forget_ingested(source, tenant or "")  # not "done" again until the last chunk is written
+
+    batch = _ChunkBuffer(ADD_BATCH_SIZE, int(INGEST_MAX_BUFFER_MB * (1 << 20)))
+    n_new = n_kept = 0
+
+    def flush():
+        # which chunks are already indexed is asked per batch, so nothing here grows with the file
+        nonlocal n_new, n_kept
+        docs, metas, ids = batch.take()
+        if not ids:
+            return
+        present = set(col.get(ids=ids, include=[]).get("ids", []))
+        old = [k for k, cid in enumerate(ids) if cid in present]
+        new = [k for k, cid in enumerate(ids) if cid not in present]
+        if old:
+            _refresh_chunks(col, [docs[k] for k in old], [metas[k] for k in old], [ids[k] for k in old], tenant)
+            n_kept += len(old)
+        if new:
+            docs, metas, ids = [docs[k] for k in new], [metas[k] for k in new], [ids[k] for k in new]
+            col.add(documents=docs, metadatas=metas, ids=ids)
+            bm25.add(ids, docs, [m["source"] for m in metas], tenant=tenant or "")
+            n_new += len(ids)
+        report(chunks_total=n_new + n_kept, chunks_embedded=n_new, chunks_unchanged=n_kept)
+
+    try:
+        for doc, meta, cid in _iter_chunks_with_meta(file_path, report=report, file_hash=file_hash, tenant=tenant,
+                                                      source=source):
+            if batch.add(doc, meta, cid):
+                flush()
+        flush()
+        n = n_new + n_kept
+        report(chunks_total=n)
+        if not n:
+            logger.warning("No chunks generated for file %s", file_path)
+            return 0
+        # every chunk written above carries this file_hash; the rest is the previous version's
+        stale = _delete_where(col, source, tenant, {"file_hash": {"$ne": file_hash}})
+        bm25.mark_ingested(source, file_hash, n, tenant or "")
+        logger.info("Ingested %s: %d new, %d unchanged, %d stale removed",
+                    file_path, n_new, n_kept, stale)
+        return n
+    except Exception as e:
+        logger.error("Error adding to the vector store for file %s: %s", file_path, e, exc_info=True)
+        report(error=f"Indexing failed: {e}")
+        _discard_partial(col, source, tenant, file_hash)
         return 0
-    # Sanitization: no None in metadata values
-    for m in metas:
-        for k, v in list(m.items()):
-            if v is None:
-                # Remove or set to default
-                del m[k]
+    finally:
+        if bump:
+            bump_generation()
+
+def delete_source(source: str, tenant: str | None = None, bump: bool = True) -> int:
+    """Remove every chunk of `source` (of `tenant`) from the vector store and BM25; returns the count."""
+    col = _get_collection(tenant)
+    _get_bm25(tenant).forget_ingested(source, tenant or "")
+    n = _delete_where(col, source, tenant)
+    logger.info("Deleted %s%s: %d chunks", source, f" (tenant {tenant})" if tenant else "", n)
+    if bump and n:
+        bump_generation()
+    return n
+
+# ---------- Bulk ingestion ----------
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH", "256"))   # texts per embedding forward pass
+BULK_ADD_BATCH = int(os.getenv("INGEST_BULK_ADD_BATCH", "4096"))  # chunks per col.add in bulk mode
+
+def _chunks_for_bulk(job: tuple):
+    # runs in a worker process: extraction + chunking only, no model / Chroma
+    file_path, file_hash, tenant = job
     try:
-        col.add(documents=chunks, metadatas=metas, ids=ids)
-        logger.info("Ingested %d chunks from %s", len(chunks), file_path)
-        return len(chunks)
+        # documents are already spread over processes; don't nest a page pool
+        return _to_chunks_with_meta(file_path, file_hash=file_hash, pdf_workers=1, tenant=tenant)
     except Exception as e:
-        logger.error("Error adding to Chroma collection for file %s: %s", file_path, e, exc_info=True)
+        logger.error("Failed to chunk %s: %s", file_path, e, exc_info=True)
+        return [], [], []
+
+def _embed_and_add(col, docs: list, metas: list, ids: list, embed_batch_size: int, tenant: str | None = None):
+    ef = _get_embedding_function()
+    embeddings = []
+    for i in range(0, len(docs), embed_batch_size):
+        embeddings.extend(ef(docs[i:i + embed_batch_size]))
+    col.add(ids=ids, embeddings=embeddings, documents=docs, metadatas=metas)
+    _get_bm25(tenant).add(ids, docs, [m["source"] for m in metas], tenant=tenant or "")
+
+def ingest_documents_in_dir(dir_path: Path, workers: int | None = None,
+                            embed_batch_size: int = EMBED_BATCH_SIZE,
+                            add_batch_size: int = BULK_ADD_BATCH, tenant: str | None = None) -> int:
+    """
+    Bulk-ingest every .pdf/.txt in `dir_path`: extraction and chunking run in a
+    process pool, embeddings are computed `embed_batch_size` texts at a time and
+    chunks from many files are grouped into `add_batch_size` col.add calls.
+    Files whose content hash is already indexed are skipped before extraction,
+    and only new chunks of changed files are embedded. Returns chunks embedded.
+    """
+    files = sorted(fp for fp in dir_path.glob("*") if fp.suffix.lower() in {".pdf", ".txt"})
+    if not files:
+        logger.info("No .pdf/.txt files in %s", dir_path)
         return 0
 
-def ingest_documents_in_dir(dir_path: Path):
-    count = 0
-    for fp in dir_path.glob("*"):
-        if fp.suffix.lower() not in {".pdf", ".txt"}:
+    t0 = time.perf_counter()
+    count = n_docs = n_skipped = n_kept = n_stale = 0
+    docs, metas, ids = [], [], []
+    col, bm25 = _get_collection(tenant), _get_bm25(tenant)
+    add_batch_size = min(add_batch_size, col.max_batch_size)
+    todo, existing_by_file = [], {}
+    for fp in files:
+        fh = _file_hash(fp)
+        if _is_unchanged(bm25.ingested(fp.name, tenant or ""), fh):
+            n_skipped += 1
             continue
-        added = ingest_file(fp)
-        count += added
-    logger.info("Total chunks ingested from %s: %d", dir_path, count)
+        todo.append((fp, fh, tenant))
+        existing_by_file[fp] = _existing_chunks(col, fp.name, tenant)
+        bm25.forget_ingested(fp.name, tenant or "")
+
+    # files whose chunks are (partly) still queued: (name, hash, chunks, `queued` once its last one was)
+    pending, queued = deque(), 0
+
+    def mark_done():
+        while pending and pending[0][3] <= count:
+            name, fh, n, _ = pending.popleft()
+            bm25.mark_ingested(name, fh, n, tenant or "")
+
+    try:
+        # spawn, not fork: the parent holds torch / Chroma threads that must not be forked
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            results = pool.map(_chunks_for_bulk, todo, chunksize=4)
+            for (fp, fh, _), (f_docs, f_metas, f_ids) in zip(todo, results):
+                if not f_docs:
+                    logger.warning("No chunks generated for file %s", fp)
+                    continue
+                n_docs += 1
+                n_chunks = len(f_ids)
+                pending.append((fp.name, fh, n_chunks, None))
+                f_docs, f_metas, f_ids, kept, stale = _sync_source(col, existing_by_file.pop(fp), f_docs, f_metas, f_ids, tenant)
+                n_kept += kept; n_stale += stale
+                docs.extend(f_docs); metas.extend(f_metas); ids.extend(f_ids)
+                queued += len(f_ids)
+                pending[-1] = (fp.name, fh, n_chunks, queued)
+                while len(docs) >= add_batch_size:
+                    _embed_and_add(col, docs[:add_batch_size], metas[:add_batch_size], ids[:add_batch_size],
+                                   embed_batch_size, tenant)
+                    count += add_batch_size
+                    del docs[:add_batch_size], metas[:add_batch_size], ids[:add_batch_size]
+                    mark_done()
+                mark_done()
+            if docs:
+                _embed_and_add(col, docs, metas, ids, embed_batch_size, tenant)
+                count += len(docs)
+            mark_done()
+    except Exception:
+        for name, fh, _, _ in pending:
+            _discard_partial(col, name, tenant, fh)
+        raise
+    finally:
+        if todo:
+            bump_generation()
+
+    elapsed = time.perf_counter() - t0
+    logger.info("Total chunks ingested from %s: %d (%d docs in %.1fs: %.2f docs/s, %.1f chunks/s)",
+                dir_path, count, n_docs, elapsed, n_docs / elapsed, count / elapsed)
+    logger.info("Incremental: %d unchanged files skipped, %d unchanged chunks kept, %d stale chunks removed",
+                n_skipped, n_kept, n_stale)
     return count
 
 # If run as script
 if __name__ == "__main__":
-    import sys
-    path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("data/sample_docs")
-    ingest_documents_in_dir(path)
+    import argparse
+    ap = argparse.ArgumentParser(description="Bulk-ingest a directory of .pdf/.txt files into the vector store")
+    ap.add_argument("path", nargs="?", default="data/sample_docs")
+    ap.add_argument("--workers", type=int, default=None, help="extraction processes (default: CPU count)")
+    ap.add_argument("--embed-batch", type=int, default=EMBED_BATCH_SIZE)
+    ap.add_argument("--add-batch", type=int, default=BULK_ADD_BATCH)
+    ap.add_argument("--rebuild-bm25", action="store_true", help="re-index existing chunks into the BM25 index first")
+    ap.add_argument("--tenant", default=None, help="tag the documents with this tenant (see TENANT_SHARDS)")
+    args = ap.parse_args()
+    if args.rebuild_bm25:
+        rebuild_bm25(tenant=args.tenant)
+    ingest_documents_in_dir(Path(args.path), workers=args.workers, embed_batch_size=args.embed_batch,
+                            add_batch_size=args.add_batch, tenant=args.tenant)
@@ -1,5 +1,8 @@
 import os
+import json
+import time
 import socket
+import uuid
 import streamlit as st
 import requests
 
@@ -8,6 +11,8 @@ try:
     socket.gethostbyname("rag-backend")
 except socket.error:
     API_URL = "http://localhost:8001"
+TENANT = os.getenv("RAG_TENANT") or None  # optional: scope this deployment's uploads and queries
+INGEST_WAIT_S = float(os.getenv("INGEST_WAIT_S", "900"))  # give up waiting for an upload's ingestion
 
 st.title("Agentic RAG MCP Document Q&A")
 
@@ -18,28 +23,41 @@ for key, default in {
     "sources": [],
     "is_querying": False,
     "query_count": 0,
-    "uploaded_ok": False
+    "uploaded_ok": False,
+    "session_id": uuid.uuid4().hex,  # queries only search the documents this browser session uploaded
 }.items():
     if key not in st.session_state:
         st.session_state[key] = default
 
-def do_query():
+def do_query(answer_placeholder):
     st.session_state.is_querying = True
     st.session_state.query_count += 1
-    # Use placeholder or st.write for debug if needed
-    #st.write(f"DEBUG → [frontend] Sending query attempt #{st.session_state.query_count}")
-    payload = {"question": st.session_state.question.strip()}
+    payload = {"question": st.session_state.question.strip(),
+               "session_id": st.session_state.session_id, "tenant": TENANT}
+    st.session_state.answer = None
+    st.session_state.sources = []
     try:
-        resp = requests.post(f"{API_URL}/query/", json=payload)
-        st.write(f"DEBUG → HTTP status: {resp.status_code}")
-        if resp.status_code == 200:
-            data = resp.json()
-            st.write(f"DEBUG → response JSON: {data}")
-            st.session_state.answer = data.get("answer")
-            st.session_state.sources = data.get("sources", [])
-        else:
-            st.session_state.answer = f"Error: {resp.status_code} – {resp.text}"
-            st.session_state.sources = []
+        # NDJSON events from /query/stream: hits first, then answer tokens, then done
+        with requests.post(f"{API_URL}/query/stream", json=payload, stream=True) as resp:
+            if resp.status_code != 200:
+                st.session_state.answer = f"Error: {resp.status_code} – {resp.text}"
+                return
+            partial = ""
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                ev = json.loads(line)
+                if ev.get("event") == "hits":
+                    st.session_state.sources = ev.get("sources", [])
+                elif ev.get("event") == "token":
+                    partial += ev.get("text", "")
+                    answer_placeholder.markdown(
+                        f"**Answer (query #{st.session_state.query_count}):**\n\n{partial}▌")
+                elif ev.get("event") == "done":
+                    st.session_state.answer = ev.get("answer", partial)
+                    st.session_state.sources = ev.get("sources", st.session_state.sources)
+            if st.session_state.answer is None:
+                st.session_state.answer = partial
     except Exception as e:
         st.session_state.answer = f"Exception during query: {e}"
         st.session_state.sources = []
@@ -50,17 +68,51 @@ def do_query():
 st.header("Upload a Document")
 uploaded_file = st.file_uploader("Choose a .txt or .pdf file", type=["txt", "pdf"])
 
+def wait_for_ingest(job_id: str) -> dict:
+    """
+    Poll /jobs/{id} until ingestion finishes, showing progress while it runs. A non-200
+    answer (job lost in a server restart, backend or MCP server down) or running past
+    INGEST_WAIT_S ends the wait as an error.
+    """
+    status = st.empty()
+    deadline = time.monotonic() + INGEST_WAIT_S
+    while True:
+        try:
+            r = requests.get(f"{API_URL}/jobs/{job_id}", timeout=10)
+        except requests.RequestException as e:
+            status.empty()
+            return {"status": "error", "errors": [f"could not check ingestion status: {e}"]}
+        if r.status_code != 200:
+            status.empty()
+            return {"status": "error", "errors": [f"ingestion status unavailable ({r.status_code}): {r.text[:200]}"]}
+        job = r.json()
+        if job.get("status") in ("done", "error"):
+            status.empty()
+            return job
+        if time.monotonic() > deadline:
+            status.empty()
+            return {"status": "error", "errors": [f"still not ingested after {INGEST_WAIT_S:.0f}s (job {job_id})"]}
+        status.info(f"Ingesting… {job.get('pages_parsed', 0)}/{job.get('pages_total') or '?'} pages parsed, "
+                    f"{job.get('chunks_embedded', 0)}/{job.get('chunks_total', 0)} chunks embedded")
+        time.sleep(0.5)
+
 if uploaded_file is not None and not st.session_state.uploaded_ok:
     files = {"file": (uploaded_file.name, uploaded_file.getvalue())}
     with st.spinner("Uploading and ingesting the document..."):
-        resp = requests.post(f"{API_URL}/upload_document/", files=files)
-    if resp.status_code == 200:
-        st.success("Document uploaded successfully!")
+        form = {"session_id": st.session_state.session_id, **({"tenant": TENANT} if TENANT else {})}
+        resp = requests.post(f"{API_URL}/upload_document/", files=files, data=form)
+        job = wait_for_ingest(resp.json()["job_id"]) if resp.status_code == 202 else None
+    if job and job.get("status") == "done":
+        st.success(f"Document uploaded successfully! ({job.get('chunks_total')} chunks)")
         st.session_state.uploaded_ok = True
+        if job.get("empty_pages"):
+            st.warning(f"No text found on pages {job['empty_pages'][:20]} (scanned images are not OCR'd).")
         # Reset previous query / answer
         st.session_state.answer = None
         st.session_state.sources = []
         st.session_state.query_count = 0
+    elif job:
+        st.error(f"Ingestion error: {'; '.join(job.get('errors') or ['unknown error'])}")
     else:
         st.error(f"Upload error: {resp.status_code} – {resp.text}")
 
@@ -69,15 +121,14 @@ st.header("Ask a Question")
 st.text_input("Your question:", key="question")
 
 # Place the button in a separate row, so layout is clearer
-if st.button("Get Answer", on_click=do_query, disabled=st.session_state.is_querying):
-    pass  # on_click will call do_query
-
-if st.session_state.is_querying:
-    st.info("Querying…")
+clicked = st.button("Get Answer", disabled=st.session_state.is_querying)
 
-# Use placeholder to avoid ghost/duplicate text
+# Use placeholder to avoid ghost/duplicate text; tokens stream into it
 answer_placeholder = st.empty()
 
+if clicked:
+    do_query(answer_placeholder)
+
 if st.session_state.answer is not None:
     answer_placeholder.markdown(f"**Answer (query #{st.session_state.query_count}):**\n\n{st.session_state.answer}")
 
@@ -85,6 +136,6 @@ if st.session_state.answer is not None:
         st.markdown("### Sources")
         for i, s in enumerate(st.session_state.sources, start=1):
             src = s.get("source") or "unknown"
-            pg = f"p.{s.get('page')}" if s.get("page") is not None else ""
+            pg = f"p.{s.get('page')}" if (s.get("page") or -1) > 0 else ""
             with st.expander(f"[{i}] {src} {pg} — score {s.get('score')}"):
                 st.write(s.get("text", "")[:2000])
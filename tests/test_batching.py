@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from batching import MicroBatcher
+
+
+class Recorder:
+    """Batch function that records each batch and fails on items equal to "bad"."""
+
+    def __init__(self, delay: float = 0.0):
+        self.batches = []
+        self.delay = delay
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        time.sleep(self.delay)
+        if "bad" in items:
+            raise ValueError("cannot embed 'bad'")
+        return [f"v({x})" for x in items]
+
+
+def test_flushes_when_the_batch_is_full():
+    fn = Recorder()
+    b = MicroBatcher(fn, max_batch=4, max_wait_ms=10_000)
+    t0 = time.perf_counter()
+    futures = [b.submit(i) for i in range(8)]
+    assert [f.result(timeout=5) for f in futures] == [f"v({i})" for i in range(8)]
+    assert time.perf_counter() - t0 < 5  # never waited out max_wait
+    assert fn.batches == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    b.close()
+
+
+def test_flushes_a_partial_batch_after_max_wait():
+    fn = Recorder()
+    b = MicroBatcher(fn, max_batch=100, max_wait_ms=50)
+    t0 = time.perf_counter()
+    futures = [b.submit(i) for i in range(3)]
+    assert [f.result(timeout=5) for f in futures] == ["v(0)", "v(1)", "v(2)"]
+    assert 0.04 <= time.perf_counter() - t0 < 2
+    assert fn.batches == [[0, 1, 2]]
+    b.close()
+
+
+def test_a_failing_item_only_fails_its_own_future():
+    fn = Recorder()
+    b = MicroBatcher(fn, max_batch=10, max_wait_ms=100)
+    futures = [b.submit(x) for x in ("a", "bad", "c")]
+    assert futures[0].result(timeout=5) == "v(a)" and futures[2].result(timeout=5) == "v(c)"
+    with pytest.raises(ValueError, match="cannot embed"):
+        futures[1].result(timeout=5)
+    assert fn.batches == [["a", "bad", "c"], ["a"], ["bad"], ["c"]]
+    s = b.stats()
+    assert s["errors"] == 1 and s["items"] == 3 and s["batches"] == 1
+    b.close()
+
+
+def test_a_wrong_number_of_results_is_an_error():
+    b = MicroBatcher(lambda items: [], max_batch=4, max_wait_ms=0)
+    with pytest.raises(RuntimeError, match="0 results for 1 item"):
+        b.submit("x").result(timeout=5)
+    b.close()
+
+
+def test_concurrent_callers_get_their_own_results_in_order():
+    fn = Recorder(delay=0.002)
+    b = MicroBatcher(fn, max_batch=16, max_wait_ms=1)
+    out = {}
+
+    def caller(k):
+        out[k] = b.map([(k, i) for i in range(50)])
+
+    threads = [threading.Thread(target=caller, args=(k,)) for k in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for k in range(8):
+        assert out[k] == [f"v({(k, i)})" for i in range(50)]
+    s = b.stats()
+    assert s["items"] == 400 and s["max_batch_size"] <= 16
+    assert s["batches"] < 400  # callers' items were batched together
+    assert sum(s["batch_size_histogram"].values()) == s["batches"]
+    b.close()
+
+
+def test_close_stops_the_worker_and_a_new_submit_restarts_it():
+    b = MicroBatcher(Recorder(), max_batch=4, max_wait_ms=0)
+    assert b.submit(1).result(timeout=5) == "v(1)"
+    worker = b._thread
+    b.close()
+    assert not worker.is_alive()
+    assert b.submit(2).result(timeout=5) == "v(2)"
+    b.close()
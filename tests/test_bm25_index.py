@@ -0,0 +1,81 @@
+import pytest
+
+from bm25_index import BM25Index, tokenize
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = BM25Index(str(tmp_path / "bm25.sqlite3"))
+    idx.add(["a1", "a2", "a3"],
+            ["Error E1234 raised by the payment gateway.",
+             "The payment gateway retries failed payments twice.",
+             "Kubernetes operator onboarding guide."],
+            ["guide.txt", "guide.txt", "ops.txt"])
+    idx.add(["t1", "t2"],
+            ["Acme payment policy: error E1234 means the card was declined.",
+             "Acme onboarding checklist."],
+            ["policy.txt", "onboarding.txt"], tenant="acme")
+    return idx
+
+
+def test_tokenize_keeps_codes_and_drops_stopwords():
+    assert tokenize("What is error E-1234 in v2.1 of the API?") == ["error", "e-1234", "v2.1", "api"]
+
+
+def test_exact_terms_rank_first(index):
+    hits = index.search("E1234", k=10)
+    assert {cid for cid, _ in hits} == {"a1", "t1"}
+    top = index.search("payment gateway retries", k=3)
+    assert top[0][0] == "a2"
+    scores = [s for _, s in top]
+    assert scores == sorted(scores, reverse=True) and all(s > 0 for s in scores)
+    assert index.search("the of and", k=5) == []  # only stopwords
+    assert index.search("nonexistentterm", k=5) == []
+
+
+def test_rarer_terms_weigh_more(index):
+    # "kubernetes" is in one chunk, "payment" in three: the rare term decides the ranking
+    hits = dict(index.search("kubernetes payment", k=10))
+    assert max(hits, key=hits.get) == "a3"
+
+
+def test_source_and_tenant_scoping(index):
+    assert [cid for cid, _ in index.search("payment", k=10, sources=["guide.txt"])] in (["a1", "a2"], ["a2", "a1"])
+    assert [cid for cid, _ in index.search("E1234", k=10, tenant="acme")] == ["t1"]
+    assert [cid for cid, _ in index.search("E1234", k=10, tenant="")] == ["a1"]
+    assert index.search("E1234", k=10, sources=["ops.txt"]) == []
+    assert index.search("onboarding", k=10, sources=["onboarding.txt"], tenant="") == []
+    assert sorted(index.chunk_ids(sources=["guide.txt", "policy.txt"])) == ["a1", "a2", "t1"]
+    assert sorted(index.chunk_ids(tenant="acme")) == ["t1", "t2"]
+    assert sorted(index.chunk_ids(tenant="")) == ["a1", "a2", "a3"]
+
+
+def test_delete_and_reindex(index):
+    index.delete(["a1"])
+    assert [cid for cid, _ in index.search("E1234", k=10)] == ["t1"]
+    assert len(index) == 4
+    index.add(["a2"], ["Rewritten: nothing about gateways here."], ["guide.txt"])
+    assert "a2" not in dict(index.search("payment", k=10))
+    assert [cid for cid, _ in index.search("rewritten", k=10)] == ["a2"]
+    assert len(index) == 4
+
+
+def test_persists_and_clear_keeps_ingest_markers(index, tmp_path):
+    index.mark_ingested("guide.txt", "h1", 2)
+    index.mark_ingested("policy.txt", "h2", 1, tenant="acme")
+    reopened = BM25Index(str(tmp_path / "bm25.sqlite3"))
+    assert len(reopened) == 5 and reopened.search("kubernetes", k=1)[0][0] == "a3"
+    reopened.clear()
+    assert len(reopened) == 0 and reopened.search("payment", k=5) == []
+    assert reopened.ingested("guide.txt") == ("h1", 2)
+    assert reopened.ingested("policy.txt") is None and reopened.ingested("policy.txt", tenant="acme") == ("h2", 1)
+    reopened.forget_ingested("guide.txt")
+    assert reopened.ingested("guide.txt") is None
+
+
+def test_has_tenants_and_limited_chunk_ids(index, tmp_path):
+    assert index.has_tenants()
+    assert len(index.chunk_ids(tenant="", limit=2)) == 2
+    index.delete(["t1", "t2"])
+    assert not index.has_tenants()
+    assert not BM25Index(str(tmp_path / "empty.sqlite3")).has_tenants()
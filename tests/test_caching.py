@@ -0,0 +1,245 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import caching
+import load_data
+from caching import AnswerCache, LRUCache, SingleFlight
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+# --- SingleFlight.do ---
+
+def test_concurrent_callers_share_one_flight():
+    sf, calls = SingleFlight(), []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+
+    async def main():
+        results = await asyncio.gather(*(sf.do("q", work) for _ in range(20)))
+        assert sf.stats()["in_flight"] == 0
+        return results
+
+    results = _run(main())
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results) and results[0] == {"answer": 42}
+    assert (sf.leaders, sf.coalesced) == (1, 19)
+
+
+def test_leader_error_reaches_every_follower_and_is_not_kept():
+    sf = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("upstream down")
+
+    async def ok():
+        return "fine"
+
+    async def main():
+        results = await asyncio.gather(*(sf.do("q", fail) for _ in range(5)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) and str(r) == "upstream down" for r in results)
+        return await sf.do("q", ok)  # the failure is not cached: the next call runs again
+
+    assert _run(main()) == "fine"
+    assert sf.leaders == 2
+
+
+def test_cancelling_the_leader_does_not_cancel_followers():
+    sf = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return "result"
+
+    async def main():
+        leader = asyncio.ensure_future(sf.do("q", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(sf.do("q", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == "result"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    _run(main())
+    assert finished == [1]
+
+
+# --- SingleFlight.stream ---
+
+def _numbers(n: int, started: list, delay: float = 0.01, fail_at: int = None):
+    async def gen():
+        started.append(1)
+        for i in range(n):
+            if i == fail_at:
+                raise ValueError("stream broke")
+            await asyncio.sleep(delay)
+            yield i
+    return gen
+
+
+def test_late_joiner_replays_the_stream_from_the_start():
+    sf, started = SingleFlight(), []
+    factory = _numbers(10, started)
+
+    async def consume(delay: float = 0.0):
+        await asyncio.sleep(delay)
+        return [i async for i in sf.stream("q", factory)]
+
+    async def main():
+        return await asyncio.gather(consume(), consume(0.05))  # joins after ~5 items were produced
+
+    first, late = _run(main())
+    assert first == late == list(range(10))
+    assert len(started) == 1 and sf.coalesced == 1
+
+
+def test_stream_error_reaches_followers_after_the_items_before_it():
+    sf, started = SingleFlight(), []
+    factory = _numbers(10, started, fail_at=3)
+
+    async def consume():
+        got = []
+        with pytest.raises(ValueError, match="stream broke"):
+            async for i in sf.stream("q", factory):
+                got.append(i)
+        return got
+
+    async def main():
+        return await asyncio.gather(consume(), consume(), consume())
+
+    assert _run(main()) == [[0, 1, 2]] * 3
+    assert len(started) == 1
+
+
+def test_leader_leaving_the_stream_does_not_stop_it_for_followers():
+    sf, started = SingleFlight(), []
+    factory = _numbers(6, started)
+
+    async def leader():
+        async for i in sf.stream("q", factory):
+            if i == 1:
+                raise asyncio.CancelledError  # client disconnected mid-stream
+
+    async def main():
+        lead = asyncio.ensure_future(leader())
+        await asyncio.sleep(0)
+        follower = [i async for i in sf.stream("q", factory)]
+        with pytest.raises(asyncio.CancelledError):
+            await lead
+        return follower
+
+    assert _run(main()) == list(range(6))
+    assert len(started) == 1
+
+
+# --- LRUCache ---
+
+def test_lru_evicts_least_recently_used():
+    c = LRUCache(maxsize=2)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1  # "b" is now the oldest
+    c.put("c", 3)
+    assert c.get("b") is None and c.get("a") == 1 and c.get("c") == 3
+    assert c.stats()["evictions"] == 1 and c.stats()["hits"] == 3 and c.stats()["misses"] == 1
+
+
+def test_lru_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(caching, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    c = LRUCache(maxsize=10, ttl=5)
+    c.put("a", 1)
+    now[0] += 4.9
+    assert c.get("a") == 1
+    now[0] += 0.2
+    assert c.get("a", "gone") == "gone" and len(c) == 0
+
+
+def test_lru_is_thread_safe_under_contention():
+    c = LRUCache(maxsize=50)
+
+    def worker(k):
+        for i in range(2000):
+            c.put((k, i % 80), i)
+            c.get((k, (i * 7) % 80))
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    s = c.stats()
+    assert len(c) == 50 and s["hits"] + s["misses"] == 16000
+
+
+def test_results_keyed_on_the_generation_go_stale_after_a_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(load_data, "GENERATION_FILE", tmp_path / "docs.generation")
+    cache = LRUCache(maxsize=10)
+    cache.put(("query", load_data.read_generation()), ["old hit"])
+    assert cache.get(("query", load_data.read_generation())) == ["old hit"]
+    assert load_data.bump_generation() == 1
+    assert cache.get(("query", load_data.read_generation())) is None
+
+
+# --- AnswerCache ---
+
+def _embed(question: str):
+    # bag of letters: questions differing by a word or two stay close
+    vec = np.zeros(26, dtype=np.float32)
+    for ch in question:
+        if "a" <= ch <= "z":
+            vec[ord(ch) - 97] += 1
+    return vec
+
+
+def test_answer_cache_exact_and_semantic_hits(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), embed=_embed, similarity=0.95)
+    cache.put("What is the refund policy?", ["c1", "c2"], "m", "v1", "30 days")
+    assert cache.get("  what is the REFUND policy? ", ["c1", "c2", "c1"], "m", "v1") == "30 days"
+    assert cache.get("what is the refund policy", ["c1", "c2"], "m", "v1") == "30 days"  # semantic
+    assert cache.get("What is the refund policy?", ["c2", "c1"], "m", "v1") is None  # other context
+    assert cache.get("What is the refund policy?", ["c1", "c2"], "m", "v2") is None  # other prompt
+    assert cache.get("Who signed the lease agreement?", ["c1", "c2"], "m", "v1") is None
+    s = cache.stats()
+    assert (s["hits"], s["semantic_hits"], s["misses"]) == (2, 1, 3)
+
+
+def test_answer_cache_evicts_least_recently_used_and_persists(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    cache = AnswerCache(path, max_entries=2)
+    cache.put("q1", ["c"], "m", "v", "a1")
+    cache.put("q2", ["c"], "m", "v", "a2")
+    assert cache.get("q1", ["c"], "m", "v") == "a1"  # q2 is now the least recently used
+    cache.put("q3", ["c"], "m", "v", "a3")
+    reopened = AnswerCache(path, max_entries=2)
+    assert reopened.get("q2", ["c"], "m", "v") is None
+    assert reopened.get("q1", ["c"], "m", "v") == "a1" and reopened.get("q3", ["c"], "m", "v") == "a3"
+
+
+def test_answer_cache_counts_concurrent_semantic_hits(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), embed=_embed, similarity=0.95)
+    cache.put("What is the refund policy?", ["c1"], "m", "v1", "30 days")
+
+    def worker():
+        for _ in range(50):
+            assert cache.get("what is the refund policy", ["c1"], "m", "v1") == "30 days"
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.stats()["semantic_hits"] == cache.stats()["hits"] == 400
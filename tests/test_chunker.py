@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from load_data import _iter_sentences, _pack_sentences, iter_chunks
+
+
+def _text(rng: random.Random, words: int, punctuation: bool) -> str:
+    out = []
+    for _ in range(words):
+        out.append("".join(rng.choice("abcdefghij") for _ in range(rng.randint(1, 9))))
+        if punctuation and rng.random() < 0.08:
+            out[-1] += rng.choice(".!?")
+        if rng.random() < 0.02:
+            out[-1] += "\n\n"
+    return " ".join(out)
+
+
+def _pieces(rng: random.Random, text: str) -> list:
+    pieces, pos = [], 0
+    while pos < len(text):
+        step = rng.randint(1, 120)
+        pieces.append(text[pos:pos + step])
+        pos += step
+    return pieces
+
+
+@pytest.mark.parametrize("punctuation", [True, False])
+@pytest.mark.parametrize("chunk_size,overlap", [(40, 10), (120, 30), (900, 150)])
+def test_streamed_matches_whole_string(punctuation, chunk_size, overlap):
+    rng = random.Random(chunk_size * 2 + punctuation)
+    for _ in range(20):
+        text = _text(rng, rng.randint(0, 600), punctuation)
+        whole = list(iter_chunks(text, chunk_size, overlap, unit="chars"))
+        streamed = list(iter_chunks(_pieces(rng, text), chunk_size, overlap, unit="chars"))
+        assert streamed == whole
+
+
+@pytest.mark.parametrize("punctuation", [True, False])
+def test_chunks_fit_and_keep_words_whole(punctuation):
+    rng = random.Random(7)
+    for _ in range(20):
+        text = _text(rng, 800, punctuation)
+        words = set(text.split())
+        for chunk in iter_chunks(_pieces(rng, text), 40, 10, unit="chars"):
+            assert len(chunk.text) <= 40
+            assert chunk.text == text[chunk.start:chunk.end]
+            assert set(chunk.text.split()) <= words  # no word cut in two
+
+
+@pytest.mark.parametrize("punctuation", [True, False])
+def test_offset_packing_matches_per_sentence_packing(punctuation):
+    rng = random.Random(11 + punctuation)
+    for _ in range(50):
+        chunk_size = rng.choice([10, 40, 120, 900])
+        overlap = rng.choice([0, chunk_size // 4, chunk_size])
+        text = _text(rng, rng.randint(0, 600), punctuation)
+        reference = _pack_sentences(_iter_sentences([text], chunk_size), chunk_size, overlap, len)
+        assert list(iter_chunks(_pieces(rng, text), chunk_size, overlap, unit="chars")) == list(reference)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import embeddings
+from embeddings import Embedder, load_embedder
+
+
+class FakeTorch(Embedder):
+    name = "torch"
+    loads = 0
+
+    def __init__(self, model_name, threads=0):
+        super().__init__(model_name, threads)
+        FakeTorch.loads += 1
+
+    def encode(self, texts):
+        return np.array([[len(t), 1.0, 2.0] for t in texts], dtype=np.float32)
+
+
+class FakeQuantized(FakeTorch):
+    name = "int8"
+    noise = 0.0
+
+    def encode(self, texts):
+        return super().encode(texts) + np.array([0.0, self.noise, -self.noise], dtype=np.float32)
+
+
+@pytest.fixture(autouse=True)
+def fakes(monkeypatch, tmp_path):
+    FakeTorch.loads = 0
+    FakeQuantized.noise = 0.0
+    monkeypatch.setattr(embeddings, "TorchEmbedder", FakeTorch)
+    monkeypatch.setitem(embeddings.BACKENDS, "int8", FakeQuantized)
+    monkeypatch.setattr(embeddings, "EMBED_PARITY_CACHE", str(tmp_path / "parity.json"))
+
+
+def test_parity_is_checked_once_then_cached():
+    emb = load_embedder("m", backend="int8", check_parity=True)
+    assert isinstance(emb, FakeQuantized) and FakeTorch.loads == 2  # backend + reference
+    emb = load_embedder("m", backend="int8", check_parity=True)
+    assert isinstance(emb, FakeQuantized) and FakeTorch.loads == 3  # backend only
+    load_embedder("other-model", backend="int8", check_parity=True)
+    assert FakeTorch.loads == 5  # another model is checked again
+
+
+def test_cached_drift_falls_back_to_torch():
+    FakeQuantized.noise = 40.0
+    assert type(load_embedder("m", backend="int8", check_parity=True)) is FakeTorch
+    FakeQuantized.noise = 0.0  # the cached verdict stands until model, backend or versions change
+    assert type(load_embedder("m", backend="int8", check_parity=True)) is FakeTorch
+
+
+def test_empty_cache_path_checks_every_time(monkeypatch):
+    monkeypatch.setattr(embeddings, "EMBED_PARITY_CACHE", "")
+    load_embedder("m", backend="int8", check_parity=True)
+    load_embedder("m", backend="int8", check_parity=True)
+    assert FakeTorch.loads == 4
@@ -0,0 +1,54 @@
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# ingest one file with a hashing "embedder" (no model) and report chunks + peak RSS in MB
+CHILD = r"""
+import hashlib, resource, sys
+from pathlib import Path
+import numpy as np
+import load_data
+
+def embed(texts):
+    return [np.frombuffer(hashlib.sha256(t.encode("utf-8")).digest(), dtype=np.uint8) / 255.0 for t in texts]
+
+load_data._embedding_func = embed
+n = load_data.ingest_file(Path(sys.argv[1]))
+print(n, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+"""
+
+WORDS = ["ingest", "vector", "pipeline", "memo-\nry", "latency", "batch", "page", "chunk", "index", "query"]
+
+
+def _write_corpus(path: Path, mb: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        while written < mb * 1_000_000:
+            para = " ".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 25))) + f" {rng.random()}."
+                            for _ in range(rng.randint(3, 8))) + "\n\n"
+            f.write(para)
+            written += len(para)
+
+
+def _ingest(path: Path, db: Path) -> tuple:
+    env = dict(os.environ, CHROMA_PATH=str(db), VECTOR_STORE="mmap", PYTHONPATH=str(ROOT))
+    out = subprocess.run([sys.executable, "-c", CHILD, str(path)], env=env, cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    n, peak_mb = out.strip().splitlines()[-1].split()
+    return int(n), int(peak_mb)
+
+
+def test_streaming_ingest_peak_rss_does_not_grow_with_the_file(tmp_path):
+    peaks = {}
+    for mb in (2, 16):
+        path = tmp_path / f"synthetic_{mb}mb.txt"
+        _write_corpus(path, mb)
+        n, peaks[mb] = _ingest(path, tmp_path / f"db{mb}")
+        assert n > mb * 500  # ~1 KB chunks: the whole file was indexed
+    # 8x the input; a path holding the text or every chunk would grow by well over 100 MB
+    assert peaks[16] - peaks[2] < 32, peaks
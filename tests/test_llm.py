@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+import llm
+from llm import LLMClient, LLMError, StubProvider, register_provider
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+ANSWER = StubProvider.answer.split(" ")
+
+
+class ScriptedStub(StubProvider):
+    """The stub answer, with a scripted outcome per attempt: "ok", "refused" (before any
+    token), "reset" (after the first token) or "bad" (a non-retryable error)."""
+
+    name = "scripted"
+    retryable = (ConnectionError,)
+
+    def __init__(self, *outcomes, first_token_delay: float = 0.0):
+        self.outcomes = list(outcomes)
+        self.first_token_delay = first_token_delay
+        self.attempts = self.active = self.peak = 0
+
+    async def stream(self, messages, model, temperature, max_tokens):
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        self.attempts += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.first_token_delay)
+            if outcome == "refused":
+                raise ConnectionError("connection refused")
+            if outcome == "bad":
+                raise ValueError("400 bad request")
+            async for tok in super().stream(messages, model, temperature, max_tokens):
+                yield tok
+                if outcome == "reset":
+                    raise ConnectionError("connection reset")
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture(autouse=True)
+def fast_stub(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_STUB_TOKEN_DELAY", 0.001)
+    monkeypatch.setattr(llm, "LLM_STUB_LATENCY", 0)
+    monkeypatch.setattr(llm, "PROVIDERS", dict(llm.PROVIDERS))  # register_provider() stays local to a test
+
+
+def _client(provider: ScriptedStub, **kw) -> LLMClient:
+    register_provider("scripted", lambda: provider)
+    kw = {"retries": 2, "backoff": 0.001, "timeout": 5, "first_token_timeout": 1, **kw}
+    return LLMClient(provider="scripted", **kw)
+
+
+async def _collect(client: LLMClient) -> list:
+    return [tok async for tok in client.stream(MESSAGES, "m")]
+
+
+def test_stub_streams_the_canned_answer():
+    client = LLMClient(provider="stub")
+    assert asyncio.run(client.complete(MESSAGES, "m")) == StubProvider.answer
+    assert client.is_stub and client.stats()["calls"] == 1
+
+
+def test_failures_before_the_first_token_are_retried():
+    stub = ScriptedStub("refused", "refused", "ok")
+    client = _client(stub)
+    assert [t.strip() for t in asyncio.run(_collect(client))] == ANSWER
+    assert stub.attempts == 3
+    assert client.stats()["retried"] == 2 and client.stats()["failures"] == 0
+
+
+def test_giving_up_after_the_retries_raises_llm_error():
+    stub = ScriptedStub("refused", "refused", "refused", "ok")
+    client = _client(stub)
+    with pytest.raises(LLMError, match="connection refused") as exc:
+        asyncio.run(_collect(client))
+    assert isinstance(exc.value.__cause__, ConnectionError)
+    assert stub.attempts == 3 and client.stats()["failures"] == 1
+
+
+def test_a_failure_after_the_first_token_is_not_retried():
+    stub = ScriptedStub("reset", "ok")
+    client = _client(stub)
+    got = []
+
+    async def main():
+        async for tok in client.stream(MESSAGES, "m"):
+            got.append(tok)
+
+    with pytest.raises(LLMError, match="connection reset"):
+        asyncio.run(main())
+    assert got == [ANSWER[0] + " "] and stub.attempts == 1 and client.stats()["retried"] == 0
+
+
+def test_non_retryable_errors_are_wrapped_without_retrying():
+    stub = ScriptedStub("bad", "ok")
+    client = _client(stub)
+    with pytest.raises(LLMError, match="scripted completion failed") as exc:
+        asyncio.run(_collect(client))
+    assert isinstance(exc.value.__cause__, ValueError)
+    assert stub.attempts == 1
+
+
+def test_first_token_timeout_is_retried_then_raised():
+    stub = ScriptedStub(first_token_delay=0.5)
+    client = _client(stub, retries=1, first_token_timeout=0.05)
+    with pytest.raises(LLMError) as exc:
+        asyncio.run(_collect(client))
+    assert isinstance(exc.value.__cause__, asyncio.TimeoutError)
+    assert stub.attempts == 2 and client.stats()["retried"] == 1
+
+
+def test_total_timeout_stops_a_slow_stream(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_STUB_TOKEN_DELAY", 0.05)  # ~0.6s for the whole answer
+    stub = ScriptedStub()
+    client = _client(stub, timeout=0.2, first_token_timeout=0.1)
+    got = []
+
+    async def main():
+        async for tok in client.stream(MESSAGES, "m"):
+            got.append(tok)
+
+    with pytest.raises(LLMError):
+        asyncio.run(main())
+    assert 0 < len(got) < len(ANSWER)
+    assert stub.attempts == 1  # tokens were handed out: no retry
+
+
+def test_concurrency_is_bounded_by_the_semaphore():
+    stub = ScriptedStub()
+    client = _client(stub, max_concurrency=2)
+    seen_waiting = []
+
+    async def main():
+        tasks = [asyncio.ensure_future(client.complete(MESSAGES, "m")) for _ in range(6)]
+        await asyncio.sleep(0.005)
+        seen_waiting.append(client.stats()["waiting"])
+        return await asyncio.gather(*tasks)
+
+    answers = asyncio.run(main())
+    assert answers == [StubProvider.answer] * 6
+    assert stub.peak == 2 and seen_waiting == [4]
+    assert client.stats()["in_flight"] == 0 and client.stats()["calls"] == 6
+
+
+def test_unknown_provider_raises_llm_error():
+    with pytest.raises(LLMError, match="Unknown LLM_PROVIDER"):
+        asyncio.run(_collect(LLMClient(provider="nope")))
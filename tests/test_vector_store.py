@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+import vector_store
+from vector_store import MmapStore
+
+
+def _unit(rng: np.random.Generator, n: int, dim: int = 32) -> np.ndarray:
+    x = rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = np.random.default_rng(0)
+    s = MmapStore(str(tmp_path), "docs")
+    ids = [f"c{i}" for i in range(30)]
+    metas = [{"source": f"s{i % 3}.txt", "page": i, "tenant": "acme" if i < 10 else "other"} for i in range(30)]
+    s.add(ids, [f"doc {i}" for i in range(30)], metas, _unit(rng, 30))
+    return s
+
+
+def test_get_with_where_filters(store):
+    assert store.count() == 30
+    got = store.get(where={"source": "s1.txt"})
+    assert got["ids"] == [f"c{i}" for i in range(1, 30, 3)]
+    assert got["documents"][0] == "doc 1" and got["metadatas"][0] == {"source": "s1.txt", "page": 1, "tenant": "acme"}
+    got = store.get(where={"$and": [{"source": {"$in": ["s0.txt", "s2.txt"]}}, {"tenant": "acme"}]})
+    assert got["ids"] == [f"c{i}" for i in range(10) if i % 3 != 1]
+    got = store.get(where={"$or": [{"page": {"$lt": 2}}, {"page": {"$gte": 28}}]})
+    assert got["ids"] == ["c0", "c1", "c28", "c29"]
+    assert store.get(where={"tenant": {"$ne": "acme"}, "page": {"$lte": 11}})["ids"] == ["c10", "c11"]
+    assert store.get(where={"missing": "x"})["ids"] == []
+    assert store.get(ids=["c5", "c99", "c6"], where={"page": 6})["ids"] == ["c6"]
+
+
+def test_update_merges_metadata_and_adds_columns(store):
+    store.update(ids=["c3", "c4"], metadatas=[{"page": 300}, {"lang": "en"}])
+    got = store.get(ids=["c3", "c4"])
+    assert got["metadatas"][0]["page"] == 300
+    assert got["metadatas"][1] == {"source": "s1.txt", "page": 4, "tenant": "acme", "lang": "en"}
+    assert "lang" not in store.get(ids=["c5"])["metadatas"][0]
+    store.update(ids=["c3"], documents=["rewritten"], embeddings=[np.ones(32, dtype=np.float32)])
+    assert store.get(ids=["c3"])["documents"] == ["rewritten"]
+    assert store.count() == 30
+
+
+def test_delete_tombstones_rows_everywhere(store):
+    store.delete(ids=["c0", "c1"])
+    store.delete(where={"source": "s2.txt"})
+    live = {f"c{i}" for i in range(2, 30) if i % 3 != 2}
+    assert store.count() == len(live)
+    assert set(store.get()["ids"]) == live
+    assert store.get(ids=["c0", "c2"])["ids"] == []
+    res = store.query(query_embeddings=store.get(ids=["c3"], include=["embeddings"])["embeddings"], n_results=50)
+    assert set(res["ids"][0]) == live and res["ids"][0][0] == "c3"
+
+
+def test_readd_replaces_the_row(store):
+    store.add(["c7"], ["new text"], [{"source": "s9.txt"}], np.ones((1, 32), dtype=np.float32))
+    assert store.count() == 30
+    assert store.get(ids=["c7"]) == {"ids": ["c7"], "documents": ["new text"], "metadatas": [{"source": "s9.txt"}]}
+
+
+def test_compact_then_reopen(store, tmp_path):
+    before = store.get(where={"source": "s0.txt"}, include=["documents", "metadatas", "embeddings"])
+    store.delete(where={"tenant": "other"})
+    assert store.compact() == 20
+    assert store.rows == 10 and store.count() == 10
+    reopened = MmapStore(str(tmp_path), "docs")
+    assert reopened.manifest["epoch"] == 1 and reopened.count() == 10
+    after = reopened.get(where={"source": "s0.txt"}, include=["documents", "metadatas", "embeddings"])
+    keep = [k for k, m in enumerate(before["metadatas"]) if m["tenant"] == "acme"]
+    assert after["ids"] == [before["ids"][k] for k in keep]
+    assert after["documents"] == [before["documents"][k] for k in keep]
+    np.testing.assert_allclose(after["embeddings"], before["embeddings"][keep])
+    reopened.add(["n1"], ["after compaction"], [{"source": "s0.txt"}], np.ones((1, 32), dtype=np.float32))
+    assert MmapStore(str(tmp_path), "docs").get(ids=["n1"])["documents"] == ["after compaction"]
+
+
+def test_deletes_past_the_ratio_compact_automatically(store, monkeypatch):
+    monkeypatch.setattr(vector_store, "MMAP_COMPACT_MIN_ROWS", 5)
+    monkeypatch.setattr(vector_store, "MMAP_COMPACT_RATIO", 0.25)
+    store.delete(ids=[f"c{i}" for i in range(4)])
+    assert store.manifest["epoch"] == 0 and store.rows == 30
+    store.delete(ids=[f"c{i}" for i in range(4, 8)])
+    assert store.manifest["epoch"] == 1 and store.rows == 22 == store.count()
+
+
+def test_writes_of_another_instance_are_picked_up(store, tmp_path):
+    other = MmapStore(str(tmp_path), "docs")  # same files, as another process would open them
+    other.add(["x1"], ["from the other writer"], [{"source": "x.txt"}], np.ones((1, 32), dtype=np.float32))
+    other.delete(ids=["c0"])
+    assert store.get(ids=["x1"])["documents"] == ["from the other writer"]
+    assert store.count() == 30 and store.get(ids=["c0"])["ids"] == []
+    store.delete(where={"tenant": "other"})
+    other.compact()
+    assert store.count() == other.count() == 10
+    assert store.get(where={"source": "x.txt"})["ids"] == ["x1"]
+
+
+@pytest.mark.parametrize("dtype, min_recall", [("float16", 0.99), ("int8", 0.9)])
+def test_topk_matches_float32_bruteforce(tmp_path, dtype, min_recall):
+    rng = np.random.default_rng(1)
+    emb, q = _unit(rng, 2000, 64), _unit(rng, 50, 64)
+    s = MmapStore(str(tmp_path), "docs", dtype=dtype)
+    s.add([str(i) for i in range(len(emb))], None, [{"half": i % 2} for i in range(len(emb))], emb)
+    k = 10
+    d = (q * q).sum(1)[:, None] - 2 * q @ emb.T + (emb * emb).sum(1)[None, :]
+    res = s.query(query_embeddings=q, n_results=k, include=["distances"])
+    recall = np.mean([len({int(i) for i in got} & set(np.argsort(row)[:k].tolist())) / k
+                      for got, row in zip(res["ids"], d)])
+    assert recall >= min_recall
+    for got, dists, row in zip(res["ids"], res["distances"], d):
+        assert dists == sorted(dists)
+        np.testing.assert_allclose(dists, row[[int(i) for i in got]], atol=0.02 if dtype == "int8" else 2e-3)
+
+    res = s.query(query_embeddings=q, n_results=k, where={"half": 1}, include=["metadatas"])
+    odd = d[:, 1::2]
+    for got, metas, row in zip(res["ids"], res["metadatas"], odd):
+        assert all(m["half"] == 1 for m in metas)
+        assert len({int(i) for i in got} & {2 * j + 1 for j in np.argsort(row)[:k]}) >= k * min_recall - 1
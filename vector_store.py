@@ -0,0 +1,733 @@
+"""
+Vector-store backends behind one small interface (add / update / delete / get /
+query with Chroma-style `where` filters and Chroma-shaped results):
+
+* "chroma" (default): a Chroma PersistentClient collection.
+* "mmap": an in-process engine that keeps float16 or int8-quantized embeddings in
+  memory-mapped files, searches them exactly with NumPy (or through an optional
+  in-memory hnswlib index for large corpora) and stores metadata in compact
+  columns. One process writes at a time (file lock); any number read.
+
+VECTOR_STORE picks the backend for both the ingest side and the MCP server.
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("vector_store")
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")                   # "chroma" | "mmap"
+MMAP_DTYPE = os.getenv("MMAP_DTYPE", "float16")                      # "float16" | "int8"
+MMAP_BLOCK_ROWS = int(os.getenv("MMAP_BLOCK_ROWS", "16384"))         # rows scored per NumPy block
+MMAP_HNSW_MIN_ROWS = int(os.getenv("MMAP_HNSW_MIN_ROWS", "200000"))  # 0 disables HNSW
+MMAP_HNSW_M = int(os.getenv("MMAP_HNSW_M", "16"))
+MMAP_HNSW_EF = int(os.getenv("MMAP_HNSW_EF", "64"))
+MMAP_COMPACT_RATIO = float(os.getenv("MMAP_COMPACT_RATIO", "0.25"))  # deleted share of rows that triggers compact(); 0 = never
+MMAP_COMPACT_MIN_ROWS = int(os.getenv("MMAP_COMPACT_MIN_ROWS", "1024"))  # ...once at least this many are deleted
+
+try:
+    import hnswlib
+except ImportError:  # optional: exact search only
+    hnswlib = None
+
+
+class VectorStore:
+    """
+    What ingestion and retrieval need from a vector store. Methods take and return
+    the same shapes as a Chroma collection, so either backend is a drop-in:
+    `where` is {"key": value} / {"key": {"$in": [...]}} / {"$and": [...]}, and
+    `query` returns one list per query embedding. Distances are squared L2.
+    """
+
+    name: str
+
+    def add(self, ids: List[str], documents: Optional[List[str]] = None,
+            metadatas: Optional[List[Dict]] = None, embeddings=None):
+        raise NotImplementedError
+
+    def update(self, ids: List[str], metadatas: Optional[List[Dict]] = None,
+               documents: Optional[List[str]] = None, embeddings=None):
+        raise NotImplementedError
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None):
+        raise NotImplementedError
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None, limit: Optional[int] = None,
+            offset: int = 0, include: Sequence[str] = ("documents", "metadatas")) -> Dict:
+        raise NotImplementedError
+
+    def query(self, query_embeddings=None, query_texts: Optional[List[str]] = None, n_results: int = 10,
+              where: Optional[Dict] = None,
+              include: Sequence[str] = ("documents", "metadatas", "distances")) -> Dict:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    @property
+    def max_batch_size(self) -> int:
+        """Largest `add` the backend accepts in one call."""
+        raise NotImplementedError
+
+
+# ---------- Chroma ----------
+_chroma_clients: Dict[str, object] = {}
+
+
+class ChromaStore(VectorStore):
+    """
+    A Chroma collection; every call is passed straight through. Texts are embedded
+    here with `embedding_function`, not by Chroma, so any embedding backend works
+    whatever embedding function the collection was created with.
+    """
+
+    def __init__(self, path: str, name: str, embedding_function=None):
+        from chromadb import PersistentClient
+        client = _chroma_clients.get(path)
+        if client is None:
+            client = _chroma_clients[path] = PersistentClient(path=path)
+        self._client = client
+        self.collection = client.get_or_create_collection(name=name, embedding_function=None)
+        self.embedding_function = embedding_function
+        self.name = name
+        logger.info("Opened Chroma collection '%s' at %s", name, path)
+
+    def _embed(self, texts: Optional[List[str]], embeddings):
+        if embeddings is None and texts is not None and self.embedding_function is not None:
+            return self.embedding_function(texts)
+        return embeddings
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        kw = {"documents": documents, "metadatas": metadatas, "embeddings": self._embed(documents, embeddings)}
+        self.collection.add(ids=ids, **{k: v for k, v in kw.items() if v is not None})
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        kw = {"documents": documents, "metadatas": metadatas, "embeddings": self._embed(documents, embeddings)}
+        self.collection.update(ids=ids, **{k: v for k, v in kw.items() if v is not None})
+
+    def delete(self, ids=None, where=None):
+        self.collection.delete(ids=ids, where=where)
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=("documents", "metadatas")):
+        return self.collection.get(ids=ids, where=where, limit=limit, offset=offset or None, include=list(include))
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None,
+              include=("documents", "metadatas", "distances")):
+        if query_embeddings is None and query_texts is not None and self.embedding_function is not None:
+            query_embeddings, query_texts = self.embedding_function(query_texts), None
+        return self.collection.query(query_embeddings=query_embeddings, query_texts=query_texts,
+                                     n_results=n_results, where=where, include=list(include))
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    @property
+    def max_batch_size(self) -> int:
+        return self._client.get_max_batch_size()
+
+
+# ---------- Memory-mapped engine ----------
+# Layout of <root>/mmap/<name>/: manifest.json (committed row count, dim, dtype,
+# column kinds; replaced atomically last, so readers never see half a write) and
+# v<epoch>/ holding per-row files, all append-only except in-place tombstones and
+# metadata updates:
+#   vectors.bin  float16 or int8 codes (rows x dim)   scales.f32  int8 row scales
+#   norms.f32    squared norms of the stored vectors  live.u8     0 = deleted
+#   docs.off     int64 (offset, length) into docs.bin ids.jsonl   one id per line
+#   col-<key>.bin / .vocab  metadata columns: "i" int64, "f" float64, or "s" int32
+#                codes into an append-only vocabulary of JSON-encoded values
+# compact() rewrites the live rows into the next epoch.
+
+_INT_MISSING = np.iinfo(np.int64).min
+
+
+def _kind(value) -> str:
+    if isinstance(value, bool):
+        return "s"
+    if isinstance(value, int):
+        return "i"
+    if isinstance(value, float):
+        return "f"
+    return "s"
+
+
+def _col_dtype(kind: str):
+    return {"i": np.int64, "f": np.float64, "s": np.int32}[kind]
+
+
+def _append(path: Path, data: bytes):
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def _pwrite(path: Path, positions, itemsize: int, values: bytes):
+    with open(path, "r+b") as f:
+        for k, pos in enumerate(positions):
+            f.seek(int(pos) * itemsize)
+            f.write(values[k * itemsize:(k + 1) * itemsize])
+
+
+class MmapStore(VectorStore):
+    def __init__(self, root: str, name: str, embedding_function=None, dtype: str = MMAP_DTYPE):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"MMAP_DTYPE must be float16 or int8, not {dtype!r}")
+        self.name = name
+        self.dir = Path(root) / "mmap" / name
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.embedding_function = embedding_function
+        self._new_dtype = dtype
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._reset_state()
+        self._refresh()
+
+    # --- loading ---
+    def _reset_state(self):
+        self.manifest: Optional[Dict] = None
+        self.rows = 0
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._vocab: Dict[str, List] = {}
+        self._vocab_index: Dict[str, Dict[str, int]] = {}
+        self._tails: Dict[str, int] = {}  # bytes of each append-only text file already parsed
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._hnsw = None
+
+    @property
+    def _data(self) -> Path:
+        return self.dir / f"v{self.manifest['epoch']}"
+
+    def _read_lines(self, path: Path, limit: Optional[int] = None) -> List[str]:
+        """Complete lines appended to `path` since the last call (at most `limit`)."""
+        start = self._tails.get(path.name, 0)
+        if not path.exists() or limit == 0:
+            return []
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read()
+        lines = data.split(b"\n")[:-1]  # the last piece is an incomplete line (or empty)
+        if limit is not None:
+            lines = lines[:limit]
+        self._tails[path.name] = start + sum(len(line) + 1 for line in lines)
+        return [line.decode("utf-8") for line in lines]
+
+    def _map(self, fname: str, dtype, width: int = 0) -> np.ndarray:
+        shape = (self.rows, width) if width else (self.rows,)
+        if self.rows == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._data / fname, dtype=dtype, mode="r", shape=shape)
+
+    def _refresh(self):
+        """Pick up whatever another process (or thread) committed since the last call."""
+        path = self.dir / "manifest.json"
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            manifest = json.loads(path.read_text())
+            if self.manifest is not None and manifest["epoch"] != self.manifest["epoch"]:
+                self._reset_state()
+            self.manifest, self.rows = manifest, manifest["rows"]
+            # ids past the committed row count belong to a write still in progress
+            self._ids.extend(json.loads(line) for line in
+                             self._read_lines(self._data / "ids.jsonl", self.rows - len(self._ids)))
+            for i in range(len(self._row_of), len(self._ids)):
+                self._row_of[self._ids[i]] = i
+            for key, kind in manifest["columns"].items():
+                if kind == "s":
+                    vocab = self._vocab.setdefault(key, [])
+                    index = self._vocab_index.setdefault(key, {})
+                    for line in self._read_lines(self._data / f"col-{key}.vocab"):
+                        index[line] = len(vocab)
+                        vocab.append(json.loads(line))
+            dim = manifest["dim"]
+            self._arrays = {
+                "vectors": self._map("vectors.bin", np.float16 if manifest["dtype"] == "float16" else np.int8, dim),
+                "scales": self._map("scales.f32", np.float32) if manifest["dtype"] == "int8" else None,
+                "norms": self._map("norms.f32", np.float32),
+                "live": self._map("live.u8", np.uint8),
+                "offsets": self._map("docs.off", np.int64, 2),
+                **{f"col-{k}": self._map(f"col-{k}.bin", _col_dtype(kind))
+                   for k, kind in manifest["columns"].items()},
+            }
+            self._stamp = stamp
+
+    # --- writing ---
+    @contextmanager
+    def _writing(self):
+        with self._lock, open(self.dir / "write.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _truncate_uncommitted(self):
+        """Cut per-row files back to the committed row count (left over by a writer that died mid-add)."""
+        m, data = self.manifest, self._data
+        widths = {"vectors.bin": m["dim"] * (2 if m["dtype"] == "float16" else 1), "norms.f32": 4,
+                  "live.u8": 1, "docs.off": 16, "ids.jsonl": None}
+        if m["dtype"] == "int8":
+            widths["scales.f32"] = 4
+        for key, kind in m["columns"].items():
+            widths[f"col-{key}.bin"] = np.dtype(_col_dtype(kind)).itemsize
+        for fname, width in widths.items():
+            path = data / fname
+            size = self._tails.get(fname, 0) if width is None else m["rows"] * width
+            if path.exists() and path.stat().st_size > size:
+                logger.warning("Dropping uncommitted tail of %s/%s", self.name, fname)
+                os.truncate(path, size)
+
+    def _commit(self, manifest: Dict):
+        manifest = dict(manifest, version=manifest.get("version", 0) + 1)
+        tmp = self.dir / "manifest.json.tmp"
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, self.dir / "manifest.json")
+        self._refresh()
+
+    def _encode(self, values: List, key: str, kind: str, new_vocab: List[str]) -> np.ndarray:
+        if kind == "i":
+            if any(v is not None and _kind(v) != "i" for v in values):
+                raise ValueError(f"metadata {key!r} holds ints; got {values!r}")
+            return np.array([_INT_MISSING if v is None else v for v in values], dtype=np.int64)
+        if kind == "f":
+            return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+        index = self._vocab_index.setdefault(key, {})
+        codes = np.empty(len(values), dtype=np.int32)
+        for k, v in enumerate(values):
+            if v is None:
+                codes[k] = -1
+                continue
+            enc = json.dumps(v, ensure_ascii=False)
+            code = index.get(enc)
+            if code is None:
+                # registered now; vocabulary files are appended before the manifest commit
+                code = index[enc] = len(self._vocab.setdefault(key, [])) + len(new_vocab)
+                new_vocab.append(enc)
+            codes[k] = code
+        return codes
+
+    def _write_columns(self, manifest: Dict, metadatas: List[Dict], rows: np.ndarray, append: bool):
+        """Store the metadata of `rows`; new keys get a column back-filled with missing values."""
+        keys = dict.fromkeys(k for m in metadatas for k in m)
+        columns = dict(manifest["columns"])
+        for key in keys:
+            if key not in columns:
+                first = next(m[key] for m in metadatas if m.get(key) is not None) \
+                    if any(m.get(key) is not None for m in metadatas) else ""
+                kind = columns[key] = _kind(first)
+                missing = {"i": _INT_MISSING, "f": np.nan, "s": -1}[kind]
+                np.full(manifest["rows"], missing, dtype=_col_dtype(kind)).tofile(self._data / f"col-{key}.bin")
+        for key, kind in columns.items():
+            # an update only touches the rows whose metadata has the key; the others keep their value
+            sel = range(len(metadatas)) if append else [j for j, m in enumerate(metadatas) if key in m]
+            if not sel:
+                continue
+            new_vocab: List[str] = []
+            try:
+                data = self._encode([metadatas[j].get(key) for j in sel], key, kind, new_vocab).tobytes()
+            except Exception:
+                self._vocab_index.pop(key, None)  # forget codes that were never written
+                self._tails.pop(f"col-{key}.vocab", None)
+                self._vocab.pop(key, None)
+                self._stamp = None
+                raise
+            if new_vocab:
+                _append(self._data / f"col-{key}.vocab", "".join(v + "\n" for v in new_vocab).encode("utf-8"))
+            path = self._data / f"col-{key}.bin"
+            if append:
+                _append(path, data)
+            else:
+                _pwrite(path, [rows[j] for j in sel], np.dtype(_col_dtype(kind)).itemsize, data)
+        manifest["columns"] = columns
+
+    def _quantize(self, emb: np.ndarray, dtype: str):
+        if dtype == "float16":
+            codes = emb.astype(np.float16)
+            stored, scales = codes.astype(np.float32), None
+        else:
+            scales = np.abs(emb).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.clip(np.rint(emb / scales[:, None]), -127, 127).astype(np.int8)
+            stored = codes.astype(np.float32) * scales[:, None]
+            scales = scales.astype(np.float32)
+        return codes, scales, (stored * stored).sum(axis=1).astype(np.float32)
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        """Append rows; an id that already exists is replaced."""
+        if not ids:
+            return
+        if len(set(ids)) != len(ids):
+            raise ValueError("duplicate ids in one add() call")
+        if embeddings is None:
+            if self.embedding_function is None:
+                raise ValueError("embeddings are required without an embedding function")
+            embeddings = self.embedding_function(documents)
+        emb = np.asarray(embeddings, dtype=np.float32)
+        documents = documents or [""] * len(ids)
+        metadatas = [dict(m or {}) for m in (metadatas or [None] * len(ids))]
+        with self._writing():
+            if self.manifest is None:
+                (self.dir / "v0").mkdir(exist_ok=True)
+                self._commit({"format": 1, "epoch": 0, "rows": 0, "dim": int(emb.shape[1]),
+                              "dtype": self._new_dtype, "columns": {}})
+            manifest = dict(self.manifest)
+            if emb.shape[1] != manifest["dim"]:
+                raise ValueError(f"embedding dimension {emb.shape[1]} != store dimension {manifest['dim']}")
+            self._truncate_uncommitted()
+            self._tombstone([self._row_of[i] for i in ids if i in self._row_of])
+            n, data = manifest["rows"], self._data
+            codes, scales, norms = self._quantize(emb, manifest["dtype"])
+            _append(data / "vectors.bin", codes.tobytes())
+            if scales is not None:
+                _append(data / "scales.f32", scales.tobytes())
+            _append(data / "norms.f32", norms.tobytes())
+            blobs = [d.encode("utf-8") for d in documents]
+            start = (data / "docs.bin").stat().st_size if (data / "docs.bin").exists() else 0
+            lengths = np.array([len(b) for b in blobs], dtype=np.int64)
+            offsets = np.stack([start + np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths], axis=1)
+            _append(data / "docs.bin", b"".join(blobs))
+            _append(data / "docs.off", offsets.astype(np.int64).tobytes())
+            self._write_columns(manifest, metadatas, np.arange(n, n + len(ids)), append=True)
+            _append(data / "live.u8", np.ones(len(ids), dtype=np.uint8).tobytes())
+            _append(data / "ids.jsonl", "".join(json.dumps(i) + "\n" for i in ids).encode("utf-8"))
+            manifest["rows"] = n + len(ids)
+            self._commit(manifest)
+        self._maybe_compact()
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        """Metadata keys are merged into the stored rows; new documents/embeddings re-add the rows."""
+        if documents is not None or embeddings is not None:
+            old = self.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+            pos = {cid: k for k, cid in enumerate(old["ids"])}
+            keep = [k for k, cid in enumerate(ids) if cid in pos]
+            new_metas = metadatas or [None] * len(ids)
+            merged = [dict(old["metadatas"][pos[ids[k]]], **(new_metas[k] or {})) for k in keep]
+            docs = [documents[k] if documents is not None else old["documents"][pos[ids[k]]] for k in keep]
+            if embeddings is not None:
+                embs = [embeddings[k] for k in keep]
+            elif documents is not None and self.embedding_function is not None:
+                embs = None  # re-embedded by add()
+            else:
+                embs = [old["embeddings"][pos[ids[k]]] for k in keep]
+            self.add([ids[k] for k in keep], docs, merged, embs)
+            return
+        with self._writing():
+            found = [(self._row_of[cid], m or {}) for cid, m in zip(ids, metadatas or [])
+                     if cid in self._row_of and self._arrays["live"][self._row_of[cid]]]
+            if not found:
+                return
+            manifest = dict(self.manifest)
+            self._write_columns(manifest, [m for _, m in found], np.array([r for r, _ in found]), append=False)
+            self._commit(manifest)
+
+    def _tombstone(self, rows: List[int]):
+        if rows:
+            _pwrite(self._data / "live.u8", rows, 1, bytes(len(rows)))
+
+    def delete(self, ids=None, where=None):
+        with self._writing():
+            if self.manifest is None:
+                return
+            if ids is not None:
+                rows = [self._row_of[i] for i in ids if i in self._row_of]
+            else:
+                rows = np.flatnonzero(self._mask(where)).tolist()
+            if rows:
+                self._tombstone(rows)
+                self._commit(dict(self.manifest))
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        """compact() once deleted / replaced rows reach MMAP_COMPACT_RATIO of the store."""
+        if MMAP_COMPACT_RATIO <= 0 or self.manifest is None:
+            return
+        dead = self.rows - self.count()
+        if dead >= MMAP_COMPACT_MIN_ROWS and dead >= MMAP_COMPACT_RATIO * self.rows:
+            self.compact()
+
+    def compact(self) -> int:
+        """Rewrite the live rows into a fresh epoch, dropping deleted ones; returns rows dropped."""
+        with self._writing():
+            if self.manifest is None:
+                return 0
+            a, old = self._arrays, self._data
+            keep = np.flatnonzero(a["live"])
+            dropped = self.rows - len(keep)
+            if not dropped:
+                return 0
+            manifest = dict(self.manifest, epoch=self.manifest["epoch"] + 1, rows=int(len(keep)))
+            new = self.dir / f"v{manifest['epoch']}"
+            shutil.rmtree(new, ignore_errors=True)
+            new.mkdir()
+            names = ["vectors", "norms", "live"] + (["scales"] if a["scales"] is not None else []) \
+                + [f"col-{k}" for k in manifest["columns"]]
+            files = {"vectors": "vectors.bin", "norms": "norms.f32", "live": "live.u8", "scales": "scales.f32"}
+            for name in names:
+                np.ascontiguousarray(a[name][keep]).tofile(new / files.get(name, f"{name}.bin"))
+            for key, kind in manifest["columns"].items():
+                if kind == "s" and (old / f"col-{key}.vocab").exists():
+                    shutil.copyfile(old / f"col-{key}.vocab", new / f"col-{key}.vocab")
+            docs = self._documents(keep)
+            blobs = [d.encode("utf-8") for d in docs]
+            lengths = np.array([len(b) for b in blobs], dtype=np.int64)
+            starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(blobs) else lengths
+            (new / "docs.bin").write_bytes(b"".join(blobs))
+            np.stack([starts, lengths], axis=1).astype(np.int64).tofile(new / "docs.off")
+            (new / "ids.jsonl").write_text("".join(json.dumps(self._ids[r]) + "\n" for r in keep), encoding="utf-8")
+            self._commit(manifest)
+            for stale in self.dir.glob("v*"):
+                if stale.is_dir() and stale.name not in (new.name, old.name):
+                    shutil.rmtree(stale, ignore_errors=True)
+            logger.info("Compacted %s: dropped %d deleted rows, %d left", self.name, dropped, len(keep))
+            return dropped
+
+    # --- reading ---
+    def _column_mask(self, key: str, cond) -> np.ndarray:
+        kind = self.manifest["columns"].get(key)
+        if kind is None:
+            return np.zeros(self.rows, dtype=bool)
+        col = np.asarray(self._arrays[f"col-{key}"])
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        mask = np.ones(self.rows, dtype=bool)
+        for op, value in cond.items():
+            if op in ("$in", "$nin", "$eq", "$ne"):
+                values = value if op in ("$in", "$nin") else [value]
+                if kind == "s":
+                    index = self._vocab_index.get(key, {})
+                    wanted = [index[e] for e in (json.dumps(v, ensure_ascii=False) for v in values) if e in index]
+                else:
+                    wanted = values
+                hit = np.isin(col, np.asarray(wanted, dtype=col.dtype)) if wanted else np.zeros(self.rows, bool)
+                mask &= ~hit if op in ("$nin", "$ne") else hit
+            elif op in ("$gt", "$gte", "$lt", "$lte") and kind != "s":
+                cmp = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}[op]
+                mask &= cmp(col, value) & (col != _INT_MISSING if kind == "i" else ~np.isnan(col))
+            else:
+                raise ValueError(f"unsupported filter {op!r} on {key!r}")
+        return mask
+
+    def _mask(self, where: Optional[Dict]) -> np.ndarray:
+        """Live rows matching a Chroma-style `where`."""
+        mask = np.asarray(self._arrays["live"]).astype(bool)
+        return mask & self._where_mask(where) if where else mask
+
+    def _where_mask(self, where: Dict) -> np.ndarray:
+        mask = np.ones(self.rows, dtype=bool)
+        for key, cond in where.items():
+            if key == "$and":
+                for sub in cond:
+                    mask &= self._where_mask(sub)
+            elif key == "$or":
+                mask &= np.logical_or.reduce([self._where_mask(sub) for sub in cond])
+            else:
+                mask &= self._column_mask(key, cond)
+        return mask
+
+    def _documents(self, rows) -> List[str]:
+        if not len(rows):
+            return []
+        offsets = self._arrays["offsets"]
+        out = []
+        with open(self._data / "docs.bin", "rb") as f:
+            for r in rows:
+                start, length = offsets[r]
+                out.append(os.pread(f.fileno(), int(length), int(start)).decode("utf-8"))
+        return out
+
+    def _metadatas(self, rows) -> List[Dict]:
+        cols = [(k, kind, self._arrays[f"col-{k}"][rows]) for k, kind in self.manifest["columns"].items()]
+        out = []
+        for j in range(len(rows)):
+            meta = {}
+            for key, kind, values in cols:
+                v = values[j]
+                if kind == "i":
+                    if v != _INT_MISSING:
+                        meta[key] = int(v)
+                elif kind == "f":
+                    if not np.isnan(v):
+                        meta[key] = float(v)
+                elif v >= 0:
+                    meta[key] = self._vocab[key][v]
+            out.append(meta)
+        return out
+
+    def _embeddings(self, rows) -> np.ndarray:
+        vecs = np.asarray(self._arrays["vectors"][rows], dtype=np.float32)
+        if self._arrays["scales"] is not None:
+            vecs *= self._arrays["scales"][rows][:, None]
+        return vecs
+
+    def _rows_result(self, rows, include) -> Dict:
+        rows = np.asarray(rows, dtype=np.int64)
+        out = {"ids": [self._ids[r] for r in rows]}
+        if "documents" in include:
+            out["documents"] = self._documents(rows)
+        if "metadatas" in include:
+            out["metadatas"] = self._metadatas(rows)
+        if "embeddings" in include:
+            out["embeddings"] = self._embeddings(rows)
+        return out
+
+    def get(self, ids=None, where=None, limit=None, offset=0, include=("documents", "metadatas")):
+        self._refresh()
+        with self._lock:
+            if self.manifest is None:
+                return {"ids": [], **{k: [] for k in include}}
+            if ids is not None:
+                live = self._arrays["live"]
+                rows = [self._row_of[i] for i in ids if i in self._row_of and live[self._row_of[i]]]
+                if where:
+                    match = self._where_mask(where)
+                    rows = [r for r in rows if match[r]]
+            else:
+                rows = np.flatnonzero(self._mask(where))
+            rows = rows[offset or 0:][:limit] if limit is not None else rows[offset or 0:]
+            return self._rows_result(rows, include)
+
+    def count(self) -> int:
+        self._refresh()
+        return int(np.count_nonzero(self._arrays["live"])) if self.manifest else 0
+
+    @property
+    def max_batch_size(self) -> int:
+        return 1 << 20
+
+    def _exact(self, q: np.ndarray, n: int, rows: Optional[np.ndarray]):
+        """Top-n squared-L2 rows per query, scored block by block over all rows or over `rows`."""
+        n = max(n, 1)
+        a = self._arrays
+        vectors, scales, norms, live = a["vectors"], a["scales"], a["norms"], a["live"]
+        qn = (q * q).sum(axis=1)
+        best_d = np.empty((len(q), 0), dtype=np.float32)
+        best_r = np.empty((len(q), 0), dtype=np.int64)
+        total = self.rows if rows is None else len(rows)
+        for lo in range(0, total, MMAP_BLOCK_ROWS):
+            if rows is None:
+                idx = np.arange(lo, min(lo + MMAP_BLOCK_ROWS, total))
+                block = slice(lo, lo + len(idx))
+            else:
+                idx = block = rows[lo:lo + MMAP_BLOCK_ROWS]
+            dots = q @ np.asarray(vectors[block], dtype=np.float32).T
+            if scales is not None:
+                dots *= scales[block]
+            d = qn[:, None] - 2.0 * dots + norms[block][None, :]
+            if rows is None:
+                d[:, live[block] == 0] = np.inf
+            d = np.concatenate([best_d, d], axis=1)
+            r = np.concatenate([best_r, np.broadcast_to(idx, (len(q), len(idx)))], axis=1)
+            if d.shape[1] > n:
+                top = np.argpartition(d, n - 1, axis=1)[:, :n]
+                d, r = np.take_along_axis(d, top, 1), np.take_along_axis(r, top, 1)
+            best_d, best_r = d, r
+        order = np.argsort(best_d, axis=1)
+        best_d, best_r = np.take_along_axis(best_d, order, 1), np.take_along_axis(best_r, order, 1)
+        return [(rr[np.isfinite(dd)], np.maximum(dd[np.isfinite(dd)], 0.0)) for dd, rr in zip(best_d, best_r)]
+
+    def _hnsw_index(self):
+        """In-memory HNSW over the live rows, built on first use and kept in step with new commits."""
+        live_count = self.count()
+        if hnswlib is None or MMAP_HNSW_MIN_ROWS <= 0 or live_count < MMAP_HNSW_MIN_ROWS:
+            return None
+        state = self._hnsw
+        if state is None or state["epoch"] != self.manifest["epoch"]:
+            index = hnswlib.Index(space="l2", dim=self.manifest["dim"])
+            index.init_index(max_elements=max(2 * self.rows, 1024), M=MMAP_HNSW_M, ef_construction=200)
+            state = self._hnsw = {"index": index, "epoch": self.manifest["epoch"], "rows": 0, "dead": set()}
+            logger.info("Building HNSW index for %s (%d rows)", self.name, live_count)
+        index, live = state["index"], np.asarray(self._arrays["live"])
+        if state["rows"] < self.rows:
+            if index.get_max_elements() < self.rows:
+                index.resize_index(2 * self.rows)
+            for lo in range(state["rows"], self.rows, MMAP_BLOCK_ROWS):
+                idx = np.arange(lo, min(lo + MMAP_BLOCK_ROWS, self.rows))
+                idx = idx[live[idx] != 0]
+                if len(idx):
+                    index.add_items(self._embeddings(idx), idx)
+            state["rows"] = self.rows
+        for r in set(np.flatnonzero(live[:state["rows"]] == 0).tolist()) - state["dead"]:
+            try:
+                index.mark_deleted(r)
+            except RuntimeError:  # tombstoned before it was ever indexed
+                pass
+            state["dead"].add(r)
+        index.set_ef(max(MMAP_HNSW_EF, 1))
+        return index
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None,
+              include=("documents", "metadatas", "distances")):
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(query_texts)
+        q = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        self._refresh()
+        with self._lock:
+            if self.manifest is None:
+                found = [(np.empty(0, np.int64), np.empty(0, np.float32))] * len(q)
+            elif where:
+                rows = np.flatnonzero(self._mask(where))
+                found = self._exact(q, n_results, rows) if len(rows) else \
+                    [(np.empty(0, np.int64), np.empty(0, np.float32))] * len(q)
+            else:
+                index = self._hnsw_index()
+                if index is not None:
+                    labels, dists = index.knn_query(q, k=min(n_results, self.count()))
+                    found = [(lb.astype(np.int64), ds) for lb, ds in zip(labels, dists)]
+                else:
+                    found = self._exact(q, n_results, None)
+            out: Dict[str, List] = {"ids": []}
+            for key in include:
+                out[key] = []
+            for rows, dists in found:
+                res = self._rows_result(rows, include)
+                out["ids"].append(res["ids"])
+                for key in include:
+                    out[key].append([float(d) for d in dists] if key == "distances" else res[key])
+            return out
+
+
+# ---------- Factory ----------
+BACKENDS: Dict[str, Callable[..., VectorStore]] = {
+    "chroma": ChromaStore,
+    "mmap": MmapStore,
+}
+_stores: Dict[tuple, VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(path: str, name: str, embedding_function=None, backend: Optional[str] = None) -> VectorStore:
+    """The process-wide store `name` under `path`, on `backend` (default VECTOR_STORE)."""
+    backend = backend or VECTOR_STORE
+    key = (backend, path, name)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                if backend not in BACKENDS:
+                    raise ValueError(f"Unknown VECTOR_STORE {backend!r}")
+                store = _stores[key] = BACKENDS[backend](path, name, embedding_function)
+    return store
+
+
+def reset_stores():
+    """Forget opened stores and clients (tests / benchmarks measuring cold starts)."""
+    with _stores_lock:
+        _stores.clear()
+        _chroma_clients.clear()
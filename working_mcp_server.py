@@ -1,49 +1,491 @@
 import os
+import re
 import json
-import math
+import queue
+import base64
+import asyncio
+import time
+import hashlib
+import threading
 import logging
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from contextlib import asynccontextmanager
+from pathlib import Path
+from uuid import uuid4
 from typing import List, Dict, Optional
 
+import httpx
+import numpy as np
 from fastmcp import FastMCP
-from chromadb import PersistentClient
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-from openai import OpenAI
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from batching import MicroBatcher
+from caching import AnswerCache, LRUCache
+from llm import LLMError, llm_client
+from load_data import (CHROMA_PATH, NO_TENANT, _get_bm25, _get_collection, _get_embedding_function,
+                       bump_generation, collection_name, ingest_file, read_generation)
+from load_data import delete_source as _delete_source
+from startup import StartupProfile
+from vector_store import VECTOR_STORE
+
+startup = StartupProfile("mcp_server")
 
 # --- Logging ---
 logger = logging.getLogger("mcp_server")
 logging.basicConfig(level=logging.INFO)
 
-# --- Setup ChromaDB / Embedding ---
-chromadb_client = PersistentClient(path="./chroma_db")
-embedding_func = SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-
-try:
-    collection = chromadb_client.get_collection(name="docs")
-    logger.info("Loaded existing collection 'docs'")
-except Exception as e:
-    logger.warning("Could not load collection: %s", e)
-    collection = chromadb_client.create_collection(
-        name="docs", embedding_function=embedding_func
+# --- Vector store (VECTOR_STORE: chroma | mmap) / Embedding ---
+# Both load on first use, so importing this module is cheap; _warmup() loads them
+# before the server reports ready. One model (EMBED_MODEL) embeds queries and ingests.
+
+
+# --- Synthesis tier ---
+# "backend": document_search is retrieval-only by default and the backend writes the
+# answer (one LLM call per query). "server": document_search synthesizes here and the
+# backend returns that answer as-is.
+SYNTHESIS_TIER = os.getenv("SYNTHESIS_TIER", "backend")
+
+
+# --- Hybrid retrieval ---
+# Dense (Chroma) and lexical (BM25 side index from load_data) rankings are fused with
+# reciprocal-rank fusion, which lets us fetch far fewer dense candidates.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+# --- Diversification ---
+# MMR over the candidate embeddings replaces prefix-based dedup: overlapping chunks
+# (_chunk_text overlaps windows) are near-duplicates in embedding space too.
+MMR_ENABLED = os.getenv("MMR_ENABLED", "1") == "1"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+MMR_DUP_THRESHOLD = float(os.getenv("MMR_DUP_THRESHOLD", "0.95"))
+
+
+# --- Cross-encoder reranking (optional) ---
+# Scores the first RERANK_CANDIDATES fused candidates with a small local cross-encoder,
+# batched on CPU. RERANK_BUDGET_MS is a hard limit on the time a query waits for the
+# scores: past it the query keeps the fused order.
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_WORKERS = int(os.getenv("RERANK_WORKERS", "1"))  # concurrent scoring threads (each uses torch's intra-op threads)
+_reranker = None
+_reranker_lock = threading.Lock()
+_rerank_pool = ThreadPoolExecutor(max_workers=RERANK_WORKERS, thread_name_prefix="rerank")
+
+
+def _get_reranker():
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                from sentence_transformers import CrossEncoder
+                _reranker = CrossEncoder(RERANK_MODEL, device="cpu")
+                logger.info("Loaded reranker %s", RERANK_MODEL)
+    return _reranker
+
+
+def _score_pairs(query: str, texts: List[str], deadline: float) -> Optional[List[float]]:
+    model = _get_reranker()
+    scores: List[float] = []
+    for i in range(0, len(texts), RERANK_BATCH_SIZE):
+        if time.perf_counter() > deadline:  # the caller has given up: don't start another batch
+            return None
+        batch = [(query, t) for t in texts[i:i + RERANK_BATCH_SIZE]]
+        scores.extend(float(x) for x in model.predict(batch, batch_size=RERANK_BATCH_SIZE, show_progress_bar=False))
+    return scores
+
+
+def _rerank(query: str, texts: List[str]) -> Optional[List[float]]:
+    """
+    Cross-encoder relevance per text, or None when the scores are not ready within
+    RERANK_BUDGET_MS. Scoring runs on the rerank pool and the caller waits at most until
+    the deadline; a batch already running then finishes in the background and is dropped.
+    """
+    _get_reranker()  # loading the model is not part of a query's budget
+    t0 = time.perf_counter()
+    deadline = t0 + RERANK_BUDGET_MS / 1000.0
+    fut = _rerank_pool.submit(_score_pairs, query, texts, deadline)
+    try:
+        scores = fut.result(timeout=max(0.0, deadline - time.perf_counter()))
+    except FuturesTimeout:
+        fut.cancel()  # still queued behind other queries' scoring: never start it
+        scores = None
+    if scores is None:
+        logger.warning("Rerank over budget (%.0f ms > %.0f ms); keeping fused order",
+                       (time.perf_counter() - t0) * 1000, RERANK_BUDGET_MS)
+    return scores
+
+
+# --- Query embedding batcher ---
+# Concurrent searches hand their query texts to one worker thread that embeds them
+# together in a single forward pass instead of one pass per request.
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "1") == "1"
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "64"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "2"))
+embedding_batcher = MicroBatcher(lambda texts: _get_embedding_function()(texts), max_batch=EMBED_BATCH_MAX,
+                                 max_wait_ms=EMBED_BATCH_WAIT_MS, name="query_embedding")
+
+
+# --- Query caches ---
+# Query embeddings never go stale (same model, same text); retrieval results are
+# keyed on the index generation that load_data bumps after every write, so an
+# ingest invalidates them without any cross-process signalling.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "600"))
+embedding_cache = LRUCache(maxsize=QUERY_CACHE_SIZE, name="query_embeddings")
+retrieval_cache = LRUCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL, name="retrieval_results")
+
+
+# Synthesized answers persist on disk; bump PROMPT_VERSION whenever the prompt changes.
+PROMPT_VERSION = "server-v1"
+answer_cache = AnswerCache(
+    os.getenv("ANSWER_CACHE_PATH", "./server_answer_cache.sqlite3"),  # not the backend's ./answer_cache.sqlite3
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "5000")),
+    embed=(lambda q: _embed_query(q)) if os.getenv("ANSWER_CACHE_SEMANTIC", "1") == "1" else None,
+    similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+)
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _embed_query(query: str) -> List[float]:
+    return _embed_queries([query])[0]
+
+
+def _embed_queries(queries: List[str]) -> List:
+    """Embeddings for `queries`; cache misses are embedded together in one forward pass."""
+    keys = [_normalize_query(q) for q in queries]
+    embs = [embedding_cache.get(k) for k in keys]
+    missing = list(dict.fromkeys(k for k, e in zip(keys, embs) if e is None))
+    if missing:
+        embs_missing = embedding_batcher.map(missing) if EMBED_BATCHING else _get_embedding_function()(missing)
+        fresh = dict(zip(missing, embs_missing))
+        for k, e in fresh.items():
+            embedding_cache.put(k, e)
+        embs = [e if e is not None else fresh[k] for k, e in zip(keys, embs)]
+    return embs
+
+
+def _retrieval_key(query: str, top_k: int, sources: Optional[List[str]], generation: int,
+                   tenant: Optional[str] = None) -> tuple:
+    return (_normalize_query(query), tuple(sorted(sources)) if sources else None, tenant or None, top_k, generation)
+
+
+def _hit(doc: str, meta: Dict, score: float, vector_score: Optional[float] = None) -> Dict:
+    return {
+        "text": (doc or "").strip(),
+        "source": _display_source(meta.get("source")),
+        "page": meta.get("page"),
+        "id": meta.get("chunk_id"),
+        "score": score,
+        "vector_score": vector_score,  # 1 / (1 + distance); None for lexical-only matches
+    }
+
+
+def _rrf(*rankings: List[str], k: int = RRF_K) -> Dict[str, float]:
+    """Reciprocal-rank fusion of ranked id lists."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking, start=1):
+            fused[cid] = fused.get(cid, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+def _n_candidates(top_k: int) -> int:
+    n = max(top_k * 2, 10) if HYBRID_SEARCH else max(20, top_k * 3)
+    return max(n, RERANK_CANDIDATES) if RERANK_ENABLED else n
+
+
+# --- Tenants and scoped search ---
+# Tenants either share "docs" (filtered on their metadata tag) or, when listed in
+# TENANT_SHARDS, get a collection of their own. Scoped queries (sources and/or a
+# shared-collection tenant) whose scope holds at most SCOPE_EXACT_MAX chunks are
+# answered by an exact scan over the scope's embeddings, resolved once per index
+# generation through the BM25 store's source -> chunk-id index, instead of having
+# Chroma evaluate a metadata filter on every query. Larger scopes use the filter.
+SCOPE_EXACT_MAX = int(os.getenv("SCOPE_EXACT_MAX", "5000"))  # 0 disables the exact path
+SCOPE_CACHE_SIZE = int(os.getenv("SCOPE_CACHE_SIZE", "32"))
+scope_cache = LRUCache(maxsize=SCOPE_CACHE_SIZE, name="scope_embeddings")
+
+
+def _collection_for(tenant: Optional[str]):
+    return _get_collection(tenant)
+
+
+def _tenant_filter(tenant: Optional[str]) -> Optional[str]:
+    """
+    Tenant tag to filter on, or None when no filter is needed: a sharded tenant has a
+    collection of its own, and an untenanted query (NO_TENANT) only needs one while the
+    shared collection holds tenants' chunks.
+    """
+    if tenant:
+        return tenant if collection_name(tenant) == "docs" else None
+    return NO_TENANT if _get_bm25(None).has_tenants() else None
+
+
+def _where(sources: Optional[List[str]], tenant: Optional[str] = None) -> Optional[Dict]:
+    clauses = []
+    if sources:
+        clauses.append({"source": {"$in": list(sources)}})
+    t = _tenant_filter(tenant)
+    if t is not None:
+        clauses.append({"tenant": t})
+    if len(clauses) > 1:
+        return {"$and": clauses}
+    return clauses[0] if clauses else None
+
+
+def _scope_matrix(sources: Optional[List[str]], tenant: Optional[str]):
+    """(ids, float32 matrix) of every chunk in the scope, or None when unscoped or too large."""
+    t = _tenant_filter(tenant)
+    if SCOPE_EXACT_MAX <= 0 or (not sources and t is None):
+        return None
+    key = (collection_name(tenant), tuple(sorted(sources)) if sources else None, t, read_generation())
+    scope = scope_cache.get(key)
+    if scope is None:
+        ids = _get_bm25(tenant).chunk_ids(sources, t, limit=SCOPE_EXACT_MAX + 1)
+        if len(ids) > SCOPE_EXACT_MAX:
+            scope = ()  # remembered, so the next query skips straight to the filter
+        else:
+            got = _collection_for(tenant).get(ids=ids, include=["embeddings"]) if ids else {"ids": [], "embeddings": []}
+            embs = got.get("embeddings")
+            matrix = np.asarray(embs if embs is not None and len(embs) else np.zeros((0, 0)), dtype=np.float32)
+            scope = (list(got["ids"]), matrix)
+        scope_cache.put(key, scope)
+    return scope or None
+
+
+def _exact_rows(col, scope: tuple, query_embeddings: List, n_results: int) -> List[List[tuple]]:
+    """Brute-force squared-L2 top-n within a scope (Chroma's default metric), same rows as _dense_rows."""
+    ids, matrix = scope
+    if not ids:
+        return [[] for _ in query_embeddings]
+    q = np.asarray(query_embeddings, dtype=np.float32)
+    dists = (q * q).sum(1)[:, None] - 2.0 * q @ matrix.T + (matrix * matrix).sum(1)[None, :]
+    n = min(n_results, len(ids))
+    picks = []
+    for row in dists:
+        top = np.argpartition(row, n - 1)[:n] if n < len(ids) else np.arange(len(ids))
+        picks.append(top[np.argsort(row[top])])
+    wanted = list(dict.fromkeys(ids[j] for top in picks for j in top))
+    got = col.get(ids=wanted, include=["documents", "metadatas"])
+    by_id = {cid: (d, m) for cid, d, m in zip(got["ids"], got["documents"], got["metadatas"])}
+    return [[(*by_id[ids[j]], max(float(row[j]), 0.0), matrix[j]) for j in top if ids[j] in by_id]
+            for row, top in zip(dists, picks)]
+
+
+def _candidate_rows(query_embeddings: List, n_results: int, sources: Optional[List[str]],
+                    tenant: Optional[str]) -> List[List[tuple]]:
+    col = _collection_for(tenant)
+    scope = _scope_matrix(sources, tenant)
+    if scope is not None:
+        return _exact_rows(col, scope, query_embeddings, n_results)
+    return _dense_rows(query_embeddings, n_results, _where(sources, tenant), col)
+
+
+def _dense_rows(query_embeddings: List, n_results: int, where: Optional[Dict], col=None) -> List[List[tuple]]:
+    """One vector-store query for many embeddings -> per query, (doc, meta, distance, embedding) sorted by distance."""
+    raw = (col if col is not None else _collection_for(None)).query(
+        query_embeddings=query_embeddings,
+        n_results=n_results,
+        include=["documents", "metadatas", "distances", "embeddings"],
+        where=where
     )
-    logger.info("Created new collection 'docs'")
+    out = []
+    for qi in range(len(query_embeddings)):
+        docs = raw.get("documents", [[]])[qi]
+        metas = raw.get("metadatas", [[]])[qi]
+        dists = raw.get("distances", [[]])[qi]
+        embs = raw.get("embeddings", [[]])[qi]
+        count = min(len(docs), len(metas), len(dists), len(embs))
+        out.append(sorted(zip(docs[:count], metas[:count], dists[:count], embs[:count]), key=lambda x: x[2]))
+    return out
 
 
-# --- Utils ---
-def _cosine_sim(a: List[float], b: List[float]) -> float:
-    dot = sum(x * y for x, y in zip(a, b))
-    na = math.sqrt(sum(x * x for x in a))
-    nb = math.sqrt(sum(y * y for y in b))
-    return dot / (na * nb + 1e-9)
+def _rank(query: str, top_k: int, sources: Optional[List[str]], rows: List[tuple], n_candidates: int,
+          tenant: Optional[str] = None) -> List[Dict]:
+    """Hybrid fusion, optional rerank and MMR over one query's dense rows."""
+    if HYBRID_SEARCH:
+        # fuse dense and BM25 rankings; lexical-only candidates are fetched by id
+        dense = {m.get("chunk_id"): (d, m, e) for d, m, _, e in rows}
+        lexical = [cid for cid, _ in _get_bm25(tenant).search(query, n_candidates, sources, _tenant_filter(tenant))]
+        fused = _rrf(list(dense), lexical)
+        missing = [cid for cid in lexical if cid not in dense]
+        if missing:
+            got = _collection_for(tenant).get(ids=missing, include=["documents", "metadatas", "embeddings"])
+            for cid, d, m, e in zip(got["ids"], got["documents"], got["metadatas"], got["embeddings"]):
+                dense[cid] = (d, m, e)
+        ranked = sorted((cid for cid in fused if cid in dense), key=fused.get, reverse=True)
+        candidates = [(*dense[cid][:2], fused[cid], dense[cid][2]) for cid in ranked]
+    else:
+        candidates = [(d, m, 1.0 / (1.0 + (dist or 0.0)), e) for d, m, dist, e in rows]
+
+    candidates = [c for c in candidates if (c[0] or "").strip()]
+    if not candidates:
+        return []
+    if RERANK_ENABLED:
+        head = candidates[:RERANK_CANDIDATES]
+        scores = _rerank(query, [c[0] for c in head])
+        if scores is not None:
+            candidates = sorted(((d, m, sc, e) for (d, m, _, e), sc in zip(head, scores)),
+                                key=lambda c: c[2], reverse=True)
+    if MMR_ENABLED:
+        order = _mmr([c[3] for c in candidates], [c[2] for c in candidates], top_k)
+    else:
+        order = range(min(top_k, len(candidates)))
+    vector_scores = {m.get("chunk_id"): 1.0 / (1.0 + (dist or 0.0)) for _, m, dist, _ in rows}
+    return [_hit(*candidates[i][:3], vector_scores.get(candidates[i][1].get("chunk_id"))) for i in order]
+
+
+def _search_collection(query: str, top_k: int, sources: Optional[List[str]] = None,
+                       tenant: Optional[str] = None) -> List[Dict]:
+    try:
+        n = _n_candidates(top_k)
+        rows = _candidate_rows([_embed_query(query)], n, sources, tenant)[0]
+        return _rank(query, top_k, sources, rows, n, tenant)
+    except Exception as e:
+        logger.error("Vector store query error: %s", e, exc_info=True)
+        return []
+
+
+def _cached_search(query: str, top_k: int, sources: Optional[List[str]],
+                   tenant: Optional[str] = None) -> List[Dict]:
+    cache_key = _retrieval_key(query, top_k, sources, read_generation(), tenant)
+    hits = retrieval_cache.get(cache_key)
+    if hits is not None:
+        return [dict(h) for h in hits]
+    hits = _search_collection(query, top_k, sources, tenant)
+    if hits:
+        retrieval_cache.put(cache_key, [dict(h) for h in hits])
+    return hits
+
+
+def _search_many(requests: List[Dict]) -> List[List[Dict]]:
+    """
+    Several searches at once: one batched embedding pass for all queries, then one
+    multi-query candidate search per distinct (sources, tenant) scope (usually just one).
+    """
+    embs = _embed_queries([r["query"] for r in requests])
+    groups: Dict[tuple, List[int]] = {}
+    for i, r in enumerate(requests):
+        key = (tuple(sorted(r["sources"])) if r["sources"] else None, r.get("tenant") or None)
+        groups.setdefault(key, []).append(i)
+
+    results: List[List[Dict]] = [[] for _ in requests]
+    for (scope, tenant), idxs in groups.items():
+        sources = list(scope) if scope else None
+        n = max(_n_candidates(requests[i]["top_k"]) for i in idxs)
+        try:
+            rows = _candidate_rows([embs[i] for i in idxs], n, sources, tenant)
+            for i, r_rows in zip(idxs, rows):
+                results[i] = _rank(requests[i]["query"], requests[i]["top_k"], sources, r_rows, n, tenant)
+        except Exception as e:
+            logger.error("Vector store batch query error: %s", e, exc_info=True)
+    return results
+
+
+# --- Web search fallback ---
+# One pooled async client; results are cached per normalized query. SERPER_URL can
+# point at a local stub (benchmarks/stub_web_search.py) for tests and load tests.
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev/search")
+WEB_SEARCH_TIMEOUT = float(os.getenv("WEB_SEARCH_TIMEOUT", "5"))
+WEB_CACHE_SIZE = int(os.getenv("WEB_CACHE_SIZE", "256"))
+WEB_CACHE_TTL = float(os.getenv("WEB_CACHE_TTL", "3600"))
+# Speculative mode (server-side synthesis only): the web lookup starts alongside vector
+# retrieval and is cancelled when the best hit's vector_score reaches the threshold;
+# weaker doc hits are answered together with the web results.
+WEB_SPECULATIVE = os.getenv("WEB_SPECULATIVE", "0") == "1"
+WEB_SPECULATIVE_THRESHOLD = float(os.getenv("WEB_SPECULATIVE_THRESHOLD", "0.5"))
+web_cache = LRUCache(maxsize=WEB_CACHE_SIZE, ttl=WEB_CACHE_TTL, name="web_search")
+_web_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_web_client() -> httpx.AsyncClient:
+    global _web_client
+    if _web_client is None:
+        _web_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(WEB_SEARCH_TIMEOUT, connect=min(2.0, WEB_SEARCH_TIMEOUT)),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _web_client
+
+
+async def _web_search(query: str) -> Dict:
+    """{"hits": [...]} (title, link, snippet) or {"error": str}; successes are cached."""
+    key = _normalize_query(query)
+    hits = web_cache.get(key)
+    if hits is not None:
+        return {"hits": [dict(h) for h in hits]}
+    api_key = os.getenv("SERPER_API_KEY")
+    if not api_key:
+        return {"error": "SERPER_API_KEY not configured"}
+    try:
+        resp = await _get_web_client().post(SERPER_URL, headers={"X-API-KEY": api_key}, json={"q": query})
+        resp.raise_for_status()
+        hits = resp.json().get("organic", [])[:5]
+    except Exception as e:
+        logger.error("Web search failed: %s", e, exc_info=True)
+        return {"error": f"Web search failed: {e}"}
+    web_cache.put(key, [dict(h) for h in hits])
+    return {"hits": hits}
 
 
+def _best_vector_score(hits: List[Dict]) -> float:
+    return max((h.get("vector_score") or 0.0 for h in hits), default=0.0)
 
-def synthesize_answer(query: str, hits: list) -> str:
+
+# --- Utils ---
+def _mmr(embeddings: List, relevance: List[float], k: int,
+         lambda_: float = None, dup_threshold: float = None) -> List[int]:
     """
-    Normalize hits (dicts or strings), dedupe, and synthesize an answer via OpenAI.
+    Maximal-marginal-relevance selection over candidate embeddings: greedily pick the
+    candidate maximizing lambda * relevance - (1 - lambda) * max similarity to what is
+    already picked. Candidates nearly identical to a picked one (cosine >= dup_threshold,
+    e.g. overlapping chunks) are never picked. One matrix product, O(k * n) after it.
+    Returns candidate indices in selection order.
     """
-    from openai import OpenAI
-    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    lambda_ = MMR_LAMBDA if lambda_ is None else lambda_
+    dup_threshold = MMR_DUP_THRESHOLD if dup_threshold is None else dup_threshold
+    E = np.asarray(embeddings, dtype=np.float32)
+    E /= np.linalg.norm(E, axis=1, keepdims=True) + 1e-9
+    sim = E @ E.T
+    rel = np.asarray(relevance, dtype=np.float32)
+    rel = (rel - rel.min()) / (np.ptp(rel) + 1e-9)
+
+    first = int(np.argmax(rel))
+    selected = [first]
+    max_sim = sim[first].copy()
+    blocked = max_sim >= dup_threshold
+    blocked[first] = True
+    while len(selected) < min(k, len(rel)):
+        score = lambda_ * rel - (1.0 - lambda_) * max_sim
+        score[blocked] = -np.inf
+        i = int(np.argmax(score))
+        if not np.isfinite(score[i]):
+            break
+        selected.append(i)
+        max_sim = np.maximum(max_sim, sim[i])
+        blocked |= sim[i] >= dup_threshold
+        blocked[i] = True
+    return selected
+
+
 
+async def synthesize_answer(query: str, hits: list) -> str:
+    """
+    Normalize hits (dicts or strings), dedupe, and synthesize an answer with the shared
+    async LLM client. Answers are cached per (question, context chunk ids, model, prompt
+    version). Raises LLMError when the completion fails.
+    """
     # Normalize hits → always list of dicts with "text"
     normalized = []
     for h in hits:
@@ -52,19 +494,25 @@ def synthesize_answer(query: str, hits: list) -> str:
         elif isinstance(h, dict):
             normalized.append(h)
 
-    # Deduplicate chunks
+    # Drop exact repeats (document hits are already diversified by MMR)
     seen, context_chunks = set(), []
     for h in normalized:
         txt = h.get("text", "").strip()
-        if txt and txt[:80] not in seen:
-            seen.add(txt[:80])
+        if txt and txt not in seen:
+            seen.add(txt)
             context_chunks.append(txt)
 
     context_text = "\n\n".join(context_chunks) if context_chunks else "No context found."
 
-    resp = client.chat.completions.create(
-        model=os.environ.get("OPENAI_MODEL", "gpt-4o"),
-        messages=[
+    model = os.environ.get("OPENAI_MODEL", "gpt-4o")
+    cache_model = "stub" if llm_client.is_stub else model
+    chunk_ids = [h.get("id") or hashlib.sha1(h.get("text", "").encode("utf-8")).hexdigest() for h in normalized]
+    cached = await asyncio.to_thread(answer_cache.get, query, chunk_ids, cache_model, PROMPT_VERSION)
+    if cached is not None:
+        return cached
+
+    answer = await llm_client.complete(
+        [
             {"role": "system", "content": (
                 "You are a helpful assistant answering ONLY from the provided context.\n"
                 "- If the user asks for skills, extract them into a clean bullet list.\n"
@@ -74,105 +522,530 @@ def synthesize_answer(query: str, hits: list) -> str:
             )},
             {"role": "user", "content": f"Question: {query}\n\nContext:\n{context_text}"}
         ],
+        model,
         temperature=0,
-        max_tokens=400
+        max_tokens=400,
     )
-    return resp.choices[0].message.content.strip()
+    if answer:
+        await asyncio.to_thread(answer_cache.put, query, chunk_ids, cache_model, PROMPT_VERSION, answer)
+    return answer
+
+
 
+async def _synthesize_or_none(query: str, hits: list) -> Optional[str]:
+    try:
+        return await synthesize_answer(query, hits)
+    except LLMError as e:
+        # hand back the hits unsynthesized; the backend writes (or extracts) the answer
+        logger.warning("Synthesis failed for query='%s': %s", query, e)
+        return None
+
+
+def _snippets(web_hits: List[Dict]) -> List[str]:
+    return [h.get("snippet", "") or h.get("body", "") for h in web_hits]
+
+
+async def _search_and_answer(query: str, top_k: int, sources: Optional[List[str]],
+                             synthesize: Optional[bool], tenant: Optional[str] = None) -> Dict:
+    logger.info("document_search called with query='%s', sources=%s, tenant=%s", query, sources, tenant)
+    if synthesize is None:
+        synthesize = SYNTHESIS_TIER == "server"
+
+    # Retrieval-only: the caller synthesizes and owns the web-fallback policy
+    if not synthesize:
+        # off the event loop, so concurrent searches run in parallel and share embedding batches
+        hits = await asyncio.to_thread(_cached_search, query, top_k, sources, tenant)
+        return {"answer": None, "hits": hits}
+
+    web_task = asyncio.create_task(_web_search(query)) if WEB_SPECULATIVE else None
+    try:
+        hits = await asyncio.to_thread(_cached_search, query, top_k, sources, tenant)
+        # If good hits found → synthesize from docs
+        if hits and (web_task is None or _best_vector_score(hits) >= WEB_SPECULATIVE_THRESHOLD):
+            if web_task is not None:
+                web_task.cancel()  # the docs answer: drop the web request now, not after synthesis
+            return {"answer": await _synthesize_or_none(query, hits), "hits": hits}
+        # Fallback: Web search (already in flight in speculative mode)
+        logger.info("%s doc hits, using web search for query='%s'", "Weak" if hits else "No", query)
+        web = await web_task if web_task is not None else await _web_search(query)
+    finally:
+        if web_task is not None and not web_task.done():
+            web_task.cancel()
+
+    web_hits = web.get("hits", [])
+    if hits:
+        answer = await _synthesize_or_none(query, hits + [{"text": t} for t in _snippets(web_hits)])
+        return {"answer": answer, "hits": hits, "web": web_hits}
+    if web_hits:
+        answer_web = await _synthesize_or_none(query, _snippets(web_hits))
+        if answer_web:
+            return {"answer": "From web: " + answer_web, "hits": web_hits}
+    elif web.get("error"):
+        logger.error("Web search fallback failed: %s", web["error"])
+    return {"answer": "I couldn’t find anything in documents or web search.", "hits": []}
+
+
+# --- Ingestion: this process is the only index writer ---
+# Uploads arrive through ingest_document (large files staged on disk piece by piece
+# with upload_chunk first) and deletions through delete_source; both are queued for
+# one writer thread, so vector-store and BM25 writes are serialized
+# however many backend workers or replicas send them. The writer drains up to
+# INGEST_WRITE_BATCH queued operations at a time and publishes them together with
+# one index-generation bump (one retrieval-cache invalidation).
+INGEST_DIR = Path(os.getenv("INGEST_DIR", "./uploaded_docs"))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "8"))   # queued + running uploads
+UPLOAD_STAGING_TTL = int(os.getenv("UPLOAD_STAGING_TTL", "3600"))  # unfinished chunked uploads are dropped after this
+INGEST_WRITE_BATCH = int(os.getenv("INGEST_WRITE_BATCH", "8"))
+JOBS_KEEP = int(os.getenv("INGEST_JOBS_KEEP", "1000"))           # finished jobs remembered for ingest_status
+
+JOBS: "OrderedDict[str, dict]" = OrderedDict()
+_jobs_lock = threading.Lock()
+_ingest_slots = threading.BoundedSemaphore(INGEST_MAX_PENDING)
+_write_queue: "queue.Queue" = queue.Queue()
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+
+def _upload_dir(tenant: Optional[str], session_id: Optional[str] = None) -> Path:
+    """INGEST_DIR[/<tenant>][/<session namespace>]; bulk loads of a tenant dir skip session subdirs."""
+    path = INGEST_DIR / (re.sub(r"[^A-Za-z0-9_.-]+", "_", tenant).strip("._") or "_") if tenant else INGEST_DIR
+    if session_id:
+        path /= _session_ns(session_id)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _staged(upload_id: Optional[str]) -> Optional[Path]:
+    """Where the pieces of chunked upload `upload_id` are collected (None for a malformed id)."""
+    if not re.fullmatch(r"[0-9a-f]{32}", upload_id or ""):
+        return None
+    return INGEST_DIR / ".staging" / f"{upload_id}.part"
+
+
+def _append_b64(path: Path, content_b64: str) -> int:
+    """Decode `content_b64` onto the end of `path`; returns the file's new size."""
+    data = base64.b64decode(content_b64, validate=True)
+    with open(path, "ab") as f:
+        f.write(data)
+        return f.tell()
+
+
+def _sweep_staging():
+    cutoff = time.time() - UPLOAD_STAGING_TTL
+    for path in (INGEST_DIR / ".staging").glob("*.part"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _new_job(filename: str, tenant: Optional[str], session_id: Optional[str]) -> dict:
+    job = {
+        "job_id": uuid4().hex,
+        "filename": filename,
+        "source": _upload_source(session_id, filename),
+        "tenant": tenant,
+        "session_id": session_id,
+        "status": "queued",
+        "pages_total": 0,
+        "pages_parsed": 0,
+        "slow_pages": [],
+        "empty_pages": [],
+        "chunks_total": 0,
+        "chunks_unchanged": 0,
+        "chunks_embedded": 0,
+        "errors": [],
+        "created_at": time.time(),
+        "finished_at": None,
+    }
+    with _jobs_lock:
+        JOBS[job["job_id"]] = job
+        while len(JOBS) > JOBS_KEEP:
+            JOBS.popitem(last=False)
+    return job
+
+
+def _submit_write(op: tuple):
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_writer_loop, name="index-writer", daemon=True)
+                _writer.start()
+    _write_queue.put(op)
+
+
+def _writer_loop():
+    while True:
+        ops = [_write_queue.get()]
+        while len(ops) < INGEST_WRITE_BATCH:
+            try:
+                ops.append(_write_queue.get_nowait())
+            except queue.Empty:
+                break
+        # nothing may escape: this thread is the only writer, and a caller waits on every op
+        done = []
+        for op in ops:
+            try:
+                done.append((op, _run_write(op)))
+            except Exception as e:
+                logger.error("Index write %s failed: %s", op[0], e, exc_info=True)
+                done.append((op, e))
+        try:
+            bump_generation()
+        except Exception as e:
+            logger.error("Could not publish %d index writes: %s", len(ops), e, exc_info=True)
+        for op, result in done:
+            try:
+                _finish_write(op, result)
+            except Exception as e:
+                logger.error("Finishing index write %s failed: %s", op[0], e, exc_info=True)
+                _fail_write(op, e)
+
+
+def _run_write(op: tuple):
+    if op[0] == "delete":
+        _, fut, source, tenant = op
+        try:
+            deleted = _delete_source(source, tenant, bump=False)
+            # the stored upload too, or the next bulk load of INGEST_DIR would bring it back
+            (_upload_dir(tenant) / source).unlink(missing_ok=True)
+            return deleted
+        except Exception as e:
+            logger.error("delete_source %s failed: %s", source, e, exc_info=True)
+            return e
+    _, job, part = op
+
+    def progress(**kw):
+        with _jobs_lock:
+            err = kw.pop("error", None)
+            if err:
+                job["errors"].append(err)
+            job.update(kw)
+
+    try:
+        job["status"] = "running"
+        file_path = part.with_name(job["filename"])
+        os.replace(part, file_path)
+        return ingest_file(file_path, progress=progress, tenant=job["tenant"], bump=False, source=job["source"])
+    except Exception as e:
+        logger.error("Ingest job %s failed: %s", job["job_id"], e, exc_info=True)
+        progress(error=str(e))
+        return 0
+
+
+def _finish_write(op: tuple, result):
+    """Runs once the batch is published, so a "done" job is already searchable."""
+    if op[0] == "delete":
+        _, fut, source, tenant = op
+        if isinstance(result, Exception):
+            fut.set_exception(result)
+        else:
+            _forget_source(tenant, source)
+            fut.set_result(result)
+        return
+    job = op[1]
+    try:
+        if result and not isinstance(result, Exception):
+            _remember_source(job["tenant"], job["session_id"], job["source"])
+            job["status"] = "done"
+        else:
+            if not job["errors"]:
+                job["errors"].append(f"Indexing failed: {result}" if isinstance(result, Exception)
+                                     else "Could not extract text from file (is it scanned?).")
+            job["status"] = "error"
+    finally:
+        job["finished_at"] = time.time()
+        _ingest_slots.release()
+
+
+def _fail_write(op: tuple, error: Exception):
+    """_finish_write itself failed: still resolve the op, so no caller or job waits forever."""
+    if op[0] == "delete":
+        if not op[1].done():
+            op[1].set_exception(error)
+        return
+    with _jobs_lock:
+        op[1]["errors"].append(f"Indexing failed: {error}")
+        op[1]["status"] = "error"
+
+
+# --- Upload scopes ---
+# Each (tenant, session_id) remembers the last RECENT_SOURCES files it uploaded;
+# document_search called with a session_id searches only those, and nothing at all
+# for a session that uploaded nothing. "" is the shared scope of uploads made without
+# a session. A session's uploads are stored and indexed under their own namespace
+# ("s-<digest>/<filename>"), so two sessions uploading the same filename never
+# overwrite each other. The scopes live in SCOPES_PATH (SQLite) next to the index, so
+# they survive restarts and any number of stateless backend workers see the same ones.
+RECENT_SOURCES = int(os.getenv("RECENT_SOURCES", "5"))
+SCOPES_PATH = os.getenv("SCOPES_PATH", os.path.join(CHROMA_PATH, "upload_scopes.sqlite3"))
+
+_scopes_db: Optional[sqlite3.Connection] = None
+_scopes_lock = threading.Lock()
+
+
+def _scopes() -> sqlite3.Connection:
+    """The scope table, opened on first use (call with _scopes_lock held)."""
+    global _scopes_db
+    if _scopes_db is None:
+        Path(SCOPES_PATH).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(SCOPES_PATH, check_same_thread=False)
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS scopes (
+                tenant TEXT NOT NULL,
+                session TEXT NOT NULL,
+                source TEXT NOT NULL,
+                uploaded_at REAL NOT NULL,
+                PRIMARY KEY (tenant, session, source)
+            );
+            CREATE INDEX IF NOT EXISTS scopes_source ON scopes (tenant, source);
+        """)
+        _scopes_db = db
+    return _scopes_db
+
+
+def _session_ns(session_id: Optional[str]) -> str:
+    return "s-" + hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:16] if session_id else ""
+
+
+def _upload_source(session_id: Optional[str], name: str) -> str:
+    """The name an upload of `name` by `session_id` is indexed under."""
+    ns = _session_ns(session_id)
+    return f"{ns}/{name}" if ns else name
+
+
+def _display_source(source: Optional[str]) -> Optional[str]:
+    return source.rsplit("/", 1)[-1] if source else source
+
+
+def _remember_source(tenant: Optional[str], session_id: Optional[str], source: str):
+    key = (tenant or "", session_id or "")
+    with _scopes_lock:
+        db = _scopes()
+        with db:
+            db.execute("INSERT OR REPLACE INTO scopes VALUES (?, ?, ?, ?)", (*key, source, time.time()))
+            db.execute("DELETE FROM scopes WHERE tenant = ? AND session = ? AND source NOT IN "
+                       "(SELECT source FROM scopes WHERE tenant = ? AND session = ? "
+                       "ORDER BY uploaded_at DESC LIMIT ?)", (*key, *key, RECENT_SOURCES))
+
+
+def _forget_source(tenant: Optional[str], source: str):
+    with _scopes_lock:
+        db = _scopes()
+        with db:
+            db.execute("DELETE FROM scopes WHERE tenant = ? AND source = ?", (tenant or "", source))
+
+
+def _sources_for(tenant: Optional[str], session_id: Optional[str]) -> List[str]:
+    """The sources (tenant, session_id) uploaded last; [] if it uploaded none."""
+    with _scopes_lock:
+        rows = _scopes().execute("SELECT source FROM scopes WHERE tenant = ? AND session = ? "
+                                 "ORDER BY uploaded_at DESC LIMIT ?",
+                                 (tenant or "", session_id or "", RECENT_SOURCES)).fetchall()
+    return [r[0] for r in rows]
+
+
+# --- Startup ---
+# The HTTP port opens right after import; the heavy loading happens here, phase by
+# phase, and GET /ready answers 503 until it is done (docker-compose healthcheck).
+def _warmup():
+    with startup.phase("embedding model"):
+        _get_embedding_function()
+    with startup.phase("vector store"):
+        n_chunks = _collection_for(None).count()
+        logger.info("Using %s vector store, collection 'docs' (%d chunks)", VECTOR_STORE, n_chunks)
+    with startup.phase("bm25 index"):
+        _get_bm25()
+    if RERANK_ENABLED:
+        with startup.phase("reranker"):
+            _get_reranker().predict([("warmup", "warmup")], show_progress_bar=False)
+    with startup.phase("first query"):
+        # a dummy query through the batcher (first forward pass) and the index (first search)
+        emb = embedding_batcher.map(["warmup"]) if EMBED_BATCHING else _get_embedding_function()(["warmup"])
+        if n_chunks:
+            _dense_rows([emb[0]], 1, None)
+
+
+# The warmup must not wait for an MCP client: the backend only connects once this
+# server is ready. It is started by whichever comes first of the server lifespan
+# (once per process from fastmcp 2.13; per MCP session in 2.12), __main__ and the
+# first GET /ready (the healthcheck polls it from container start); start() is idempotent.
+@asynccontextmanager
+async def _lifespan(server: FastMCP):
+    startup.start(_warmup)
+    yield {}
 
 
 # --- MCP Server ---
 def create_mcp_server() -> FastMCP:
-    mcp = FastMCP("agentic-rag-server")
+    mcp = FastMCP("agentic-rag-server", lifespan=_lifespan)
+
+    @mcp.custom_route("/ready", methods=["GET"])
+    async def ready(request: Request) -> JSONResponse:
+        """200 once startup finished (model, vector store and indexes loaded, one query served), else 503."""
+        startup.start(_warmup)
+        return JSONResponse(startup.status(), status_code=200 if startup.ready else 503)
+
+    @mcp.tool
+    async def document_search(query: str, top_k: int = 8, sources: Optional[List[str]] = None,
+                              synthesize: Optional[bool] = None, tenant: Optional[str] = None,
+                              session_id: Optional[str] = None) -> str:
+        """
+        Search ChromaDB for relevant chunks, optionally limited to `sources` and/or a `tenant`'s documents.
+        With `session_id`, only the files that session uploaded last through ingest_document are
+        searched ("" = uploads made without a session), or, given `sources`, those of its uploads;
+        a session without uploads gets no hits.
+        synthesize=True also writes an answer from the hits (falling back to web_search
+        when there are none); synthesize=False is retrieval-only. Default: SYNTHESIS_TIER.
+        With WEB_SPECULATIVE=1 the web lookup runs during retrieval and weak doc hits
+        (vector_score below WEB_SPECULATIVE_THRESHOLD) are answered together with it.
+        Returns: {"answer": str | None, "hits": List[Dict], "web": List[Dict] (weak hits only),
+                  "scope": List[str] | None (the sources searched)}
+        """
+        if session_id is not None:
+            sources = (_sources_for(tenant, session_id) if sources is None
+                       else [_upload_source(session_id, Path(s).name) for s in sources])
+        if sources is not None and not sources:
+            return json.dumps({"answer": None, "hits": [], "scope": []})
+        out = await _search_and_answer(query, top_k, sources, synthesize, tenant)
+        return json.dumps(dict(out, scope=[_display_source(s) for s in sources] if sources else None))
+
+    @mcp.tool
+    def cache_stats() -> str:
+        """
+        Query-cache statistics for tuning QUERY_CACHE_SIZE / QUERY_CACHE_TTL, plus the
+        embedding batcher's queue depth and batch sizes (EMBED_BATCH_MAX / EMBED_BATCH_WAIT_MS).
+        Returns: {"generation": int, "caches": List[Dict], "embedding_batcher": Dict, "llm": Dict, "startup": Dict}.
+        """
+        return json.dumps({
+            "generation": read_generation(),
+            "caches": [embedding_cache.stats(), retrieval_cache.stats(), answer_cache.stats(), web_cache.stats(),
+                       scope_cache.stats()],
+            "embedding_batcher": embedding_batcher.stats(),
+            "llm": llm_client.stats(),
+            "startup": startup.status(),
+        })
 
     @mcp.tool
-    def document_search(query: str, top_k: int = 8, sources: Optional[List[str]] = None) -> str:
+    async def document_search_batch(queries: List[Dict]) -> str:
         """
-        Search ChromaDB for relevant chunks. 
-        If no hits, fall back to web_search.
-        Returns: {"answer": str, "hits": List[Dict]}
+        Retrieval-only search for several queries in one call: all queries are embedded in
+        one batched pass and searched as one multi-query per distinct (sources, tenant) scope.
+        queries: [{"query": str, "top_k": int (default 8), "sources": List[str] | None,
+                   "tenant": str | None}, ...]
+        Returns: {"results": [{"query": str, "hits": List[Dict]}, ...]} in input order.
         """
-        logger.info("document_search called with query='%s', sources=%s", query, sources)
+        return await asyncio.to_thread(_document_search_batch, queries)
 
-        include = ["documents", "metadatas", "distances"]
-        where = {"source": {"$in": sources}} if sources else None
+    def _document_search_batch(queries: List[Dict]) -> str:
+        logger.info("document_search_batch called with %d queries", len(queries))
+        requests = [{"query": str(q.get("query", "")), "top_k": int(q.get("top_k") or 8),
+                     "sources": q.get("sources") or None, "tenant": q.get("tenant") or None} for q in queries]
+        generation = read_generation()
+        keys = [_retrieval_key(r["query"], r["top_k"], r["sources"], generation, r["tenant"]) for r in requests]
+        hit_lists = [retrieval_cache.get(k) for k in keys]
+        todo = [i for i, h in enumerate(hit_lists) if h is None]
+        if todo:
+            for i, hits in zip(todo, _search_many([requests[i] for i in todo])):
+                hit_lists[i] = hits
+                if hits:
+                    retrieval_cache.put(keys[i], [dict(h) for h in hits])
+        return json.dumps({"results": [{"query": r["query"], "hits": [dict(h) for h in hits]}
+                                       for r, hits in zip(requests, hit_lists)]})
 
-        hits = []
+    @mcp.tool
+    async def upload_chunk(content_b64: str, upload_id: Optional[str] = None) -> str:
+        """
+        Stage one piece (base64) of a file too large for a single ingest_document call. Pieces
+        are appended on disk in call order; omit `upload_id` for the first one, then finish
+        with ingest_document(..., upload_id=...). Unfinished uploads expire after UPLOAD_STAGING_TTL.
+        Returns: {"upload_id": str, "bytes": int (staged so far)} or {"error": str}.
+        """
+        if upload_id is None:
+            upload_id = uuid4().hex
+            await asyncio.to_thread(_sweep_staging)
+            _staged(upload_id).parent.mkdir(parents=True, exist_ok=True)
+        elif _staged(upload_id) is None or not _staged(upload_id).exists():
+            return json.dumps({"error": "Unknown upload id"})
         try:
-            raw = collection.query(
-                query_texts=[query],
-                n_results=max(20, top_k * 3),
-                include=include,
-                where=where
-            )
-            docs = raw.get("documents", [[]])[0]
-            metas = raw.get("metadatas", [[]])[0]
-            dists = raw.get("distances", [[]])[0]
-
-            count = min(len(docs), len(metas), len(dists))
-            pairs = list(zip(docs[:count], metas[:count], dists[:count]))
-            pairs = sorted(pairs, key=lambda x: x[2])[:top_k]
-
-            seen = set()
-            for d, m, dist in pairs:
-                txt = (d or "").strip()
-                if not txt or txt[:100] in seen:
-                    continue
-                seen.add(txt[:100])
-                hits.append({
-                    "text": txt,
-                    "source": m.get("source"),
-                    "page": m.get("page"),
-                    "id": m.get("chunk_id"),
-                    "score": 1.0 / (1.0 + (dist or 0.0))
-                })
+            size = await asyncio.to_thread(_append_b64, _staged(upload_id), content_b64)
         except Exception as e:
-            logger.error("Chroma query error: %s", e, exc_info=True)
+            return json.dumps({"error": f"Could not store upload: {e}"})
+        return json.dumps({"upload_id": upload_id, "bytes": size})
 
-        # If hits found → synthesize from docs
-        if hits:
-            answer = synthesize_answer(query, [h["text"] for h in hits])
-            return json.dumps({"answer": answer, "hits": hits})
-
-        # Fallback: Web search
-        logger.info("No doc hits, falling back to web search for query='%s'", query)
+    @mcp.tool
+    async def ingest_document(filename: str, content_b64: str, tenant: Optional[str] = None,
+                              session_id: Optional[str] = None, upload_id: Optional[str] = None) -> str:
+        """
+        Queue a .pdf/.txt (base64 content) for indexing by this server, the only index writer.
+        With `upload_id`, the pieces staged by upload_chunk come first and `content_b64` is the last one.
+        The file is remembered in the (tenant, session_id) upload scope once it is searchable.
+        Returns: {"job_id": str, "status": "queued", "message": str}, or {"error": str} with
+        "retry_after" (seconds) when INGEST_MAX_PENDING uploads are already queued.
+        """
+        name = Path(filename).name
+        if not name.lower().endswith((".txt", ".pdf")):
+            return json.dumps({"error": "Unsupported file type"})
+        staged = _staged(upload_id) if upload_id is not None else None
+        if upload_id is not None and (staged is None or not staged.exists()):
+            return json.dumps({"error": "Unknown upload id"})
+        if not _ingest_slots.acquire(blocking=False):
+            return json.dumps({"error": "Too many documents being ingested; retry shortly.", "retry_after": 5})
+        job = _new_job(name, tenant, session_id)
+        part = None
         try:
-            res = web_search(query)
-            parsed = json.loads(res)
-            web_hits = parsed.get("hits", [])
-            if web_hits:
-                answer_web = synthesize_answer(query, [h.get("snippet", "") or h.get("body", "") for h in web_hits])
-                return json.dumps({"answer": "From web: " + answer_web, "hits": web_hits})
+            part = _upload_dir(tenant, session_id) / f".{name}.{job['job_id']}.part"
+            if staged is not None:
+                os.replace(staged, part)
+            await asyncio.to_thread(_append_b64, part, content_b64)
+            _submit_write(("ingest", job, part))
         except Exception as e:
-            logger.error("Web search fallback failed: %s", e, exc_info=True)
+            if part is not None:
+                part.unlink(missing_ok=True)
+            _ingest_slots.release()
+            with _jobs_lock:
+                JOBS.pop(job["job_id"], None)
+            return json.dumps({"error": f"Could not store upload: {e}"})
+        logger.info("ingest_document queued %s (tenant=%s, job %s)", name, tenant, job["job_id"])
+        return json.dumps({"job_id": job["job_id"], "status": job["status"],
+                           "message": f"File '{name}' uploaded; ingestion queued."})
 
-        return json.dumps({"answer": "I couldn’t find anything in documents or web search.", "hits": []})
+    @mcp.tool
+    def ingest_status(job_id: str) -> str:
+        """
+        Progress of an ingest_document job.
+        Returns: {"status": "queued|running|done|error", "pages_total", "pages_parsed", "slow_pages",
+                  "empty_pages", "chunks_total", "chunks_unchanged", "chunks_embedded", "errors", ...}
+                  or {"error": "Unknown job id"}.
+        """
+        with _jobs_lock:
+            job = JOBS.get(job_id)
+            if job is None:
+                return json.dumps({"error": "Unknown job id"})
+            return json.dumps(dict(job, errors=list(job["errors"])))
+
+    @mcp.tool
+    async def delete_source(source: str, tenant: Optional[str] = None, session_id: Optional[str] = None) -> str:
+        """
+        Remove every chunk of one uploaded file (by filename; with `session_id`, that session's
+        upload of it) and the stored file, through the same writer queue as ingestion.
+        Returns: {"source": str, "deleted": int}.
+        """
+        fut: Future = Future()
+        _submit_write(("delete", fut, _upload_source(session_id, Path(source).name), tenant))
+        deleted = await asyncio.wrap_future(fut)
+        return json.dumps({"source": source, "deleted": deleted})
 
     @mcp.tool
-    def web_search(query: str) -> str:
+    async def web_search(query: str) -> str:
         """
-        Fallback web search using Serper.dev API.
+        Fallback web search using Serper.dev API (SERPER_URL), cached for WEB_CACHE_TTL seconds.
         Returns: {"hits": List[Dict]} with title, link, snippet.
         """
         logger.info("web_search called with query='%s'", query)
-        api_key = os.getenv("SERPER_API_KEY")
-        if not api_key:
-            return json.dumps({"error": "SERPER_API_KEY not configured"})
-
-        url = "https://google.serper.dev/search"
-        headers = {"X-API-KEY": api_key, "Content-Type": "application/json"}
-        payload = json.dumps({"q": query})
-
-        try:
-            import requests
-            resp = requests.post(url, headers=headers, data=payload)
-            resp.raise_for_status()
-            data = resp.json()
-            results = data.get("organic", [])[:5]
-            return json.dumps({"hits": results})
-        except Exception as e:
-            logger.error("Web search failed: %s", e, exc_info=True)
-            return json.dumps({"error": f"Web search failed: {e}"})
+        return json.dumps(await _web_search(query))
 
     return mcp
 
@@ -180,4 +1053,5 @@ def create_mcp_server() -> FastMCP:
 mcp = create_mcp_server()
 
 if __name__ == "__main__":
+    startup.start(_warmup)
     mcp.run(transport="http", host="0.0.0.0", port=8000)